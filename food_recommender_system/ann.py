@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Optional
+
+from food_recommender_system.config import ANN_EXACT_BELOW, ANN_MIN_CANDIDATES, ANN_PROBES
+
+# Rows scored at once when assigning foods to clusters, to bound the memory of the product with the centroids
+CHUNK_SIZE = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit norm, mapping zero and non-finite vectors to zero."""
+    vectors = np.nan_to_num(np.asarray(vectors, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+
+
+class ExactSearch:
+    """Linear scan: every food of the searched range is scored."""
+
+    def candidates(self, vector: np.ndarray, start: int, stop: int) -> Optional[np.ndarray]:
+        """Return None, meaning the whole [start, stop) range."""
+        return None
+
+
+class IVFSearch:
+    """
+    Inverted-file index over the normalized nutrient vectors of a catalog, built with numpy only.
+
+    Foods are clustered with spherical k-means, and a query only scores the foods of the clusters whose
+    centroids are the most similar to it. n_probe is the recall/latency knob: probing more clusters gives a
+    higher recall and a slower search, and probing all of them is an exact search.
+    """
+
+    def __init__(
+            self,
+            matrix: np.ndarray,
+            n_lists: Optional[int] = None,
+            n_probe: int = ANN_PROBES,
+            min_candidates: int = ANN_MIN_CANDIDATES,
+            exact_below: int = ANN_EXACT_BELOW,
+            iterations: int = 5,
+            sample_size: int = CHUNK_SIZE,
+            seed: int = 0):
+        """
+        Cluster the rows of a nutrient matrix.
+
+        Args:
+            matrix (np.ndarray): The nutrient matrix of the catalog, one food per row.
+            n_lists (int, optional): Number of clusters. Defaults to the square root of the number of foods.
+            n_probe (int, optional): Number of clusters scored by each query. Defaults to ANN_PROBES.
+            min_candidates (int, optional): Keep probing clusters until at least this many foods of the searched range
+                                            are found. Defaults to ANN_MIN_CANDIDATES.
+            exact_below (int, optional): Ranges with at most this many foods are always searched exactly.
+                                         Defaults to ANN_EXACT_BELOW.
+            iterations (int, optional): Number of k-means iterations. Defaults to 5.
+            sample_size (int, optional): Number of foods the centroids are trained on. Defaults to CHUNK_SIZE.
+            seed (int, optional): Seed of the centroid initialization and of the training sample. Defaults to 0.
+        """
+        vectors = normalize(matrix)
+        self.n_lists = max(1, min(n_lists or int(np.sqrt(len(vectors))), len(vectors)))
+        self.n_probe = n_probe
+        self.min_candidates = min_candidates
+        self.exact_below = exact_below
+
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+
+        if len(sample):
+            self.centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)]
+        else:
+            self.centroids = np.zeros((1, vectors.shape[1]))
+        for _ in range(iterations):
+            assignments = self._assign(sample)
+            sums = np.stack(
+                [np.bincount(assignments, weights=sample[:, column], minlength=self.n_lists) for column in range(sample.shape[1])],
+                axis=1
+            )
+            # Clusters left empty keep their previous centroid
+            empty = ~sums.any(axis=1)
+            sums[empty] = self.centroids[empty]
+            self.centroids = normalize(sums)
+
+        # Members of each cluster, in catalog order, as a CSR-like (order, offsets) pair
+        assignments = self._assign(vectors)
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))])
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.intp)
+        for start in range(0, len(vectors), CHUNK_SIZE):
+            assignments[start:start + CHUNK_SIZE] = np.argmax(vectors[start:start + CHUNK_SIZE] @ self.centroids.T, axis=1)
+        return assignments
+
+    def candidates(self, vector: np.ndarray, start: int, stop: int) -> Optional[np.ndarray]:
+        """
+        Return the catalog rows in [start, stop) that belong to the clusters closest to a vector, in catalog order.
+
+        Returns None (an exact search of the range) when the range is small, when n_probe covers every cluster,
+        or when probing every cluster is needed to find min_candidates foods of the range.
+        """
+        if stop - start <= self.exact_below or self.n_probe >= self.n_lists:
+            return None
+
+        scores = self.centroids @ normalize(vector)
+        lists = np.argsort(-scores, kind="stable")
+
+        found = []
+        count = 0
+        for probed, cluster in enumerate(lists):
+            if probed >= self.n_probe and count >= self.min_candidates:
+                break
+            members = self.order[self.offsets[cluster]:self.offsets[cluster + 1]]
+            members = members[(members >= start) & (members < stop)]
+            found.append(members)
+            count += len(members)
+        else:
+            return None
+
+        return np.sort(np.concatenate(found))
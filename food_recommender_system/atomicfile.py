@@ -0,0 +1,56 @@
+"""
+Atomic writes of files: the content is written to a temporary file next to the target and renamed over it, so that
+readers (and a crash in the middle of the write) see either the old or the new content, never a partial file.
+"""
+import contextlib
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator
+
+
+def _read_umask() -> int:
+    # The umask can only be read by setting it, which is not thread-safe, so it is read once on import
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def file_permissions(path: Path) -> int:
+    """Return the permissions of a file, or the ones open() gives a new file (0o666 less the umask) if it does not exist."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+@contextlib.contextmanager
+def atomic_write(path: Path, mode: str = "w") -> Iterator[IO]:
+    """
+    Open a temporary file next to a file for writing, and rename it over the file when the block exits without
+    an error (the temporary file is removed otherwise).
+
+    The temporary file gets the permissions of the file it replaces, or the ones of a new file, instead of the
+    0o600 of temporary files, which the rename would keep.
+
+    Args:
+        path (Path): The file to write.
+        mode (str): The mode the temporary file is opened with, "w" or "wb".
+
+    Returns:
+        Iterator[IO]: The temporary file.
+    """
+    path = Path(path)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, mode) as file:
+            os.chmod(temp_path, file_permissions(path))
+            yield file
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,239 @@
+"""
+Generate the weekly meal plan of every stored profile across a process pool.
+
+The profiles are listed, read and updated through the configured profile store (the JSON files or the SQLite
+database of PROFILE_STORE), or through the JSON files of --directory.
+
+The dataset, its catalog and the neighbor index are loaded once by the parent process and inherited by the
+workers through fork, so their pages are shared copy-on-write instead of being loaded by every worker.
+Every plan is written to its profile atomically, under the lock of the profile, and every profile done is appended to a journal, so that
+an interrupted run can be resumed without planning those profiles again.
+
+    python -m food_recommender_system.batch --workers 8 [--directory data/processed] [--run-id 2025-W02] [--restart] [--seed 0]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from food_recommender_system.config import PROCESSED_DATA_PATH, PROFILE_DATABASE_PATH, PROFILE_STORE, RAW_DATA_PATH
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.foodids import pack_meals
+from food_recommender_system.mealgen import build_weekly_meal_plan
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.profiler import PROFILE_KEYS, JsonProfileStore, ProfileStore, get_profile_store
+from food_recommender_system.recommender import AlternativesCache
+
+# The data of the worker processes, set by init_worker
+_worker = {}
+
+
+def discover_profiles(store: Optional[ProfileStore] = None) -> List[str]:
+    """
+    Return the names of the profiles of a store (by default the configured one): the stored entries with every
+    field of a UserProfiler profile.
+    """
+    store = get_profile_store() if store is None else store
+    profiles = []
+    for name in store.names():
+        try:
+            data = store.load(name)
+        except (OSError, ValueError):
+            # Unreadable profiles are still planned, so that they are reported as failures
+            profiles.append(name)
+            continue
+        if isinstance(data, dict) and PROFILE_KEYS <= data.keys():
+            profiles.append(name)
+    return profiles
+
+
+def journal_path(run_id: str, directory: Path = PROCESSED_DATA_PATH) -> Path:
+    """Return the journal of a run, listing the profiles already planned (one file name per line)."""
+    return Path(directory) / f".plans-{run_id}.log"
+
+
+def read_journal(path: Path) -> set:
+    """Return the profiles listed in a journal, none if it does not exist."""
+    try:
+        with open(path, "r") as file:
+            return {line.strip() for line in file if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def profile_seed(seed: int, name: str) -> np.random.Generator:
+    """Return the Generator of a profile, derived from the seed of the run and the profile name."""
+    return np.random.default_rng([seed, zlib.crc32(Path(name).name.encode())])
+
+
+def init_worker(df: pd.DataFrame, servings: dict, neighbors: Optional[NeighborIndex], store: ProfileStore):
+    """Set the data shared by the plans of a worker process."""
+    _worker.update(df=df, servings=servings, neighbors=neighbors, alternatives=AlternativesCache(), store=store)
+
+
+def plan_profile(name: str, seed: int) -> float:
+    """
+    Generate the weekly meal plan of a stored profile and write it to the profile, in a worker process.
+
+    Returns:
+        float: The time it took, in seconds.
+    """
+    start = time.perf_counter()
+    store = _worker["store"]
+    profile = store.load(name)
+    if profile is None:
+        raise FileNotFoundError(f"{store.location(name)} does not exist")
+
+    meals = build_weekly_meal_plan(
+        _worker["df"],
+        _worker["servings"],
+        profile["food_preferences"],
+        profile["seasonal_preferences"],
+        profile["intolerances"],
+        _worker["neighbors"],
+        _worker["alternatives"],
+        profile_seed(seed, name)
+    )
+    # Only the meals are written, under the lock of the profile, so that the changes the user made to the other
+    # fields during the planning are kept
+    store.update(name, {"meals": pack_meals(meals)})
+    return time.perf_counter() - start
+
+
+def generate_all(
+        profiles: List[str],
+        df: pd.DataFrame,
+        servings: dict,
+        neighbors: Optional[NeighborIndex] = None,
+        workers: Optional[int] = None,
+        journal: Optional[Path] = None,
+        seed: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        store: Optional[ProfileStore] = None) -> Dict:
+    """
+    Generate the weekly meal plan of every profile, skipping the profiles already listed in the journal.
+
+    Args:
+        profiles (List[str]): The names of the profiles in the store.
+        df (pd.DataFrame): DataFrame containing the food dataset.
+        servings (dict): Dictionary containing the frequency of servings per week for each category.
+        neighbors (NeighborIndex, optional): Precomputed neighbors of df, used to find similar foods.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs; 1 plans in this process.
+        journal (Path, optional): The journal of the run, to resume it. Every planned profile is appended to it.
+        seed (int, optional): The seed of the run, from which the seed of every profile is derived.
+                              A random one is drawn if not given, and returned.
+        progress (Callable[[int, int], None], optional): Called with the number of profiles done and the total.
+        store (ProfileStore, optional): The store of the profiles. Defaults to the configured one.
+
+    Returns:
+        Dict: The number of planned and skipped profiles, the failures (profile name -> error), the elapsed
+              seconds, the throughput in profiles per second and the seed of the run.
+    """
+    seed = int(np.random.SeedSequence().entropy % 2 ** 63) if seed is None else seed
+    store = get_profile_store() if store is None else store
+    done = read_journal(journal) if journal is not None else set()
+    pending = [name for name in profiles if Path(name).name not in done]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+
+    planned, failures = 0, {}
+    start = time.perf_counter()
+    with open(journal, "a") if journal is not None else open(os.devnull, "w") as log:
+
+        def record(name: str, error: Optional[BaseException]):
+            nonlocal planned
+            if error is None:
+                planned += 1
+                log.write(f"{Path(name).name}\n")
+                log.flush()
+            else:
+                failures[Path(name).name] = f"{type(error).__name__}: {error}"
+            if progress is not None:
+                progress(planned + len(failures), len(pending))
+
+        if workers == 1:
+            init_worker(df, servings, neighbors, store)
+            for name in pending:
+                try:
+                    plan_profile(name, seed)
+                    record(name, None)
+                except Exception as e:
+                    record(name, e)
+        else:
+            # Forked workers inherit the parent's data without copying it; other platforms pickle it once per worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            initargs = (df, servings, neighbors, store)
+            with ProcessPoolExecutor(workers, context, initializer=init_worker, initargs=initargs) as executor:
+                futures = {executor.submit(plan_profile, name, seed): name for name in pending}
+                for future in as_completed(futures):
+                    record(futures[future], future.exception())
+
+    seconds = time.perf_counter() - start
+    return {
+        "planned": planned,
+        "skipped": len(profiles) - len(pending),
+        "failures": failures,
+        "seconds": seconds,
+        "profiles_per_second": planned / seconds if seconds > 0 else 0.0,
+        "seed": seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--directory", type=Path, default=None, help="directory of JSON profiles (default: the configured profile store)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPUs)")
+    parser.add_argument("--run-id", default=None, help="id of the run to resume (default: the current ISO week)")
+    parser.add_argument("--restart", action="store_true", help="plan every profile again, ignoring the journal")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the run (default: random)")
+    args = parser.parse_args()
+
+    year, week, _ = date.today().isocalendar()
+    run_id = args.run_id or f"{year}-W{week:02d}"
+    journal = journal_path(run_id, args.directory or PROCESSED_DATA_PATH)
+    if args.restart and journal.exists():
+        journal.unlink()
+
+    dataloader = DataLoader()
+    nutritional_facts_file = Path("nutritional-facts.csv")
+    df = dataloader.load_csv(nutritional_facts_file)
+    servings = dataloader.load_json(Path("food-servings.json"))
+    neighbors = NeighborIndex.load_or_build(df, RAW_DATA_PATH / nutritional_facts_file, PROCESSED_DATA_PATH / "neighbors.npz")
+
+    store = get_profile_store() if args.directory is None else JsonProfileStore(args.directory)
+    profiles = discover_profiles(store)
+    default_location = PROFILE_DATABASE_PATH if PROFILE_STORE == "sqlite" else PROCESSED_DATA_PATH
+    print(f"Run {run_id}: {len(profiles)} profiles in {args.directory or default_location}")
+    results = generate_all(
+        profiles,
+        df,
+        servings,
+        neighbors,
+        args.workers,
+        journal,
+        args.seed,
+        progress=lambda done, total: print(f"{done}/{total} profiles", end="\r"),
+        store=store
+    )
+
+    print(
+        f"\nPlanned {results['planned']} profiles ({results['skipped']} already done) in {results['seconds']:.2f}s, "
+        f"{results['profiles_per_second']:.1f} profiles/s, seed {results['seed']}"
+    )
+    for name, error in results["failures"].items():
+        print(f"Failed {name}: {error}")
+    if results["failures"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Recall@k and latency of the approximate similarity search against the exact one.
+
+The nutritional dataset only has a few hundred foods, so by default it is inflated to a catalog of the size
+we expect from branded products by adding noisy copies of every food (in its own category).
+
+    python -m food_recommender_system.benchmarks.ann_recall --size 500000 --k 10 --probes 1 4 8 16 32
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from food_recommender_system.ann import ExactSearch, IVFSearch
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.dataloader import DataLoader
+
+
+def inflate(df: pd.DataFrame, size: int, seed: int = 0) -> pd.DataFrame:
+    """Return a DataFrame of (at least) size foods, made of copies of df with log-normal noise on every nutrient."""
+    rng = np.random.default_rng(seed)
+    copies = max(1, -(-size // len(df)))
+    inflated = pd.concat([df] * copies, ignore_index=True)
+
+    numbers = inflated.columns.difference(["Food Name", "Category Name"], sort=False)
+    inflated[numbers] = inflated[numbers].to_numpy() * rng.lognormal(0, 0.3, size=(len(inflated), len(numbers)))
+    inflated["Food Name"] = inflated["Food Name"] + " #" + (inflated.index // len(df)).astype(str)
+    return inflated
+
+
+def timed_search(catalog: FoodCatalog, queries: list, k: int, same_category: bool) -> tuple:
+    """Return the top-k rows of every query and the mean latency of a query, in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for food_name in queries:
+        rows, _ = catalog.similar_foods(food_name, same_category=same_category)
+        results.append(rows[:k])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall_at_k(exact: list, approximate: list, k: int) -> float:
+    """Fraction of the exact top-k foods also returned by the approximate search, averaged over the queries."""
+    return float(np.mean([len(np.intersect1d(e[:k], a[:k])) / max(1, min(k, len(e))) for e, a in zip(exact, approximate)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000, help="number of foods of the benchmark catalog")
+    parser.add_argument("--k", type=int, default=10, help="number of similar foods compared")
+    parser.add_argument("--queries", type=int, default=200, help="number of random queries")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="n_probe values to test")
+    parser.add_argument("--all-categories", action="store_true", help="search the whole catalog instead of the food's category")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = DataLoader().load_csv(Path("nutritional-facts.csv")).fillna(0)
+    if args.size > len(df):
+        df = inflate(df, args.size, args.seed)
+
+    catalog = FoodCatalog.from_dataframe(df)
+    rng = np.random.default_rng(args.seed)
+    queries = catalog.names[rng.choice(len(catalog), min(args.queries, len(catalog)), replace=False)].tolist()
+    same_category = not args.all_categories
+
+    catalog.use_search(ExactSearch())
+    exact, exact_latency = timed_search(catalog, queries, args.k, same_category)
+
+    start = time.perf_counter()
+    search = IVFSearch(catalog.matrix, seed=args.seed)
+    build_time = time.perf_counter() - start
+    catalog.use_search(search)
+
+    print(f"{len(catalog)} foods, {search.n_lists} clusters built in {build_time:.2f}s, {len(queries)} queries, k={args.k}")
+    print(f"{'search':>12} {'recall@k':>10} {'ms/query':>10} {'speedup':>8}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_latency:>10.3f} {1.0:>8.1f}")
+
+    for n_probe in args.probes:
+        search.n_probe = n_probe
+        approximate, latency = timed_search(catalog, queries, args.k, same_category)
+        print(
+            f"{f'n_probe={n_probe}':>12} {recall_at_k(exact, approximate, args.k):>10.3f} "
+            f"{latency:>10.3f} {exact_latency / latency:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Lunch and dinner allocation time with the dinners drawn from the candidate meals not sampled as lunches
+(a list membership test of every candidate against the lunches, comparing nested lists) against drawing
+both as one permutation of the candidate indices, and the time of a monthly plan.
+
+The candidate meals are the lunches and dinners generated for the default profile, repeated to simulate
+larger servings budgets.
+
+    python -m food_recommender_system.benchmarks.meal_allocation --repeats 200
+"""
+import argparse
+import random
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from food_recommender_system.config import MEAL_GENERATION_CATEGORIES
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.mealgen import allocate_meals, build_meal_plans, generate_meal, plan_data
+from food_recommender_system.profiler import UserProfiler
+
+
+def by_membership(meals: list, rng: random.Random) -> tuple:
+    """Draw the lunches and dinners as the weekly plan did before."""
+    lunches = rng.sample(meals, 7)
+    meals = [meal for meal in meals if meal not in lunches]
+    return lunches, rng.sample(meals, 7)
+
+
+def by_index(meals: list, categories: list, rng: np.random.Generator) -> tuple:
+    """Draw the lunches and dinners as one permutation of the candidate indices."""
+    selected = allocate_meals(categories, 14, rng)
+    return [meals[index] for index in selected[0::2]], [meals[index] for index in selected[1::2]]
+
+
+def median_ms(function, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", type=Path, default=Path("default.json"), help="profile in data/processed")
+    parser.add_argument("--repeats", type=int, default=200, help="number of allocations timed for every size")
+    parser.add_argument("--weeks", type=int, default=4, help="number of weeks of the monthly plan")
+    args = parser.parse_args()
+
+    dataloader = DataLoader()
+    df = dataloader.load_csv(Path("nutritional-facts.csv"))
+    servings = dataloader.load_json(Path("food-servings.json"))
+    user_profiler = UserProfiler.load_profile(args.profile)
+    preferences = (user_profiler.get_food_preferences(), user_profiler.get_seasonal_preferences())
+
+    preferences_df, pools, filtered_df = plan_data(df, *preferences, user_profiler.get_intolerances())
+    rng = np.random.default_rng(0)
+    meals, categories = [], []
+    for category, info in servings.items():
+        if category in MEAL_GENERATION_CATEGORIES and len(pools.pool(category)) > 0:
+            for _ in range(info["frequency_per_week"]):
+                meals.append(generate_meal(preferences_df, filtered_df, category, pools=pools, rng=rng))
+                categories.append(category)
+
+    print(f"{args.profile} (median of {args.repeats} allocations)")
+    print(f"{'candidates':>10} {'membership ms':>14} {'index ms':>9}")
+    for scale in [1, 4, 16]:
+        candidates, candidate_categories = meals * scale, categories * scale
+        membership = median_ms(lambda: by_membership(candidates, random.Random(0)), args.repeats)
+        index = median_ms(lambda: by_index(candidates, candidate_categories, np.random.default_rng(0)), args.repeats)
+        print(f"{len(candidates):>10} {membership:>14.3f} {index:>9.3f}   ({membership / index:.1f}x faster)")
+
+    start = time.perf_counter()
+    build_meal_plans(df, servings, *preferences, user_profiler.get_intolerances(), seed=0, weeks=args.weeks, window=3)
+    print(f"{args.weeks}-week plan with a no-repeat window of 3: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
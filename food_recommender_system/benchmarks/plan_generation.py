@@ -0,0 +1,74 @@
+"""
+Weekly plan generation time with the preferences grouped once per plan (FoodPools shared by all the meals)
+against grouping them again for every meal, as the generators did before, and with the similar food lookups
+memoized across the plans (one AlternativesCache for all of them) instead of within each plan.
+
+The plan of the default profile is generated with the same seeds in every mode, without saving the profile.
+
+    python -m food_recommender_system.benchmarks.plan_generation --plans 20
+"""
+import argparse
+import random
+import statistics
+import time
+from pathlib import Path
+from unittest import mock
+
+import food_recommender_system.mealgen as mealgen
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.profiler import UserProfiler
+from food_recommender_system.recommender import AlternativesCache
+
+
+def without_pools(generator):
+    """Wrap a generator so that it ignores the pools of the plan and groups the preferences again."""
+    return lambda *args: generator(*args[:-3], pools=None, alternatives=args[-2], rng=args[-1])
+
+
+def timed_plans(df, servings, user_profiler: UserProfiler, plans: int, alternatives: AlternativesCache = None) -> tuple:
+    """Return the generated plans and the median time of a plan, in milliseconds."""
+    results, times = [], []
+    for seed in range(plans):
+        random.seed(seed)
+        start = time.perf_counter()
+        results.append(mealgen.generate_weekly_meal_plan(df, servings, user_profiler, Path("benchmark.json"), alternatives=alternatives))
+        times.append(time.perf_counter() - start)
+    return results, statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", type=Path, default=Path("default.json"), help="profile in data/processed")
+    parser.add_argument("--plans", type=int, default=20, help="number of plans generated in each mode")
+    args = parser.parse_args()
+
+    dataloader = DataLoader()
+    df = dataloader.load_csv(Path("nutritional-facts.csv"))
+    servings = dataloader.load_json(Path("food-servings.json"))
+    user_profiler = UserProfiler.load_profile(args.profile)
+
+    per_meal = {name: without_pools(getattr(mealgen, name)) for name in ["generate_meal", "generate_breakfast", "generate_snack"]}
+
+    with mock.patch.object(UserProfiler, "save_profile"):
+        shared_plans, shared = timed_plans(df, servings, user_profiler, args.plans)
+        alternatives = AlternativesCache()
+        cached_plans, cached = timed_plans(df, servings, user_profiler, args.plans, alternatives)
+        with mock.patch.multiple(mealgen, **per_meal):
+            per_meal_plans, grouped_per_meal = timed_plans(df, servings, user_profiler, args.plans)
+
+    if not shared_plans == per_meal_plans == cached_plans:
+        raise RuntimeError("The two modes generated different plans")
+
+    print(f"{args.profile} (median of {args.plans} plans)")
+    print(f"{'preferences grouped':>20} {'ms/plan':>8}")
+    print(f"{'per meal':>20} {grouped_per_meal:>8.2f}")
+    print(f"{'once per plan':>20} {shared:>8.2f}   ({grouped_per_meal / shared:.1f}x faster)")
+    stats = alternatives.stats()
+    print(
+        f"{'+ shared cache':>20} {cached:>8.2f}   ({grouped_per_meal / cached:.1f}x faster, "
+        f"{stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.2f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Nutrition of weekly plans computed meal by meal with compute_meal_calories (as the loop over foods did before,
+with two DataFrame scans per food) against the vectorized PlanNutrition, which also computes every macronutrient.
+
+Both compute the calories of the main and alternative option of every meal of seeded plans of the default profile.
+
+    python -m food_recommender_system.benchmarks.plan_nutrition --plans 20
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from pathlib import Path
+
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.mealgen import build_weekly_meal_plan
+from food_recommender_system.nutrition import OPTIONS, PlanNutrition
+from food_recommender_system.profiler import UserProfiler
+
+
+def meal_by_meal(meals: dict, df, servings) -> np.ndarray:
+    """Return the calories of every slot and option, scanning the DataFrame for every food."""
+    calories = []
+    for entries in meals.values():
+        for entry in entries:
+            row = []
+            for foods in entry[:len(OPTIONS)]:
+                total = 0
+                for food_name in foods:
+                    food_info = DataLoader.get_nutritional_info(df, food_name, only_numbers=False)
+                    category = df[df["Food Name"] == food_name]["Category Name"].values[0]
+                    total += food_info["Calories"].fillna(0).values[0] * servings[category]["serving_size"] / 100
+                row.append(total)
+            calories.append(row)
+    return np.array(calories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", type=Path, default=Path("default.json"), help="profile in data/processed")
+    parser.add_argument("--plans", type=int, default=20, help="number of plans")
+    args = parser.parse_args()
+
+    dataloader = DataLoader()
+    df = dataloader.load_csv(Path("nutritional-facts.csv"))
+    servings = dataloader.load_json(Path("food-servings.json"))
+    profile = UserProfiler.load_profile(args.profile)
+    plans = [
+        build_weekly_meal_plan(
+            df, servings, profile.get_food_preferences(), profile.get_seasonal_preferences(), profile.get_intolerances(), seed=seed
+        )
+        for seed in range(args.plans)
+    ]
+
+    loop_times, vectorized_times = [], []
+    for meals in plans:
+        start = time.perf_counter()
+        expected = meal_by_meal(meals, df, servings)
+        loop_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        nutrition = PlanNutrition.of(meals, df, servings)
+        vectorized_times.append(time.perf_counter() - start)
+
+        if not np.allclose(nutrition.per_meal[:, :, nutrition.nutrients.index("Calories")], expected):
+            raise RuntimeError("The two methods computed different calories")
+
+    loop, vectorized = statistics.median(loop_times) * 1000, statistics.median(vectorized_times) * 1000
+    print(f"{args.profile} (median of {args.plans} plans)")
+    print(f"{'nutrition':>12} {'ms/plan':>8}")
+    print(f"{'per food':>12} {loop:>8.2f}   (calories only)")
+    print(f"{'vectorized':>12} {vectorized:>8.2f}   ({loop / vectorized:.0f}x faster, {len(nutrition.nutrients)} nutrients)")
+
+
+if __name__ == "__main__":
+    main()
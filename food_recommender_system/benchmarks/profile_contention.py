@@ -0,0 +1,85 @@
+"""
+Concurrent updates of one profile: processes that all append foods to the preferences of the same profile, as the
+demo and the CLI may change it at the same time, with the JSON files and the SQLite store.
+
+Every writer loads the profile once and then makes its updates, either by setting the field and saving the profile
+(the read-modify-write the callers did before), or with UserProfiler.update_profile, which saves the profile only if
+it was not written since and applies the change again to the stored profile otherwise. The table has the updates
+lost, the conflicts retried and the updates per second of all the writers.
+
+    python -m food_recommender_system.benchmarks.profile_contention --writers 8 --updates 100
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from food_recommender_system.profiler import JsonProfileStore, ProfileCache, ProfileStore, SqliteProfileStore, UserProfiler
+
+PROFILE = "contended.json"
+
+
+def open_store(kind: str, directory: Path) -> ProfileStore:
+    """Return the store of a kind ("json" or "sqlite") in a directory, behind a ProfileCache."""
+    store = JsonProfileStore(directory) if kind == "json" else SqliteProfileStore(directory / "profiles.db")
+    return ProfileCache(store)
+
+
+def write(kind: str, directory: Path, writer: int, updates: int, checked: bool) -> int:
+    """Make the updates of a writer, in a process of its own, and return the number of changes applied."""
+    store = open_store(kind, directory)
+    user = UserProfiler.load_profile(PROFILE, store)
+    changes = 0
+    for update in range(updates):
+        def append(profile: UserProfiler, food=f"{writer}-{update}"):
+            nonlocal changes
+            changes += 1
+            profile.set_food_preferences(profile.get_food_preferences() + [food])
+
+        if checked:
+            user.update_profile(PROFILE, append, store)
+        else:
+            append(user)
+            user.save_profile(PROFILE, store)
+    return changes
+
+
+def measure(kind: str, writers: int, updates: int, checked: bool) -> dict:
+    """Return the updates lost, the conflicts and the updates per second of concurrent writers of a profile."""
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        UserProfiler().save_profile(PROFILE, open_store(kind, directory))
+
+        context = multiprocessing.get_context("fork")
+        start = time.perf_counter()
+        with ProcessPoolExecutor(writers, context) as executor:
+            futures = [executor.submit(write, kind, directory, writer, updates, checked) for writer in range(writers)]
+            changes = sum(future.result() for future in futures)
+        seconds = time.perf_counter() - start
+
+        stored = UserProfiler.load_profile(PROFILE, open_store(kind, directory)).get_food_preferences()
+    return {
+        "lost": writers * updates - len(set(stored)),
+        "conflicts": changes - writers * updates,
+        "throughput": writers * updates / seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8, help="number of writer processes")
+    parser.add_argument("--updates", type=int, default=100, help="number of updates of every writer")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.updates} updates of one profile")
+    print(f"{'store':>8} {'writes':>15} {'lost':>6} {'conflicts':>10} {'updates/s':>10}")
+    for kind in ["json", "sqlite"]:
+        for checked, name in [(False, "save_profile"), (True, "update_profile")]:
+            result = measure(kind, args.writers, args.updates, checked)
+            print(f"{kind:>8} {name:>15} {result['lost']:>6} {result['conflicts']:>10} {result['throughput']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
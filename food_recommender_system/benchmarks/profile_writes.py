@@ -0,0 +1,101 @@
+"""
+Write amplification of profile saves: every save rewriting the whole profile (as save_profile did before) against
+saves of the changed fields only, with the JSON files and the SQLite store.
+
+A copy of the profile goes through the changes of a day of use: choosing the foods of a meal, a mood swap (which
+saved the profile twice) and the jolly reset. For every change, the table has the size of the changed fields as
+compact JSON, and the bytes written by whole rewrites and by saves of the dirty fields: the bytes the process passes
+to write() (the wchar counter of /proc/self/io, so Linux only), including the SQLite WAL.
+
+    python -m food_recommender_system.benchmarks.profile_writes --rounds 50
+"""
+import argparse
+import copy
+import json
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from food_recommender_system.profiler import JsonProfileStore, ProfileStore, SqliteProfileStore, UserProfiler
+
+IO_COUNTERS = Path("/proc/self/io")
+
+
+def bytes_written() -> int:
+    """Return the bytes the process has passed to write() so far."""
+    for line in IO_COUNTERS.read_text().splitlines():
+        if line.startswith("wchar:"):
+            return int(line.split()[1])
+    raise RuntimeError(f"No wchar counter in {IO_COUNTERS}")
+
+
+def changes(user: UserProfiler) -> List[Tuple[str, Callable[[], List[str]]]]:
+    """Return the changes of a day of use, each setting some fields and returning the names of the saves to do."""
+    meals = user.get_meals()
+
+    def choose_foods() -> List[str]:
+        chosen = copy.deepcopy(meals)
+        entry = chosen["Lunch"][0]
+        chosen["Lunch"][0] = [entry[0], entry[1], list(entry[1])]
+        user.set_meals(chosen)
+        return ["save"]
+
+    def mood_swap() -> List[str]:
+        swapped = copy.deepcopy(meals)
+        swapped["Dinner"][0] = [swapped["Dinner"][0][0], swapped["Dinner"][0][1], ["Pizza"]]
+        user.set_used_jolly(True)
+        user.set_meals(swapped)
+        return ["save", "save"]
+
+    def reset_jolly() -> List[str]:
+        user.set_used_jolly(False)
+        return ["save"]
+
+    return [("choose foods", choose_foods), ("mood swap", mood_swap), ("jolly reset", reset_jolly)]
+
+
+def measure(store: ProfileStore, profile: dict, rounds: int, incremental: bool) -> dict:
+    """Return the bytes written and the bytes of the changed fields of every change, over some rounds."""
+    store.save("user.json", profile)
+    user = UserProfiler.load_profile("user.json", store)
+
+    written, changed = {}, {}
+    for _ in range(rounds):
+        for name, change in changes(user):
+            saves = change()
+            fields = {field: getattr(user, field) for field in user.get_dirty_fields()}
+            start = bytes_written()
+            for _ in saves:
+                if incremental:
+                    user.save_profile("user.json", store)
+                else:
+                    store.save("user.json", user.to_dict())
+            written[name] = written.get(name, 0) + bytes_written() - start
+            changed[name] = changed.get(name, 0) + len(json.dumps(fields))
+
+    return {name: (written[name] / rounds, changed[name] / rounds) for name in written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", type=Path, default=Path("default.json"), help="profile in data/processed")
+    parser.add_argument("--rounds", type=int, default=50, help="number of times every change is made")
+    args = parser.parse_args()
+    if not IO_COUNTERS.exists():
+        raise SystemExit(f"{IO_COUNTERS} is needed to count the bytes written")
+
+    profile = UserProfiler.load_profile(args.profile).to_dict()
+    print(f"{args.profile} ({len(json.dumps(profile))} bytes as compact JSON, mean of {args.rounds} rounds)")
+    print(f"{'store':>8} {'change':>14} {'fields B':>10} {'rewrite B':>10} {'dirty B':>10} {'saved':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [("json", JsonProfileStore(Path(directory))), ("sqlite", SqliteProfileStore(Path(directory) / "profiles.db"))]
+        for store_name, store in stores:
+            rewrite = measure(store, profile, args.rounds, incremental=False)
+            incremental = measure(store, profile, args.rounds, incremental=True)
+            for change, (written, changed) in incremental.items():
+                full = rewrite[change][0]
+                print(f"{store_name:>8} {change:>14} {changed:>10.0f} {full:>10.0f} {written:>10.0f} {1 - written / full:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup time of the nutritional dataset: parsing the CSV file against loading its binary cache.
+
+Every path is timed both alone and followed by the preprocessing the API does at startup
+(filling missing values, dropping excluded categories and building the catalog).
+
+    python -m food_recommender_system.benchmarks.startup --repeat 50
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import pandas as pd
+from pathlib import Path
+from shutil import copyfile
+
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.config import RAW_DATA_PATH
+from food_recommender_system.datacache import read_cache, write_cache
+from food_recommender_system.fastapi.utils import EXCLUDED_CATEGORIES
+
+
+def timed(function, repeat: int) -> float:
+    """Return the median time of a function call, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def startup(df: pd.DataFrame) -> FoodCatalog:
+    df = df.fillna(0)
+    df = df[~df["Category Name"].isin(EXCLUDED_CATEGORIES)]
+    return FoodCatalog.from_dataframe(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, default=RAW_DATA_PATH / "nutritional-facts.csv", help="CSV file to load")
+    parser.add_argument("--repeat", type=int, default=20, help="number of timed loads of each path")
+    args = parser.parse_args()
+
+    # Work on a copy, so that the benchmark never leaves a cache next to the real dataset
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / args.source.name
+        copyfile(args.source, source)
+        write_cache(source)
+
+        if not read_cache(source).equals(pd.read_csv(source)):
+            raise RuntimeError("The cache does not match the CSV file")
+
+        paths = {
+            "csv": lambda: pd.read_csv(source),
+            "cache": lambda: read_cache(source),
+            "csv + startup": lambda: startup(pd.read_csv(source)),
+            "cache + startup": lambda: startup(read_cache(source)),
+        }
+        results = {name: timed(function, args.repeat) for name, function in paths.items()}
+
+    print(f"{args.source} (median of {args.repeat} loads)")
+    print(f"{'path':>16} {'ms':>8} {'speedup':>8}")
+    for name, milliseconds in results.items():
+        baseline = results["csv + startup" if "startup" in name else "csv"]
+        print(f"{name:>16} {milliseconds:>8.2f} {baseline / milliseconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import hashlib
+import json
+import mmap
+import weakref
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from food_recommender_system.ann import ExactSearch, IVFSearch
+from food_recommender_system.atomicfile import atomic_write
+from food_recommender_system.config import ANN_MIN_FOODS
+
+NON_NUMERIC_COLUMNS = ["Food Name", "Category Name"]
+
+# Energy density (kcal/g) below LOW_ENERGY_DENSITY is "Low", up to HIGH_ENERGY_DENSITY "Medium", then "High"
+LOW_ENERGY_DENSITY = 1.5
+HIGH_ENERGY_DENSITY = 2.5
+
+# Catalogs already built for live DataFrames, keyed by id(df)
+_CATALOGS: Dict[int, Tuple[weakref.ref, "FoodCatalog"]] = {}
+
+# Catalog files written by FoodCatalog.save() start with CATALOG_MAGIC, followed by the length of a JSON header
+# and by the arrays, each aligned to ALIGNMENT bytes so that it can be mapped in place
+CATALOG_MAGIC = b"FOODCATALOG1"
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SortedNameIndex:
+    """
+    A name to row mapping backed by the sorted names of a catalog, so that it can be memory-mapped
+    instead of being rebuilt as a dict by every process. Duplicated names map to their first row.
+    """
+
+    def __init__(self, sorted_names: np.ndarray, order: np.ndarray):
+        self.sorted_names = sorted_names
+        self.order = order
+
+    def get(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        position = np.searchsorted(self.sorted_names, name)
+        if position < len(self.sorted_names) and self.sorted_names[position] == name:
+            return int(self.order[position])
+        return default
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+
+class FoodCatalog:
+    """
+    An array-backed copy of a nutritional facts DataFrame, built once and reused for every similarity lookup.
+
+    Rows are grouped by category (keeping the DataFrame order inside each category), so that the foods of a
+    category are a contiguous slice of the nutrient matrix.
+
+    Similar foods are found with an exact linear scan, or with an approximate IVFSearch for catalogs with at least
+    ANN_MIN_FOODS foods. The search backend can be swapped at any time with use_search().
+
+    A catalog can be saved to a single file and loaded back as read-only views of a memory map, so that the
+    processes serving the same dataset share its pages instead of holding a copy each.
+    """
+
+    def __init__(
+            self,
+            names: np.ndarray,
+            categories: np.ndarray,
+            columns: list,
+            matrix: np.ndarray,
+            positions: Optional[np.ndarray] = None):
+        self.names = names
+        self.categories = categories
+        self.columns = columns
+        self.matrix = np.ascontiguousarray(matrix)
+        self.matrix.flags.writeable = False
+        # Position of each catalog row in the DataFrame it was built from
+        self.positions = np.arange(len(names)) if positions is None else positions
+        self.norms = np.linalg.norm(self.matrix, axis=1) if self.matrix.shape[1] else np.zeros(len(names))
+
+        # Nutritional facts refer to 100g of food, so the energy density is kcal / 100
+        if "Calories" in columns:
+            self.energy_density = self.matrix[:, columns.index("Calories")] / 100
+        else:
+            self.energy_density = np.full(len(names), np.nan)
+        self.energy_density_class = np.select(
+            [self.energy_density < LOW_ENERGY_DENSITY, self.energy_density <= HIGH_ENERGY_DENSITY],
+            ["Low", "Medium"],
+            "High"
+        ).astype(object)
+
+        self.index = {}
+        for row, name in enumerate(self.names):
+            self.index.setdefault(name, row)
+
+        self.category_ranges = {}
+        for row, category in enumerate(self.categories):
+            start, _ = self.category_ranges.get(category, (row, row))
+            self.category_ranges[category] = (start, row + 1)
+
+        self.search = IVFSearch(self.matrix) if len(names) >= ANN_MIN_FOODS else ExactSearch()
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "FoodCatalog":
+        """Build a catalog from a DataFrame with "Food Name", "Category Name" and numeric nutrient columns."""
+        codes, _ = pd.factorize(df["Category Name"])
+        order = np.argsort(codes, kind="stable")
+
+        numbers = df.drop(columns=NON_NUMERIC_COLUMNS)
+        # Compact DataFrames (all float32 nutrients) keep a float32 matrix
+        dtype = np.float32 if len(numbers.columns) and (numbers.dtypes == np.float32).all() else np.float64
+        return cls(
+            names=df["Food Name"].to_numpy(dtype=object)[order],
+            categories=df["Category Name"].to_numpy(dtype=object)[order],
+            columns=numbers.columns.tolist(),
+            matrix=numbers.to_numpy(dtype=dtype)[order],
+            positions=order
+        )
+
+    @classmethod
+    def for_dataframe(cls, df: pd.DataFrame) -> "FoodCatalog":
+        """
+        Return the catalog of a DataFrame, building it on first use.
+
+        The catalog is cached for as long as the DataFrame is alive, so the DataFrame must not be modified
+        in place after its first lookup.
+        """
+        cached = _CATALOGS.get(id(df))
+        if cached is not None and cached[0]() is df:
+            return cached[1]
+
+        catalog = cls.from_dataframe(df)
+        catalog.register(df)
+        return catalog
+
+    def register(self, df: pd.DataFrame):
+        """Make this catalog the one for_dataframe() returns for a DataFrame, for as long as the DataFrame is alive."""
+        key = id(df)
+        _CATALOGS[key] = (weakref.ref(df, lambda _: _CATALOGS.pop(key, None)), self)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Return a DataFrame with the content of the catalog, in catalog order.
+
+        The nutrient columns are a view of the catalog matrix, not a copy. If the catalog rows are the positions
+        of the DataFrame (as for a loaded catalog), the catalog is registered as the catalog of the DataFrame.
+        """
+        df = pd.DataFrame(self.matrix, columns=self.columns, copy=False)
+        df.insert(0, "Food Name", self.names)
+        df.insert(1, "Category Name", self.categories)
+        if np.array_equal(self.positions, np.arange(len(self))):
+            self.register(df)
+        return df
+
+    def save(self, path: Path, source_hash: str = ""):
+        """
+        Atomically write the catalog to a single file that load() can memory-map.
+
+        Args:
+            path (Path): Where the catalog is stored.
+            source_hash (str, optional): Hash of the file the catalog was built from, see load_or_build().
+        """
+        names = self.names.astype(str)
+        name_order = np.argsort(names, kind="stable")
+        category_names = list(self.category_ranges)
+        arrays = {
+            "matrix": self.matrix,
+            "norms": self.norms,
+            "energy_density": self.energy_density,
+            "energy_density_class": self.energy_density_class.astype(str),
+            "names": names,
+            "categories": self.categories.astype(str),
+            "sorted_names": names[name_order],
+            "name_order": name_order,
+            "category_names": np.array(category_names, dtype=str),
+            "category_ranges": np.array(
+                [self.category_ranges[category] for category in category_names], dtype=np.int64
+            ).reshape(-1, 2),
+        }
+
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _aligned(offset + array.nbytes)
+        header = json.dumps({"source_hash": source_hash, "columns": self.columns, "arrays": layout}).encode()
+        start = _aligned(len(CATALOG_MAGIC) + 8 + len(header))
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path, "wb") as file:
+            file.write(CATALOG_MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, array in arrays.items():
+                file.seek(start + layout[name]["offset"])
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(start + offset)
+
+    @staticmethod
+    def source_hash_of(path: Path) -> Optional[str]:
+        """Return the source hash a catalog file was saved with, or None if the file is missing or not a catalog."""
+        try:
+            with open(path, "rb") as file:
+                if file.read(len(CATALOG_MAGIC)) != CATALOG_MAGIC:
+                    return None
+                header_length = int.from_bytes(file.read(8), "little")
+                return json.loads(file.read(header_length))["source_hash"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load(cls, path: Path) -> "FoodCatalog":
+        """
+        Memory-map a catalog written by save().
+
+        Every array of the loaded catalog is a read-only view of the file pages, shared with every other process
+        mapping the same file. Its rows are the positions of the DataFrame returned by to_dataframe().
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(CATALOG_MAGIC)] != CATALOG_MAGIC:
+            raise ValueError(f"'{path}' is not a food catalog file.")
+        header_start = len(CATALOG_MAGIC) + 8
+        header_length = int.from_bytes(buffer[len(CATALOG_MAGIC):header_start], "little")
+        header = json.loads(buffer[header_start:header_start + header_length])
+        start = _aligned(header_start + header_length)
+
+        arrays = {}
+        for name, layout in header["arrays"].items():
+            dtype = np.dtype(layout["dtype"])
+            count = int(np.prod(layout["shape"]))
+            arrays[name] = np.frombuffer(buffer, dtype, count, start + layout["offset"]).reshape(layout["shape"])
+
+        catalog = cls.__new__(cls)
+        catalog.names = arrays["names"]
+        catalog.categories = arrays["categories"]
+        catalog.columns = header["columns"]
+        catalog.matrix = arrays["matrix"]
+        catalog.positions = np.arange(len(catalog.names))
+        catalog.norms = arrays["norms"]
+        catalog.energy_density = arrays["energy_density"]
+        catalog.energy_density_class = arrays["energy_density_class"]
+        catalog.index = SortedNameIndex(arrays["sorted_names"], arrays["name_order"])
+        catalog.category_ranges = {
+            category: (int(start), int(stop))
+            for category, (start, stop) in zip(arrays["category_names"].tolist(), arrays["category_ranges"])
+        }
+        catalog.search = IVFSearch(catalog.matrix) if len(catalog.names) >= ANN_MIN_FOODS else ExactSearch()
+        return catalog
+
+    @classmethod
+    def load_or_build(cls, path: Path, source_hash: str, load_dataframe: Callable[[], pd.DataFrame]) -> "FoodCatalog":
+        """
+        Memory-map a saved catalog, building and saving it first if it is missing or was built from another source.
+
+        Args:
+            path (Path): Where the catalog is stored.
+            source_hash (str): Hash of the current content of the source file.
+            load_dataframe (Callable): Returns the preprocessed DataFrame to build the catalog from.
+                                       It is only called when the catalog has to be rebuilt.
+
+        Returns:
+            FoodCatalog: The loaded catalog.
+        """
+        if cls.source_hash_of(path) != source_hash:
+            cls.from_dataframe(load_dataframe()).save(path, source_hash)
+        return cls.load(path)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def version(self) -> str:
+        """
+        A digest of the content of the catalog (names, categories, columns and nutrient values), computed on
+        first use. Catalogs built from equal DataFrames have the same version.
+        """
+        if getattr(self, "_version", None) is None:
+            digest = hashlib.sha256()
+            for values in (self.names, self.categories, self.columns):
+                digest.update("\0".join(map(str, values)).encode())
+                digest.update(b"\1")
+            digest.update(np.ascontiguousarray(self.matrix).tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+    def row_of(self, food_name: str) -> Optional[int]:
+        """Return the catalog row of a food, or None if the food is unknown."""
+        return self.index.get(food_name)
+
+    def position_of(self, food_name: str) -> Optional[int]:
+        """Return the position of a food in the DataFrame the catalog was built from, or None if the food is unknown."""
+        row = self.row_of(food_name)
+        return None if row is None else int(self.positions[row])
+
+    def nutrients(self, food_name: str) -> Optional[np.ndarray]:
+        """Return a read-only view of the nutrient values of a food, or None if the food is unknown."""
+        row = self.row_of(food_name)
+        return None if row is None else self.matrix[row]
+
+    def use_search(self, search):
+        """
+        Set the backend used to find similar foods, e.g. ExactSearch() to fall back to exact search,
+        or IVFSearch(catalog.matrix, n_probe=...) to trade recall for latency.
+        """
+        self.search = search
+
+    def category_rows(self, category: str) -> Tuple[int, int]:
+        """Return the (start, stop) rows of a category, an empty range if the category is unknown."""
+        return self.category_ranges.get(category, (0, 0))
+
+    def cosine_similarity(self, row: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Compute the cosine similarity between one row and the rows in [start, stop).
+        Similarity is 0 when either vector has a zero norm.
+        """
+        stop = len(self) if stop is None else stop
+        dots = self.matrix[start:stop] @ self.matrix[row]
+        return self._divide(dots, self.norms[start:stop] * self.norms[row])
+
+    def cosine_similarity_rows(self, row: int, rows: np.ndarray) -> np.ndarray:
+        """Compute the cosine similarity between one row and the given rows."""
+        dots = self.matrix[rows] @ self.matrix[row]
+        return self._divide(dots, self.norms[rows] * self.norms[row])
+
+    def cosine_similarities(self, rows: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Compute the cosine similarity between several rows and the rows in [start, stop) with a single
+        matrix-matrix product. Row i of the result holds the similarities of rows[i].
+        """
+        stop = len(self) if stop is None else stop
+        dots = self.matrix[rows] @ self.matrix[start:stop].T
+        return self._divide(dots, np.outer(self.norms[rows], self.norms[start:stop]))
+
+    @staticmethod
+    def _divide(dots: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+    def _scope(self, row: int, same_category: bool = True, category: Optional[str] = None) -> Tuple[int, int]:
+        if category is not None:
+            return self.category_rows(category)
+        if same_category:
+            return self.category_rows(self.categories[row])
+        return 0, len(self)
+
+    def _rank(
+            self,
+            row: int,
+            rows: np.ndarray,
+            similarities: np.ndarray,
+            low_density: bool) -> Tuple[np.ndarray, np.ndarray]:
+        keep = self.names[rows] != self.names[row]
+        rows, similarities = rows[keep], similarities[keep]
+
+        if low_density:
+            order = np.lexsort((similarities, self.energy_density[rows]))
+        else:
+            order = np.argsort(-similarities, kind="stable")
+        return rows[order], similarities[order]
+
+    def similar_foods(
+            self,
+            food_name: str,
+            same_category: bool = True,
+            category: Optional[str] = None,
+            low_density: bool = False) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Rank the foods similar to the given one.
+
+        Args:
+            food_name (str): The name of the food to find similar foods for.
+            same_category (bool, optional): If True, only consider foods in the same category. Defaults to True.
+            category (str, optional): Consider the foods of this category instead of the food's own one.
+            low_density (bool, optional): If True, rank by ascending energy density and then by ascending similarity,
+                                          otherwise by descending similarity. Defaults to False.
+
+        Returns:
+            tuple: The catalog rows of the similar foods and their similarity scores, or None if the food is unknown.
+                   Foods with the same ranking keys keep the catalog order. With an approximate search backend,
+                   only the foods found by the backend are ranked.
+        """
+        row = self.row_of(food_name)
+        if row is None:
+            return None
+
+        start, stop = self._scope(row, same_category, category)
+        candidates = self.search.candidates(self.matrix[row], start, stop)
+        if candidates is None:
+            return self._rank(row, np.arange(start, stop), self.cosine_similarity(row, start, stop), low_density)
+
+        return self._rank(row, candidates, self.cosine_similarity_rows(row, candidates), low_density)
+
+    def similar_foods_batch(
+            self,
+            queries: List[Tuple[str, Optional[str], bool]]) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Rank the similar foods of many foods at once, with one matrix-matrix product per category involved.
+
+        Args:
+            queries (list): (food_name, category, low_density) tuples, as the arguments of similar_foods.
+                            A None category means the food's own category.
+
+        Returns:
+            list: The result of similar_foods for each query, in query order.
+        """
+        # An approximate backend scores different foods for every query
+        if not isinstance(self.search, ExactSearch):
+            return [
+                self.similar_foods(food_name, category=category, low_density=low_density)
+                for food_name, category, low_density in queries
+            ]
+
+        results = [None] * len(queries)
+
+        # Group the known foods by the category range they are compared against
+        scopes = {}
+        for position, (food_name, category, _) in enumerate(queries):
+            row = self.row_of(food_name)
+            if row is not None:
+                scopes.setdefault(self._scope(row, category=category), []).append((position, row))
+
+        for (start, stop), members in scopes.items():
+            rows = np.array([row for _, row in members], dtype=np.intp)
+            similarities = self.cosine_similarities(rows, start, stop)
+            for (position, row), row_similarities in zip(members, similarities):
+                results[position] = self._rank(row, np.arange(start, stop), row_similarities, queries[position][2])
+
+        return results
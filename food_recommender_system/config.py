@@ -13,6 +13,45 @@ LACTOSE_INTOLERANCE = ["Dairy", "Dairy Breakfast"]
 GLUTEN_INTOLERANCE = ["Grains", "Baked Products", "Baked Products Breakfast"]
 LACTOSE_AND_GLUTEN_INTOLERANCE = LACTOSE_INTOLERANCE + GLUTEN_INTOLERANCE
 
+# Number of neighbors kept for each food in the persisted neighbor index
+NEIGHBORS_K = 10
+
+# Approximate similarity search, used by catalogs with at least ANN_MIN_FOODS foods:
+# clusters probed by each query (the recall/latency knob), minimum number of foods scored
+# and size of the categories that are always searched exactly
+ANN_MIN_FOODS = 50000
+ANN_PROBES = 8
+ANN_MIN_CANDIDATES = 100
+ANN_EXACT_BELOW = 2048
+
+# Number of generated weekly plans kept by the API plan cache
+PLAN_CACHE_SIZE = 1024
+
+# Number of users whose preferred foods and alternatives dataset are kept, to regenerate their meals one at a time
+PLAN_DATA_CACHE_SIZE = 64
+
+# Where the user profiles are kept: "json" (one file per user in PROCESSED_DATA_PATH) or "sqlite" (PROFILE_DATABASE_PATH)
+PROFILE_STORE = "json"
+PROFILE_DATABASE_PATH = Path(os.path.join(PROCESSED_DATA_PATH, 'profiles.db'))
+
+# Number of profiles kept in memory by the profile store, validated against the store on every load (0 disables it)
+PROFILE_CACHE_SIZE = 256
+
+# Number of times a profile update is made again, under the lock of the profile, when the profile was written by
+# someone else since it was loaded
+PROFILE_UPDATE_RETRIES = 3
+
+# Relative distance from the daily targets every day of an optimized plan may have
+OPTIMIZER_TOLERANCE = 0.05
+
+# Maximum number of passes over the items of a plan of its optimization, which bounds the search the same way on
+# every machine, so that a seed always gives the same plan
+OPTIMIZER_MAX_PASSES = 10
+
+# Maximum time of the optimization of a plan, in seconds: a safety cap, checked after every pass, which a search
+# bounded by OPTIMIZER_MAX_PASSES (a few tens of milliseconds) does not reach
+OPTIMIZER_TIME_BUDGET = 0.5
+
 MEAL_GENERATION_CATEGORIES = ["Seafood", "Lactose-Free Dairy", "Dairy", "Eggs", "Legumes", "White Meat", "Cured Meat", "Red Meat"]
 
 PREFERENCES = {
@@ -0,0 +1,89 @@
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional
+
+from food_recommender_system.atomicfile import atomic_write
+from food_recommender_system.config import RAW_DATA_PATH
+
+CACHE_SUFFIX = ".npz"
+
+
+def cache_path(source: Path) -> Path:
+    """Return the path of the binary cache of a CSV file, next to it (e.g. nutritional-facts.npz)."""
+    return Path(source).with_suffix(CACHE_SUFFIX)
+
+
+def write_cache(source: Path, df: Optional[pd.DataFrame] = None) -> Path:
+    """
+    Compile a CSV file into a columnar binary cache.
+
+    Numeric columns are stored as one column-major block per dtype, so that loading them is a single read.
+    Text columns are stored as a table of their distinct values plus the (int16, or int32 if needed) id of every
+    row in that table, -1 for missing values.
+
+    Args:
+        source (Path): The CSV file.
+        df (pd.DataFrame, optional): The content of the CSV file, if already loaded with pd.read_csv.
+
+    Returns:
+        Path: The path of the cache.
+    """
+    df = pd.read_csv(source) if df is None else df
+    arrays = {"columns": np.array(df.columns, dtype=str)}
+
+    blocks = {}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            blocks.setdefault(values.dtype.str, []).append(i)
+        else:
+            codes, uniques = pd.factorize(values)
+            arrays[f"text_{i}_ids"] = codes.astype(np.int16 if len(uniques) < 2 ** 15 else np.int32)
+            arrays[f"text_{i}_values"] = np.asarray(uniques, dtype=str)
+
+    for number, (dtype, positions) in enumerate(blocks.items()):
+        arrays[f"block_{number}"] = np.asfortranarray(df.iloc[:, positions].to_numpy(dtype=np.dtype(dtype)))
+        arrays[f"block_{number}_columns"] = np.array(positions)
+
+    path = cache_path(source)
+    with atomic_write(path, "wb") as file:
+        np.savez(file, **arrays)
+    return path
+
+
+def read_cache(source: Path) -> Optional[pd.DataFrame]:
+    """
+    Load the binary cache of a CSV file, with the same content and dtypes pd.read_csv would return.
+
+    Returns:
+        pd.DataFrame: The cached content, or None if there is no cache or it is older than the CSV file.
+    """
+    path = cache_path(source)
+    try:
+        if path.stat().st_mtime < Path(source).stat().st_mtime:
+            return None
+        data = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+
+    with data:
+        columns = data["columns"].tolist()
+        frames = []
+        for key in data.files:
+            if key.startswith("block_") and not key.endswith("_columns"):
+                frames.append(pd.DataFrame(data[key], columns=[columns[i] for i in data[f"{key}_columns"]], copy=False))
+            elif key.endswith("_ids"):
+                ids = data[key]
+                values = data[key.replace("_ids", "_values")].astype(object)[ids]
+                values[ids < 0] = np.nan
+                frames.append(pd.DataFrame({columns[int(key.split("_")[1])]: values}))
+
+    return pd.concat(frames, axis=1)[columns]
+
+
+if __name__ == "__main__":
+    sources = [Path(arg) for arg in sys.argv[1:]] or sorted(RAW_DATA_PATH.glob("*.csv"))
+    for source in sources:
+        print(f"{source} -> {write_cache(source)}")
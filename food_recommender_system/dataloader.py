@@ -1,22 +1,41 @@
+import hashlib
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
+from food_recommender_system.catalog import NON_NUMERIC_COLUMNS, FoodCatalog
 from food_recommender_system.config import RAW_DATA_PATH
+from food_recommender_system.datacache import read_cache
 
 
 class DataLoader:
     """A class to handle loading and preprocessing data for the recommender system."""
 
-    def __init__(self, base_path: Path = RAW_DATA_PATH):
+    def __init__(self, base_path: Path = RAW_DATA_PATH, compact: bool = False):
         self.base_path = base_path
+        # In compact mode, load_csv() returns compact DataFrames, with the missing values filled with 0, and keeps the
+        # report of the last one here
+        self.compact = compact
+        self.memory_report = None
 
     def load_csv(self, filename: Path):
-        """Load a CSV file and return a pandas DataFrame."""
-        try:
-            return pd.read_csv(self.base_path / filename)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"CSV file '{filename}' not found.")
+        """
+        Load a CSV file and return a pandas DataFrame.
+        Its binary cache (see datacache.py) is loaded instead when it is newer than the CSV file.
+        In compact mode, the missing values are filled with 0 (as the API does) before the DataFrame is compacted,
+        so that the nutrient columns with no value but zeros and missing values are dropped too.
+        """
+        df = read_cache(self.base_path / filename)
+        if df is None:
+            try:
+                df = pd.read_csv(self.base_path / filename)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"CSV file '{filename}' not found.")
+
+        if self.compact:
+            df, self.memory_report = DataLoader.compact_dataframe(df.fillna(0))
+        return df
 
     def load_json(self, filename: Path):
         """Load a JSON file and return its content as a Python dictionary."""
@@ -26,6 +45,44 @@ class DataLoader:
         except FileNotFoundError:
             raise FileNotFoundError(f"JSON file '{filename}' not found.")
 
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        """Return the SHA-256 hex digest of a file's content."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def compact_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+        """
+        Return a copy of a nutritional DataFrame that takes less memory, and a report of the memory saved.
+
+        Float columns are downcast to float32, "Category Name" becomes a categorical column and the nutrient
+        columns that are zero for every food are dropped, since they do not change any similarity.
+        Missing values are kept, so call it after fill_missing_values() to also drop the columns that are only
+        missing values.
+
+        Args:
+            df (pd.DataFrame): DataFrame containing nutritional information of various foods.
+
+        Returns:
+            Tuple[pd.DataFrame, dict]: The compact DataFrame and a report with the memory usage in bytes
+                                       "before" and "after" compaction, the bytes "saved" and the "dropped_columns".
+        """
+        before = int(df.memory_usage(deep=True).sum())
+        numbers = df.columns.difference(NON_NUMERIC_COLUMNS, sort=False)
+        dropped_columns = [column for column in numbers if (df[column] == 0).all()]
+
+        compact_df = df.drop(columns=dropped_columns)
+        floats = compact_df.select_dtypes("float").columns
+        compact_df = compact_df.astype({column: np.float32 for column in floats})
+        compact_df["Category Name"] = compact_df["Category Name"].astype("category")
+
+        after = int(compact_df.memory_usage(deep=True).sum())
+        return compact_df, {"before": before, "after": after, "saved": before - after, "dropped_columns": dropped_columns}
+
     @staticmethod
     def filter_categories(df: pd.DataFrame, exclude_categories: list) -> pd.DataFrame:
         """Filter out rows with specific category names."""
@@ -36,6 +93,14 @@ class DataLoader:
         """Replace NaN values with a specified fill value."""
         return df.fillna(fill_value, inplace=True)
 
+    @staticmethod
+    def get_catalog(df: pd.DataFrame) -> FoodCatalog:
+        """
+        Return the catalog of a DataFrame, which maps every food name to its row, category and energy density.
+        It is built on the first lookup and reused by every following one.
+        """
+        return FoodCatalog.for_dataframe(df)
+
     @staticmethod
     def get_nutritional_info(df: pd.DataFrame, food_name: str, only_numbers: bool = True) -> pd.DataFrame:
         """
@@ -50,12 +115,28 @@ class DataLoader:
             pd.DataFrame: A DataFrame containing the nutritional information for the specified food item.
                           Returns None if the food item is not found.
         """
-        food_info = df[df["Food Name"] == food_name]
-        if len(food_info) > 0:
-            if only_numbers:
-                return food_info.drop(columns=["Food Name", "Category Name"])
-            return food_info
-        return None
+        position = DataLoader.get_catalog(df).position_of(food_name)
+        if position is None:
+            return None
+        food_info = df.iloc[[position]]
+        if only_numbers:
+            return food_info.drop(columns=NON_NUMERIC_COLUMNS)
+        return food_info
+
+    @staticmethod
+    def get_nutrient_vector(df: pd.DataFrame, food_name: str) -> Optional[np.ndarray]:
+        """
+        Retrieve the numerical nutritional information of a food item as a read-only view, without copying it.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing nutritional information.
+            food_name (str): The name of the food item to retrieve information for.
+
+        Returns:
+            np.ndarray: The nutrient values, in the order of the DataFrame's numerical columns.
+                        Returns None if the food item is not found.
+        """
+        return DataLoader.get_catalog(df).nutrients(food_name)
 
     @staticmethod
     def compute_energy_density(df: pd.DataFrame, food_name: str) -> Tuple[str, float]:
@@ -69,17 +150,15 @@ class DataLoader:
                            ("Low", "Medium", "High") and the energy density value.
                            If the food item is not found, returns a string with an error message.
         """
-        food_info = DataLoader.get_nutritional_info(df, food_name)
-        if isinstance(food_info, str):
-            return food_info
-        energy_density = food_info["Calories"].values[0] / 100
-
-        if energy_density < 1.5:
-            return ("Low", energy_density)
-        if 1.5 <= energy_density <= 2.5:
-            return ("Medium", energy_density)
-        return ("High", energy_density)
+        catalog = DataLoader.get_catalog(df)
+        row = catalog.row_of(food_name)
+        if row is None:
+            return f"No information found for {food_name}"
+        return (catalog.energy_density_class[row], catalog.energy_density[row])
 
     @staticmethod
-    def get_food_category(df: pd.DataFrame, food_name: str) -> str:
-        return df[df["Food Name"] == food_name]["Category Name"].values
+    def get_food_category(df: pd.DataFrame, food_name: str) -> np.ndarray:
+        """Return an array with the category of a food item, empty if the food item is not found."""
+        catalog = DataLoader.get_catalog(df)
+        row = catalog.row_of(food_name)
+        return catalog.categories[[row] if row is not None else []]
@@ -1,11 +1,13 @@
 import streamlit as st
 from pathlib import Path
-import pandas as pd
 from datetime import datetime
 import requests
 import json
 import os
 
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.profiler import get_profile_store
+
 # Set the page config
 st.set_page_config(
     page_title="Food RecSys",
@@ -30,7 +32,7 @@ def setup_paths_and_data():
 
     EXCLUDED_CATEGORIES = ["Baby Foods", "Meals, Entrees, and Side Dishes", "Soups", "Spices", "Greens"]
 
-    food_dataset = pd.read_csv(RAW_DATA_PATH / "nutritional-facts.csv")
+    food_dataset = DataLoader(RAW_DATA_PATH).load_csv(Path("nutritional-facts.csv"))
     food_dataset = food_dataset[~food_dataset['Category Name'].isin(EXCLUDED_CATEGORIES)]
 
     food_seasonality = json.load(open(RAW_DATA_PATH / "food-seasonality.json", "r"))
@@ -87,12 +89,8 @@ def save_metrics():
 
 
 def load_profiles():
-    """Load user profiles from the processed data path."""
-    profiles = []
-    for filename in os.listdir(st.session_state.PROCESSED_DATA_PATH):
-        if filename.endswith(".json"):
-            profiles.append(filename)
-    return profiles
+    """Load the names of the user profiles from the profile store."""
+    return get_profile_store().names()
 
 
 def categorize_foods():
@@ -1,5 +1,5 @@
 import streamlit as st
-from food_recommender_system.profiler import UserProfiler
+from food_recommender_system.profiler import UserProfiler, profile_display_name
 from pathlib import Path
 import pandas as pd
 import time
@@ -36,7 +36,7 @@ def display_user_profile():
 
     selected_profile = st.session_state.selected_profile
     profile = UserProfiler.load_profile(Path(selected_profile))
-    profile_name = selected_profile[:-5].replace('_', ' ').capitalize()
+    profile_name = profile_display_name(selected_profile)
 
     st.title(f"👋 Welcome, {profile_name}!")
 
@@ -135,11 +135,13 @@ def update_meal_selection(profile, today_meal, new_meal, current_meal_time, curr
     """
     Update the meal selection based on user choices.
     """
-    updated_meal = (today_meal[0], today_meal[1], new_meal)
-    meals = profile.get_meals()
-    meals[current_meal_time][current_day] = updated_meal
-    profile.set_meals(meals)
-    profile.save_profile(Path(st.session_state.selected_profile))
+    def choose_meal(profile):
+        meals = profile.get_meals()
+        meals[current_meal_time][current_day] = (today_meal[0], today_meal[1], new_meal)
+        profile.set_meals(meals)
+
+    # The CLI may change the same profile, so the choice is applied again to its latest version on a conflict
+    profile.update_profile(Path(st.session_state.selected_profile), choose_meal)
 
     for chosen_food, original_food, recommended_food in zip(new_meal, today_meal[0], today_meal[1]):
         if chosen_food == recommended_food:
@@ -174,16 +176,18 @@ def display_stress_button(profile, current_meal_time, current_day):
                 if cheat_meal:
                     st.success(f"🍔 Cheat meal granted: {fast_food}")
 
-                    profile.used_jolly = True
+                    def use_cheat_meal(profile):
+                        profile.used_jolly = True
+
+                        meals = profile.get_meals()
+                        meals[current_meal_time][current_day] = (
+                            [fast_food],
+                            [fast_food_alt]
+                        )
 
-                    meals = profile.get_meals()
-                    meals[current_meal_time][current_day] = (
-                        [fast_food],
-                        [fast_food_alt]
-                    )
+                        profile.set_meals(meals)
 
-                    profile.set_meals(meals)
-                    profile.save_profile(Path(st.session_state.selected_profile))
+                    profile.update_profile(Path(st.session_state.selected_profile), use_cheat_meal)
 
                     st.warning("⚠️ Your meal has been updated. Choose your preference below.")
                     st.rerun()
@@ -0,0 +1,227 @@
+"""
+The headless engine of the food recommender system: planning, alternatives, justification and mood swaps as
+functions without prints, sleeps, input() or file writes, usable by bulk jobs and servers as well as the CLI.
+
+Every function returns new data instead of changing its arguments, and long-running ones accept an optional
+progress callback. Saving the results (e.g. to a UserProfiler) is up to the caller.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from food_recommender_system.config import OPTIMIZER_MAX_PASSES, OPTIMIZER_TIME_BUDGET, OPTIMIZER_TOLERANCE
+from food_recommender_system.justificator import compare_meals, find_current_meal, weekly_meals_table, with_chosen_meal
+from food_recommender_system.mealgen import build_meal_plans, build_weekly_meal_plan, regenerate_meal
+from food_recommender_system.moodmod import mood_swap
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.nutrition import PlanNutrition
+from food_recommender_system.optimizer import optimize_weekly_plan
+from food_recommender_system.recommender import (
+    AlternativesCache,
+    get_seasonal_food,
+    get_similar_food,
+    preference_options,
+    resolve_preferences,
+    resolve_seasonal_preferences
+)
+
+# The public functions of the engine, some of them imported from the modules they are implemented in
+__all__ = [
+    "plan_week",
+    "plan_weeks",
+    "optimize_week",
+    "regenerate_slot",
+    "apply_slot",
+    "find_alternatives",
+    "justify",
+    "current_meal",
+    "choose_meal",
+    "mood_swap",
+    "plan_nutrition",
+    "seasonal_foods",
+    "preference_options",
+    "resolve_preferences",
+    "resolve_seasonal_preferences",
+    "weekly_meals_table"
+]
+
+
+def plan_week(
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Generate a weekly meal plan (see mealgen.build_weekly_meal_plan).
+    Args:
+        df (pd.DataFrame): DataFrame containing the food dataset.
+        servings (dict): Dictionary containing the frequency of servings per week for each category.
+        food_preferences (List[str]): The preferred foods.
+        seasonal_preferences (List[str]): The preferred seasonal fruits and vegetables.
+        intolerances (List[str], optional): The categories the user is intolerant to.
+        neighbors (NeighborIndex, optional): Precomputed neighbors of df, used to find similar foods.
+        alternatives (AlternativesCache, optional): Memoizes the similar food lookups.
+        seed (int or np.random.Generator, optional): The seed or Generator the plan is drawn with.
+        progress (Callable[[int, int], None], optional): Called with the number of generated meals and the total.
+    Returns:
+        dict: The generated meals for Breakfast, Snack, Lunch, and Dinner.
+    """
+    return build_weekly_meal_plan(
+        df, servings, food_preferences, seasonal_preferences, intolerances, neighbors, alternatives, seed, progress
+    )
+
+
+def plan_weeks(
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        weeks: int,
+        window: int = 0,
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    Generate the meal plans of consecutive weeks (see mealgen.build_meal_plans), e.g. a monthly plan.
+    Args:
+        weeks (int): The number of weeks to plan.
+        window (int, optional): The number of consecutive lunches and dinners without a repeated main category.
+        The other arguments are the ones of plan_week.
+    Returns:
+        List[dict]: The plan of every week.
+    """
+    return build_meal_plans(
+        df, servings, food_preferences, seasonal_preferences, intolerances, neighbors, alternatives, seed, weeks, window, progress
+    )
+
+
+def optimize_week(
+        meals: dict,
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        targets: Dict[str, float],
+        tolerance: float = OPTIMIZER_TOLERANCE,
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        time_budget: float = OPTIMIZER_TIME_BUDGET,
+        max_passes: int = OPTIMIZER_MAX_PASSES) -> Tuple[dict, dict]:
+    """
+    Move the daily calories and nutrients of a weekly plan towards per-user targets, e.g. {"Calories": 1800,
+    "Protein": 90}, within a tolerance, a maximum number of passes and a time budget in seconds (see
+    optimizer.optimize_meals).
+    Returns:
+        tuple: The optimized copy of the plan, and the report of the search with the remaining gap from the targets.
+    """
+    return optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, tolerance,
+        intolerances, neighbors, alternatives, seed, time_budget, max_passes
+    )
+
+
+def regenerate_slot(
+        meals: dict,
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        meal_name: str,
+        day: int,
+        item: Optional[int] = None,
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None) -> dict:
+    """
+    Regenerate one meal of a weekly plan, or one item of it, within the servings budget of the week
+    (see mealgen.regenerate_meal). Raises a ValueError if the plan has no such meal or item.
+    Returns:
+        dict: The delta of the plan, to apply with apply_slot: the meal name, day and item, and the new
+              main and alternative meal.
+    """
+    return regenerate_meal(
+        meals, df, servings, food_preferences, seasonal_preferences, meal_name, day, item,
+        intolerances, neighbors, alternatives, seed
+    )
+
+
+def apply_slot(meals: dict, delta: dict) -> dict:
+    """Return a copy of the weekly meals with a meal replaced by the one of a regenerate_slot delta."""
+    updated_meals = {meal_name: list(entries) for meal_name, entries in meals.items()}
+    updated_meals[delta["meal"]][delta["day"]] = [delta["main"], delta["alternative"]]
+    return updated_meals
+
+
+def find_alternatives(
+        df: pd.DataFrame,
+        food_name: str,
+        same_category: bool = True,
+        low_density: bool = True,
+        top_k: Optional[int] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None) -> list:
+    """
+    Return the foods similar to a food (see recommender.get_similar_food), or an empty list if the food is unknown.
+    """
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+    similar_foods = find_similar_foods(df, food_name, same_category, low_density, neighbors, top_k)
+    return similar_foods if isinstance(similar_foods, list) else []
+
+
+def justify(df: pd.DataFrame, meal_1: list, meal_2: list, verbose: bool = True) -> list:
+    """Return the comparison of every food of meal_1 with the food of meal_2 in the same position."""
+    comparison = compare_meals(df, meal_1, meal_2, verbose=verbose)
+    if isinstance(comparison, str):
+        raise ValueError(comparison)
+    return comparison
+
+
+def current_meal(meals: dict, meal_name: Optional[str] = None, now: Optional[datetime] = None) -> tuple:
+    """
+    Return the meal name, day of the week, main meal, alternative and chosen meal (or None) of the meal
+    of a weekly plan at a given time, by default now.
+    """
+    return find_current_meal(meals, meal_name, now)
+
+
+def choose_meal(meals: dict, meal_name: str, day: int, choices: List[int]) -> dict:
+    """
+    Return a copy of the weekly meals where the chosen meal of a day is set from the option chosen for every food.
+    Args:
+        meals (dict): The weekly meals.
+        meal_name (str): The meal to choose (e.g., "Lunch").
+        day (int): The day of the week of the meal (0 is Monday).
+        choices (List[int]): For every food of the meal, 1 to keep the main food or 2 to take its alternative.
+                             Any other value keeps the main food.
+    Returns:
+        dict: The updated copy of the weekly meals.
+    """
+    main_meal, alternative_meal = meals[meal_name][day][:2]
+    chosen_meal = [
+        alt_food if choice == 2 else main_food
+        for main_food, alt_food, choice in zip(main_meal, alternative_meal, choices)
+    ]
+    return with_chosen_meal(meals, meal_name, day, chosen_meal)
+
+
+def plan_nutrition(meals: dict, df: pd.DataFrame, servings: dict, nutrients: Optional[List[str]] = None) -> PlanNutrition:
+    """Return the per-meal, per-day and per-week calories and nutrients of a weekly plan (see PlanNutrition)."""
+    return PlanNutrition.of(meals, df, servings, nutrients)
+
+
+def seasonal_foods(df: pd.DataFrame, seasonality: dict, nationality: str = "Italy") -> Dict[str, List[str]]:
+    """Return the fruits and vegetables in season this month."""
+    fruits, vegetables = get_seasonal_food(df, seasonality, nationality)
+    return {"Fruits": fruits, "Vegetables": vegetables}
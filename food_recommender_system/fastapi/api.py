@@ -1,7 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from numpy.linalg import norm
+from typing import Dict, Literal, Optional, List, Union
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -12,6 +11,14 @@ import os
 import logging
 
 import food_recommender_system.fastapi.utils as utils
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.config import OPTIMIZER_TOLERANCE
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.foodids import CompactPlan, FoodTable
+from food_recommender_system.mealgen import FoodPools, allocate_meals, as_generator, category_budget, choose, choose_category
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.optimizer import optimize_meals
+from food_recommender_system.plancache import PlanCache, content_version, plan_key
 
 app = FastAPI()
 
@@ -23,20 +30,45 @@ logger = logging.getLogger(__name__)
 # Load CSV dataset
 BASE_PATH = Path(os.path.join(os.getcwd(), 'data'))
 RAW_DATA_PATH = Path(os.path.join(BASE_PATH, 'raw'))
+PROCESSED_DATA_PATH = Path(os.path.join(BASE_PATH, 'processed'))
 
+
+def load_food_dataset() -> pd.DataFrame:
+    df = DataLoader(RAW_DATA_PATH).load_csv(Path("nutritional-facts.csv"))
+    df.fillna(0, inplace=True)
+    return df[~df['Category Name'].isin(utils.EXCLUDED_CATEGORIES)]
+
+
+# The preprocessed dataset is saved as a catalog file and memory-mapped, so that all the API workers
+# share the same read-only pages of the nutrient matrix instead of holding a copy each
 try:
-    food_dataset = pd.read_csv(Path(RAW_DATA_PATH) / "nutritional-facts.csv")
-    food_dataset.fillna(0, inplace=True)
-    food_dataset = food_dataset[~food_dataset['Category Name'].isin(utils.EXCLUDED_CATEGORIES)]
+    food_catalog = FoodCatalog.load_or_build(
+        Path(PROCESSED_DATA_PATH) / "catalog-api.bin",
+        DataLoader.file_hash(Path(RAW_DATA_PATH) / "nutritional-facts.csv"),
+        load_food_dataset
+    )
+    food_dataset = food_catalog.to_dataframe()
+    food_table = FoodTable.of(food_dataset["Food Name"])
     logger.info("Successfully loaded nutritional-facts.csv dataset.")
     logger.info("This dataset has these categories: %s", food_dataset["Category Name"].unique())
 except Exception as e:
     logger.error(f"Error loading nutritional-facts.csv: {e}")
 
+# Load (or rebuild, if the CSV changed) the precomputed neighbors of the dataset
+neighbor_index = None
+try:
+    neighbor_index = NeighborIndex.load_or_build(
+        food_dataset, Path(RAW_DATA_PATH) / "nutritional-facts.csv", Path(PROCESSED_DATA_PATH) / "neighbors-api.npz"
+    )
+    logger.info("Successfully loaded the neighbor index.")
+except Exception as e:
+    logger.error(f"Error loading the neighbor index: {e}")
+
 # Load JSON dataset
 try:
     with open(Path(RAW_DATA_PATH) / "food-servings.json", "r", encoding="utf-8") as f:
         servings = json.load(f)
+    servings_version = content_version(servings)
     logger.info("Successfully loaded food-servings.json dataset.")
 except Exception as e:
     logger.error(f"Error loading food-servings.json: {e}")
@@ -68,6 +100,25 @@ class RecommenderRequest(BaseModel):
         description="Flag to filter foods with low caloric density.",
         example=True
     )
+    top_k: Optional[int] = Field(
+        None,
+        title="Top K",
+        description="Optional number of similar foods to return. All the similar foods are returned if not set.",
+        example=5,
+        ge=1
+    )
+
+
+class BatchRecommenderRequest(BaseModel):
+    queries: List[RecommenderRequest] = Field(
+        ...,
+        title="Queries",
+        description="The food items to get recommendations for, each with its own options.",
+        example=[
+            {"food_name": "Apple", "low_density": True, "top_k": 3},
+            {"food_name": "Pasta", "category": "Grains", "low_density": False, "top_k": 5}
+        ]
+    )
 
 
 class MoodRequest(BaseModel):
@@ -184,38 +235,172 @@ class MealGeneratorRequest(BaseModel):
         description="A list of foods the user is intolerant to. This field is optional.",
         example=["Dairy"]  # Example intolerances
     )
+    seed: Optional[int] = Field(
+        None,
+        title="Seed",
+        description="The seed the plan is drawn with. The same preferences, intolerances and seed always give the same plan. A random plan is drawn if not set.",
+        example=0,
+        ge=0
+    )
+    targets: Optional[Dict[str, float]] = Field(
+        None,
+        title="Daily Targets",
+        description="Optional daily targets of calories and macronutrients the plan is optimized for.",
+        example={"Calories": 1800, "Protein": 90}
+    )
+    tolerance: float = Field(
+        OPTIMIZER_TOLERANCE,
+        title="Tolerance",
+        description="The relative distance from the daily targets every day of an optimized plan may have.",
+        example=OPTIMIZER_TOLERANCE,
+        gt=0
+    )
+    include_alternatives: Literal["none", "top1", "topk"] = Field(
+        "top1",
+        title="Include Alternatives",
+        description="The alternative meals of every meal: none, the best one, or the top_k best ones.",
+        example="top1"
+    )
+    top_k: int = Field(
+        3,
+        title="Top K",
+        description="The number of alternative meals of every meal with include_alternatives topk, or of /alternatives.",
+        example=3,
+        ge=1,
+        le=10
+    )
+
+    def alternatives_count(self) -> int:
+        return {"none": 0, "top1": 1, "topk": self.top_k}[self.include_alternatives]
+
+
+# A weekly plan sent by a client: {meal name: [[main foods], [alternative foods], ([chosen foods])]}
+PlanMeals = Dict[str, List[List[List[str]]]]
+
+
+class SlotRequest(MealGeneratorRequest):
+    meal: str = Field(
+        ...,
+        title="Meal",
+        description="The meal to regenerate: Breakfast, Snack, Lunch or Dinner.",
+        example="Lunch"
+    )
+    slot: int = Field(
+        ...,
+        title="Slot",
+        description="The position of the meal in the plan: the day of the week (0 is Monday), or 2 * day + n for the n-th snack of a day.",
+        example=2,
+        ge=0
+    )
+    item: Optional[int] = Field(
+        None,
+        title="Item",
+        description="The position of the food to regenerate in the meal. The whole meal is regenerated if not set.",
+        example=None,
+        ge=0
+    )
+    meals: Optional[PlanMeals] = Field(
+        None,
+        title="Meals",
+        description="The current plan. Defaults to the plan generated for the preferences, intolerances and seed.",
+        example=None
+    )
+    slot_seed: Optional[int] = Field(
+        None,
+        title="Slot Seed",
+        description="The seed the new meal is drawn with. A random meal is drawn if not set.",
+        example=None,
+        ge=0
+    )
+
+
+class AlternativesRequest(MealGeneratorRequest):
+    meal: str = Field(
+        ...,
+        title="Meal",
+        description="The meal to find the alternatives of: Breakfast, Snack, Lunch or Dinner.",
+        example="Lunch"
+    )
+    slot: int = Field(
+        ...,
+        title="Slot",
+        description="The position of the meal in the plan: the day of the week (0 is Monday), or 2 * day + n for the n-th snack of a day.",
+        example=2,
+        ge=0
+    )
+    meals: Optional[PlanMeals] = Field(
+        None,
+        title="Meals",
+        description="The current plan. Defaults to the plan generated for the preferences, intolerances and seed.",
+        example=None
+    )
+
+
+def get_similar_meals(
+        meal: list,
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        skip_categories: tuple = (),
+        top_k: int = 1) -> List[list]:
+    """
+    Return the top_k alternative meals of a meal, the i-th one made of the i-th most similar food of every food
+    (or of the food itself if it has fewer similar foods). Foods of skip_categories have no alternative.
+    """
+    if top_k == 0:
+        return []
+
+    similar_meals = [[] for _ in range(top_k)]
+    for food_name in meal:
+        food_category = utils.get_food_category(food_name, food_dataset)
+
+        if food_category not in skip_categories:
+            if food_category == "Fruits":
+                similar_foods = get_recommendation(food_name, user_dataset, top_k=top_k)
+            else:
+                similar_foods = get_recommendation(food_name, food_dataset, top_k=top_k)
+            for i, similar_meal in enumerate(similar_meals):
+                similar_meal.append(similar_foods[i][0] if i < len(similar_foods) else food_name)
+
+    return similar_meals
+
 
+def get_similar_meal(meal: list, user_dataset: pd.DataFrame, food_dataset: pd.DataFrame, skip_categories: tuple = ()) -> list:
+    return get_similar_meals(meal, user_dataset, food_dataset, skip_categories)[0]
 
-def generate_breakfast_or_snack(user_dataset: pd.DataFrame, food_dataset: pd.DataFrame):
+
+def generate_breakfast_or_snack(
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        rng: Optional[np.random.Generator] = None,
+        alternatives: int = 1) -> tuple:
     meal = []
 
     meal.extend([
-        random.choice(
+        choose(
             user_dataset[user_dataset["Category Name"] == "Dairy Breakfast"]["Food Name"].to_list()
             + user_dataset[user_dataset["Category Name"] == "Lactose-Free Dairy Breakfast"]["Food Name"].to_list()
-            + user_dataset[user_dataset["Category Name"] == "Beverages"]["Food Name"].to_list()
+            + user_dataset[user_dataset["Category Name"] == "Beverages"]["Food Name"].to_list(),
+            rng
         ),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Baked Products Breakfast"]["Food Name"].to_list()),
-        random.choice(
+        choose(user_dataset[user_dataset["Category Name"] == "Baked Products Breakfast"]["Food Name"].to_list(), rng),
+        choose(
             user_dataset[user_dataset["Category Name"] == "Sweets Breakfast"]["Food Name"].to_list()
-            + user_dataset[user_dataset["Category Name"] == "Nuts Breakfast"]["Food Name"].to_list()
+            + user_dataset[user_dataset["Category Name"] == "Nuts Breakfast"]["Food Name"].to_list(),
+            rng
         ),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Fruits"]["Food Name"].to_list())
+        choose(user_dataset[user_dataset["Category Name"] == "Fruits"]["Food Name"].to_list(), rng)
     ])
 
-    similar_meal = []
-    for food_name in meal:
-        food_category = utils.get_food_category(food_name, food_dataset)
-        if food_category == "Fruits":
-            similar_foods = get_recommendation(food_name, user_dataset)
-        else:
-            similar_foods = get_recommendation(food_name, food_dataset)
-        similar_meal.append(similar_foods[0][0] if similar_foods else food_name)
-
-    return meal, similar_meal
+    # The alternatives do not draw from rng, so the meal is the same whatever their number
+    return (meal, *get_similar_meals(meal, user_dataset, food_dataset, top_k=alternatives))
 
 
-def generate_lunch_or_dinner(user_dataset: pd.DataFrame, food_dataset: pd.DataFrame, category: str) -> list:
+def generate_lunch_or_dinner(
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        category: str,
+        rng: Optional[np.random.Generator] = None,
+        alternatives: int = 1) -> tuple:
     meal = []
 
     filtered_data = user_dataset[user_dataset["Category Name"] == category]
@@ -225,64 +410,99 @@ def generate_lunch_or_dinner(user_dataset: pd.DataFrame, food_dataset: pd.DataFr
         raise ValueError(f"No food items found for category: {category}")
 
     meal.extend([
-        random.choice(
-            user_dataset[user_dataset["Category Name"].isin(["Grains", "Gluten-Free Grains"])]["Food Name"].to_list()
+        choose(
+            user_dataset[user_dataset["Category Name"].isin(["Grains", "Gluten-Free Grains"])]["Food Name"].to_list(),
+            rng
         ),
-        random.choice(user_dataset[user_dataset["Category Name"] == category]["Food Name"].to_list()),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Oils"]["Food Name"].to_list()),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Sauces"]["Food Name"].to_list()),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Vegetables"]["Food Name"].to_list()),
-        random.choice(user_dataset[user_dataset["Category Name"] == "Fruits"]["Food Name"].to_list())
+        choose(user_dataset[user_dataset["Category Name"] == category]["Food Name"].to_list(), rng),
+        choose(user_dataset[user_dataset["Category Name"] == "Oils"]["Food Name"].to_list(), rng),
+        choose(user_dataset[user_dataset["Category Name"] == "Sauces"]["Food Name"].to_list(), rng),
+        choose(user_dataset[user_dataset["Category Name"] == "Vegetables"]["Food Name"].to_list(), rng),
+        choose(user_dataset[user_dataset["Category Name"] == "Fruits"]["Food Name"].to_list(), rng)
     ])
 
-    similar_meal = []
-    for food_name in meal:
-        food_category = utils.get_food_category(food_name, food_dataset)
+    # Oils have no alternative
+    return (meal, *get_similar_meals(meal, user_dataset, food_dataset, ("Oils",), alternatives))
 
-        if food_category != "Oils":
-            if food_category == "Fruits":
-                similar_foods = get_recommendation(food_name, user_dataset)
-            else:
-                similar_foods = get_recommendation(food_name, food_dataset)
-            similar_meal.append(similar_foods[0][0] if similar_foods else food_name)
 
-    return meal, similar_meal
+def get_recommendation(
+        food_name: str,
+        food_dataset: pd.DataFrame,
+        category: Optional[str] = None,
+        low_density: bool = True,
+        top_k: Optional[int] = None):
 
+    catalog = FoodCatalog.for_dataframe(food_dataset)
+    row = catalog.row_of(food_name)
 
-def get_recommendation(food_name: str, food_dataset: pd.DataFrame, category: Optional[str] = None, low_density: bool = True):
-
-    food_category = category or utils.get_food_category(food_name, food_dataset)
+    food_category = category or (catalog.categories[row] if row is not None else None)
 
     if food_category is None:
         raise HTTPException(status_code=404, detail=f"Error: '{food_name}' category not found.")
 
-    food_A = utils.get_nutritional_info(food_name, food_dataset).to_numpy().flatten()
-    similar_foods = []
-
-    for _, row in food_dataset[food_dataset["Category Name"] == food_category].iterrows():
-        other_food = row["Food Name"]
-        if other_food != food_name:
-            food_B = row.drop(labels=["Food Name", "Category Name"]).to_numpy().flatten()
+    # Serve the first top_k foods from the precomputed neighbors when possible
+    ranking = None
+    if top_k is not None and neighbor_index is not None and row is not None and food_category == catalog.categories[row]:
+        ranking = neighbor_index.similar_foods(food_name, top_k, low_density=low_density, allowed=catalog)
+        if ranking is not None:
+            rows, similarities = ranking
+            names, densities = neighbor_index.names[rows].tolist(), neighbor_index.energy_density(rows).tolist()
 
-            norm_A = norm(food_A)
-            norm_B = norm(food_B)
+    if ranking is None:
+        ranking = catalog.similar_foods(food_name, category=food_category, low_density=low_density)
+        if ranking is None:
+            raise HTTPException(status_code=404, detail=f"Error: '{food_name}' not found.")
+        rows, similarities = ranking
+        rows, similarities = rows[:top_k], similarities[:top_k]
+        names, densities = catalog.names[rows].tolist(), catalog.energy_density[rows].tolist()
 
-            similarity = 0 if norm_A == 0 or norm_B == 0 else np.dot(food_A, food_B) / (norm_A * norm_B)
-            similar_foods.append((other_food, similarity))
+    return format_similar_foods(names, similarities.tolist(), densities, low_density)
 
-    similar_foods.sort(key=lambda x: x[1], reverse=True)
 
+def format_similar_foods(names: list, similarities: list, densities: list, low_density: bool) -> list:
+    # Similar foods are sorted by energy density (ascending) and then by similarity if low_density,
+    # otherwise by similarity only
     if low_density:
-        # First, compute energy density for each food
-        similar_foods = [(food, similarity, utils.compute_energy_density(food, food_dataset)) for food, similarity in similar_foods]
-        # Sort by energy density (ascending) and then by similarity
-        similar_foods.sort(key=lambda x: (x[2] if x[2] is not None else float('inf'), x[1]))
+        return list(zip(names, similarities, densities))
+
+    return list(zip(names, similarities))
+
+
+def get_batch_recommendation(queries: List[RecommenderRequest], food_dataset: pd.DataFrame) -> list:
+    """
+    Answer many recommendation queries at once, comparing all the foods of a category with a single
+    matrix-matrix product. Results are in query order; a query about an unknown food gets its own
+    404 entry instead of failing the whole batch.
+    """
+    catalog = FoodCatalog.for_dataframe(food_dataset)
+    rankings = catalog.similar_foods_batch([(query.food_name, query.category, query.low_density) for query in queries])
+
+    results = []
+    for query, ranking in zip(queries, rankings):
+        if ranking is None:
+            detail = "not found" if query.category else "category not found"
+            results.append({
+                "food_name": query.food_name,
+                "status_code": 404,
+                "detail": f"Error: '{query.food_name}' {detail}."
+            })
+            continue
+
+        rows, similarities = ranking
+        rows, similarities = rows[:query.top_k], similarities[:query.top_k]
+        results.append({
+            "food_name": query.food_name,
+            "status_code": 200,
+            "similar_foods": format_similar_foods(
+                catalog.names[rows].tolist(), similarities.tolist(), catalog.energy_density[rows].tolist(), query.low_density
+            )
+        })
 
-    return similar_foods
+    return results
 
 
 def get_justification(meal_1: list, meal_2: list, food_dataset: pd.DataFrame, verbose: bool = True):
-    df = food_dataset.copy()
+    df = food_dataset
 
     if len(meal_1) != len(meal_2):
         raise HTTPException(status_code=400, detail="Error: The two meals should have the same number of items for a fair comparison.")
@@ -296,7 +516,7 @@ def get_justification(meal_1: list, meal_2: list, food_dataset: pd.DataFrame, ve
         food_2_info = utils.get_nutritional_info(food_2, df, only_numbers=False)
 
         # If either food has missing nutritional information, raise an error
-        if food_1_info.empty or food_2_info.empty:
+        if food_1_info is None or food_2_info is None:
             raise HTTPException(status_code=404, detail=f"Error: Nutritional information for '{food_1}' or '{food_2}' is missing.")
 
         # Initialize the comparison string
@@ -361,50 +581,220 @@ def get_justification(meal_1: list, meal_2: list, food_dataset: pd.DataFrame, ve
     return justification_results
 
 
-def generate_weekly_meals(user_dataset: pd.DataFrame, food_dataset: pd.DataFrame, servings: dict):
+def generate_weekly_meals(
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        servings: dict,
+        seed: Union[None, int, np.random.Generator] = None,
+        alternatives: int = 1):
+    rng = as_generator(seed)
     generated_meals = {"Breakfast": [], "Snack": [], "Lunch": [], "Dinner": []}
     lunches_and_dinners = []
+    categories = []
 
-    df = food_dataset.copy()
+    df = food_dataset
 
     for _ in range(7):
-        breakfast, similar_breakfast = generate_breakfast_or_snack(user_dataset, df)
-        snack_1, similar_snack_1 = generate_breakfast_or_snack(user_dataset, df)
-        snack_2, similar_snack_2 = generate_breakfast_or_snack(user_dataset, df)
-        generated_meals["Breakfast"].append((breakfast, similar_breakfast))
-        generated_meals["Snack"].append((snack_1, similar_snack_1))
-        generated_meals["Snack"].append((snack_2, similar_snack_2))
+        generated_meals["Breakfast"].append(generate_breakfast_or_snack(user_dataset, df, rng, alternatives))
+        generated_meals["Snack"].append(generate_breakfast_or_snack(user_dataset, df, rng, alternatives))
+        generated_meals["Snack"].append(generate_breakfast_or_snack(user_dataset, df, rng, alternatives))
 
+    # The alternatives are only found for the candidate meals drawn as lunches and dinners
     for category, info in servings.items():
         if category in utils.MEAL_GENERATION_CATEGORIES:
             count = info['frequency_per_week']
             for _ in range(count):
-                meal, similar_meal = generate_lunch_or_dinner(user_dataset, df, category)
-                lunches_and_dinners.append((meal, similar_meal))
+                meal, = generate_lunch_or_dinner(user_dataset, df, category, rng, alternatives=0)
+                lunches_and_dinners.append(meal)
+                categories.append(category)
 
-    generated_meals["Lunch"] = random.sample(lunches_and_dinners, 7)
-    lunches_and_dinners = [meal for meal in lunches_and_dinners if meal not in generated_meals["Lunch"]]
-    generated_meals["Dinner"] = random.sample(lunches_and_dinners, 7)
+    # Draw 7 lunches and 7 dinners, day by day, as one permutation of the candidate meals
+    selected = [lunches_and_dinners[index] for index in allocate_meals(categories, 14, rng)]
+    selected = [(meal, *get_similar_meals(meal, user_dataset, df, ("Oils",), alternatives)) for meal in selected]
+    generated_meals["Lunch"] = selected[0::2]
+    generated_meals["Dinner"] = selected[1::2]
 
     return generated_meals
 
 
+def check_plan_meals(meals: dict):
+    """Raise a 400 error unless every meal of a plan sent by a client starts with a main meal."""
+    for meal_name, entries in meals.items():
+        for slot, entry in enumerate(entries):
+            if not entry or not entry[0]:
+                raise HTTPException(status_code=400, detail=f"Error: The {meal_name} in slot {slot} has no main meal.")
+
+
+def regenerate_meal_slot(
+        meals: dict,
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        servings: dict,
+        meal_name: str,
+        slot: int,
+        item: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None) -> dict:
+    """
+    Regenerate one meal of a plan, or one food of it, and return only the new meal.
+
+    A new lunch or dinner takes a main category still in the servings budget of the week, the one of the meal
+    it replaces included. A new food is drawn from the same foods as the one it replaces, so that a lunch or
+    dinner keeps its main category, and the alternatives of the meal are found again.
+    """
+    if meal_name not in ["Breakfast", "Snack", "Lunch", "Dinner"] or not 0 <= slot < len(meals.get(meal_name, [])):
+        raise HTTPException(status_code=400, detail=f"Error: The plan has no {meal_name} in slot {slot}.")
+
+    pools = FoodPools(user_dataset)
+    main_meal = list(meals[meal_name][slot][0])
+    lunch_or_dinner = meal_name in ["Lunch", "Dinner"]
+
+    if item is None:
+        if not lunch_or_dinner:
+            main_meal, similar_meal = generate_breakfast_or_snack(user_dataset, food_dataset, rng)
+        else:
+            budget = category_budget(meals, servings, pools.category_of, exclude=(meal_name, slot))
+            try:
+                category = choose_category(budget, pools, rng)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Error: {e}.")
+            main_meal, similar_meal = generate_lunch_or_dinner(user_dataset, food_dataset, category, rng)
+    else:
+        # The snacks of the API are made like the breakfasts
+        if lunch_or_dinner:
+            category = pools.category_of(main_meal[1]) if len(main_meal) > 1 else None
+            if category is None:
+                raise HTTPException(status_code=400, detail=f"Error: The {meal_name} in slot {slot} has no preferred main food.")
+            item_pools = pools.meal_pools("Lunch", category)
+        else:
+            item_pools = pools.meal_pools("Breakfast")
+        if item >= min(len(main_meal), len(item_pools)):
+            raise HTTPException(status_code=400, detail=f"Error: The {meal_name} in slot {slot} has no item {item}.")
+
+        pool = item_pools[item]
+        others = pool[pool != main_meal[item]]
+        main_meal[item] = choose(others if len(others) > 0 else pool, rng)
+        similar_meal = get_similar_meal(main_meal, user_dataset, food_dataset, ("Oils",) if lunch_or_dinner else ())
+
+    return {"meal": meal_name, "slot": slot, "item": item, "main": main_meal, "alternative": similar_meal}
+
+
+def find_meal_alternatives(
+        meals: dict,
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        meal_name: str,
+        slot: int,
+        top_k: int = 1) -> dict:
+    """Return the top_k alternative meals of a meal of the plan, best first."""
+    if meal_name not in ["Breakfast", "Snack", "Lunch", "Dinner"] or not 0 <= slot < len(meals.get(meal_name, [])):
+        raise HTTPException(status_code=400, detail=f"Error: The plan has no {meal_name} in slot {slot}.")
+
+    main_meal = list(meals[meal_name][slot][0])
+    skip_categories = ("Oils",) if meal_name in ["Lunch", "Dinner"] else ()
+    alternatives = get_similar_meals(main_meal, user_dataset, food_dataset, skip_categories, top_k)
+    return {"meal": meal_name, "slot": slot, "main": main_meal, "alternatives": alternatives}
+
+
+def split_alternatives(meals: dict) -> tuple:
+    """
+    Split the entries of a plan generated with the top k alternatives of every meal in the [main, best alternative]
+    entries of the plan, so that a third element of an entry is always the meal the user chose, and the top k
+    alternatives of every entry, best first, by meal.
+    """
+    entries = {meal_name: [list(entry[:2]) for entry in meal_entries] for meal_name, meal_entries in meals.items()}
+    alternatives = {meal_name: [list(entry[1:]) for entry in meal_entries] for meal_name, meal_entries in meals.items()}
+    return entries, alternatives
+
+
+def optimize_weekly_meals(
+        meals: dict,
+        user_dataset: pd.DataFrame,
+        food_dataset: pd.DataFrame,
+        servings: dict,
+        targets: Dict[str, float],
+        tolerance: float = OPTIMIZER_TOLERANCE,
+        rng: Optional[np.random.Generator] = None,
+        alternatives: int = 1) -> tuple:
+    """
+    Move the daily totals of a plan towards the targets, swapping foods within the foods they are drawn from,
+    and return the optimized plan and the report of the optimizer.
+    """
+    pools = FoodPools(user_dataset)
+
+    def item_pools(meal_name: str, main_meal: list) -> list:
+        # The snacks of the API are made like the breakfasts
+        if meal_name in ["Lunch", "Dinner"]:
+            return pools.meal_pools("Lunch", pools.category_of(main_meal[1]))
+        return pools.meal_pools("Breakfast")
+
+    def alternative_meals(meal_name: str, main_meal: list) -> List[list]:
+        skip_categories = ("Oils",) if meal_name in ["Lunch", "Dinner"] else ()
+        return get_similar_meals(main_meal, user_dataset, food_dataset, skip_categories, alternatives)
+
+    return optimize_meals(meals, food_dataset, servings, targets, item_pools, alternative_meals, tolerance, rng)
+
+
+def get_weekly_meals(request: MealGeneratorRequest, user_dataset: pd.DataFrame) -> tuple:
+    """
+    Return the plan of a request and the report of its optimization (None without targets), generating them
+    or serving them from the plan cache. Only the plans of seeded requests are cached, the others are random.
+    """
+    targets = request.targets or {}
+    if any(nutrient not in utils.MACRONUTRIENTS or target <= 0 for nutrient, target in targets.items()):
+        raise HTTPException(status_code=400, detail=f"Error: The targets must be positive values of {utils.MACRONUTRIENTS}.")
+
+    user_preferences = request.food_preferences + request.seasonal_preferences
+    alternatives = request.alternatives_count()
+    options = {}
+    if request.targets is not None:
+        options.update(targets=request.targets, tolerance=request.tolerance)
+    if request.include_alternatives != "top1":
+        options.update(alternatives=alternatives)
+
+    def generate() -> tuple:
+        rng = as_generator(request.seed)
+        meals = generate_weekly_meals(user_dataset, food_dataset, servings, rng, alternatives)
+        optimization = None
+        if request.targets is not None:
+            meals, optimization = optimize_weekly_meals(
+                meals, user_dataset, food_dataset, servings, request.targets, request.tolerance, rng, alternatives
+            )
+        # Plans are cached as food ids, and every request gets its own copy of the meals
+        return CompactPlan.from_meals(meals, food_table), optimization
+
+    if request.seed is None:
+        plan, optimization = generate()
+    else:
+        key = plan_key(user_preferences, request.intolerances, servings_version, request.seed, food_catalog.version, options or None)
+        plan, optimization = plan_cache.get_or_generate(key, generate)
+    return plan.to_meals(), optimization
+
+
+plan_cache = PlanCache()
+
+
 @app.post("/recommend")
 def recommend_food(request: RecommenderRequest):
     recommendation = get_recommendation(
         request.food_name,
         food_dataset,
         request.category,
-        request.low_density
+        request.low_density,
+        request.top_k
     )
     return {"similar_foods": recommendation}
 
 
+@app.post("/recommend/batch")
+def recommend_food_batch(request: BatchRecommenderRequest):
+    return {"results": get_batch_recommendation(request.queries, food_dataset)}
+
+
 @app.post("/cheat")
 def recommend_cheat_meal(request: MoodRequest):
     # Pick a random fast food from preferences
     chosen_fast_food = random.choice(request.fast_food_preferences)
-    recommendation = get_recommendation(chosen_fast_food, food_dataset, low_density=False)
+    recommendation = get_recommendation(chosen_fast_food, food_dataset, low_density=False, top_k=1)
 
     if not recommendation:
         raise HTTPException(status_code=404, detail="No similar cheat meal found based on the selected fast food.")
@@ -427,15 +817,56 @@ def justificate_ingredients(request: JustificatorRequest):
 
 @app.post("/generate")
 def generate_meals(request: MealGeneratorRequest):
-    df = food_dataset.copy()
+    df = food_dataset
     user_preferences = request.food_preferences + request.seasonal_preferences
     user_dataset = df[df["Food Name"].isin(user_preferences)]
 
     # if request.intolerances != []:
     #     user_dataset = user_dataset[~user_dataset['Category Name'].isin(request.intolerances)]
 
-    meals = generate_weekly_meals(user_dataset, food_dataset, servings)
-    return {"meals": meals}
+    # Identical requests (e.g. the default preferences) are served from the cache instead of being generated again
+    meals, optimization = get_weekly_meals(request, user_dataset)
+    response = {"meals": meals}
+    if request.include_alternatives == "topk":
+        response["meals"], response["alternatives"] = split_alternatives(meals)
+    if optimization is not None:
+        response["optimization"] = optimization
+    return response
+
+
+@app.post("/generate/slot")
+def regenerate_slot(request: SlotRequest):
+    df = food_dataset
+    user_preferences = request.food_preferences + request.seasonal_preferences
+    user_dataset = df[df["Food Name"].isin(user_preferences)]
+
+    meals = request.meals
+    if meals is None:
+        meals, _ = get_weekly_meals(request, user_dataset)
+    else:
+        check_plan_meals(meals)
+
+    # Only the new meal is returned, the client replaces it in its plan
+    delta = regenerate_meal_slot(
+        meals, user_dataset, food_dataset, servings, request.meal, request.slot, request.item, as_generator(request.slot_seed)
+    )
+    return {"delta": delta}
+
+
+@app.post("/alternatives")
+def fetch_alternatives(request: AlternativesRequest):
+    df = food_dataset
+    user_preferences = request.food_preferences + request.seasonal_preferences
+    user_dataset = df[df["Food Name"].isin(user_preferences)]
+
+    meals = request.meals
+    if meals is None:
+        meals, _ = get_weekly_meals(request, user_dataset)
+    else:
+        check_plan_meals(meals)
+
+    # The alternatives of a plan generated without them, found when the user asks for them
+    return find_meal_alternatives(meals, user_dataset, food_dataset, request.meal, request.slot, request.top_k)
 
 
 if __name__ == "__main__":
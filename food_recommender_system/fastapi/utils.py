@@ -1,21 +1,25 @@
 import pandas as pd
 
+from food_recommender_system.catalog import NON_NUMERIC_COLUMNS, FoodCatalog
+
 MACRONUTRIENTS = ["Calories", "Carbs", "Fats", "Fiber", "Protein"]
 MEAL_GENERATION_CATEGORIES = ["Seafood", "Lactose-Free Dairy", "Dairy", "Eggs", "Legumes", "White Meat", "Cured Meat", "Red Meat"]
 EXCLUDED_CATEGORIES = ["Baby Foods", "Meals, Entrees, and Side Dishes", "Soups", "Spices", "Greens"]
 
 
 def get_food_category(food_name: str, df: pd.DataFrame) -> str:
-    food_info = df[df["Food Name"] == food_name]
-    if not food_info.empty:
-        return food_info["Category Name"].values[0]
+    catalog = FoodCatalog.for_dataframe(df)
+    row = catalog.row_of(food_name)
+    if row is not None:
+        return catalog.categories[row]
     return None
 
 
 def get_nutritional_info(food_name: str, df: pd.DataFrame, only_numbers: bool = True):
-    food_info = df[df["Food Name"] == food_name]
-    if not food_info.empty:
-        return food_info.drop(columns=["Food Name", "Category Name"]) if only_numbers else food_info
+    position = FoodCatalog.for_dataframe(df).position_of(food_name)
+    if position is not None:
+        food_info = df.iloc[[position]]
+        return food_info.drop(columns=NON_NUMERIC_COLUMNS) if only_numbers else food_info
     return None
 
 
@@ -24,7 +28,8 @@ def get_seasonal_foods(seasonality: dict, month: int):
 
 
 def compute_energy_density(food_name: str, df: pd.DataFrame) -> int:
-    food_info = get_nutritional_info(food_name, df)
-    if food_info is not None:
-        return food_info["Calories"].values[0] / 100
+    catalog = FoodCatalog.for_dataframe(df)
+    row = catalog.row_of(food_name)
+    if row is not None:
+        return catalog.energy_density[row]
     return None
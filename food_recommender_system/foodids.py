@@ -0,0 +1,195 @@
+"""
+Compact storage of weekly plans as arrays of food ids.
+
+A FoodTable is a versioned list of food names, and the id of a food is its position in the table. The stored form
+of a plan holds the names of its own foods, so that it can still be read after the dataset changes, without any
+other file.
+
+A CompactPlan holds the food ids of a plan as an int16 array (int32 for tables of more than 32767 foods), and the
+layout of its meals, entries and options as a uint8 array. It converts losslessly from and to the dict-of-lists
+format of the profiles and of the API: {meal name: [[main foods], [alternative foods], ([chosen foods])]}.
+Foods missing from the table are kept by name, with the ids following the ones of the table.
+"""
+import base64
+import hashlib
+import numpy as np
+from functools import cached_property
+from typing import Dict, Iterable, Union
+
+# The tables already built by FoodTable.of, keyed by version
+_FOOD_TABLES: Dict[str, "FoodTable"] = {}
+
+
+class FoodTable:
+    """A versioned list of food names. The version is a digest of the names, so equal lists have the same version."""
+
+    def __init__(self, names: Iterable[str]):
+        self.names = np.array(list(names), dtype=object)
+        self.dtype = np.int16 if len(self.names) <= np.iinfo(np.int16).max else np.int32
+
+    # The version and the ids are only computed when used, as decoding a stored plan needs neither
+
+    @cached_property
+    def version(self) -> str:
+        return hashlib.sha256("\0".join(self.names).encode()).hexdigest()[:16]
+
+    @cached_property
+    def ids(self) -> Dict[str, int]:
+        ids = {}
+        for food_id, name in enumerate(self.names):
+            ids.setdefault(name, food_id)
+        return ids
+
+    @classmethod
+    def of(cls, names: Iterable[str]) -> "FoodTable":
+        """Return the table of a list of names, reusing the one already built for them."""
+        table = cls(names)
+        return _FOOD_TABLES.setdefault(table.version, table)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+def _decode(data: str, dtype) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype)
+
+
+def is_plan(meals) -> bool:
+    """Return whether meals are a plan in the dict-of-lists format, which a CompactPlan can hold."""
+    return isinstance(meals, dict) and all(
+        isinstance(entries, (list, tuple)) and all(
+            isinstance(entry, (list, tuple)) and all(
+                isinstance(foods, (list, tuple)) and all(isinstance(food, str) for food in foods) for foods in entry
+            )
+            for entry in entries
+        )
+        for entries in meals.values()
+    )
+
+
+class CompactPlan:
+    """
+    A plan as an array of food ids of a FoodTable, in the order of its meals, entries, options and items.
+
+    layout holds, for every meal, its number of entries followed, for every entry, by its number of options and
+    the number of items of every option. extra holds the foods missing from the table.
+    """
+
+    def __init__(self, table: FoodTable, meal_names: list, layout: np.ndarray, ids: np.ndarray, extra: list):
+        self.table = table
+        self.meal_names = meal_names
+        self.layout = layout
+        self.ids = ids
+        self.extra = extra
+
+    @classmethod
+    def from_meals(cls, meals: dict, table: FoodTable) -> "CompactPlan":
+        """Encode a plan in the dict-of-lists format. Raises a ValueError if it is not a plan (see is_plan)."""
+        if not is_plan(meals):
+            raise ValueError("The meals are not a plan of lists of food names")
+
+        layout, ids, extra = [], [], {}
+        for entries in meals.values():
+            layout.append(len(entries))
+            for entry in entries:
+                layout.append(len(entry))
+                for foods in entry:
+                    layout.append(len(foods))
+                    for food in foods:
+                        food_id = table.ids.get(food)
+                        if food_id is None:
+                            food_id = len(table) + extra.setdefault(food, len(extra))
+                        ids.append(food_id)
+
+        if max(layout, default=0) > np.iinfo(np.uint8).max:
+            raise ValueError(f"A plan can have at most {np.iinfo(np.uint8).max} entries per meal, options or items")
+        if len(table) + len(extra) > np.iinfo(table.dtype).max:
+            raise ValueError(f"Too many foods for the {np.dtype(table.dtype).name} ids of the plan")
+        return cls(table, list(meals), np.array(layout, dtype=np.uint8), np.array(ids, dtype=table.dtype), list(extra))
+
+    def to_meals(self) -> dict:
+        """Decode the plan to the dict-of-lists format."""
+        names = self.table.names if not self.extra else np.concatenate([self.table.names, np.array(self.extra, dtype=object)])
+        foods = names[self.ids].tolist()
+        layout = self.layout.tolist()
+
+        meals = {}
+        position, start = 0, 0
+        for meal_name in self.meal_names:
+            entries = []
+            for _ in range(layout[position]):
+                position += 1
+                entry = []
+                for _ in range(layout[position]):
+                    position += 1
+                    entry.append(foods[start:start + layout[position]])
+                    start += layout[position]
+                entries.append(entry)
+            meals[meal_name] = entries
+            position += 1
+        return meals
+
+    def to_dict(self) -> dict:
+        """
+        Return the JSON-serializable form of the plan. It holds the names of the foods of the plan, in the order of
+        the table, and their ids are positions in that list instead of the table.
+        """
+        names = self.table.names if not self.extra else np.concatenate([self.table.names, np.array(self.extra, dtype=object)])
+        used, ids = np.unique(self.ids, return_inverse=True)
+        dtype = np.int16 if len(used) <= np.iinfo(np.int16).max else np.int32
+        return {
+            "foods": names[used].tolist(),
+            "meal_names": self.meal_names,
+            "layout": _encode(self.layout),
+            "dtype": np.dtype(dtype).str,
+            "food_ids": _encode(ids.astype(dtype))
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CompactPlan":
+        """Return the plan of a to_dict() form, with a table of its own foods."""
+        return cls(
+            FoodTable(data["foods"]),
+            list(data["meal_names"]),
+            _decode(data["layout"], np.uint8),
+            _decode(data["food_ids"], np.dtype(data["dtype"])),
+            []
+        )
+
+    @staticmethod
+    def is_compact(data) -> bool:
+        """Return whether stored meals are the to_dict() form of a CompactPlan."""
+        return isinstance(data, dict) and "food_ids" in data and "foods" in data
+
+    @property
+    def nbytes(self) -> int:
+        return self.layout.nbytes + self.ids.nbytes
+
+
+def pack_meals(meals: Union[dict, CompactPlan]) -> dict:
+    """
+    Return the stored form of the meals of a profile: the to_dict() form of their CompactPlan. Meals already in
+    that form, empty meals and meals that are not a plan are stored as they are.
+
+    Args:
+        meals (dict or CompactPlan): The meals.
+
+    Returns:
+        dict: The stored form of the meals.
+    """
+    if not isinstance(meals, CompactPlan):
+        if not meals or CompactPlan.is_compact(meals) or not is_plan(meals):
+            return meals
+        # A table of the foods of the plan only, in their order of appearance
+        foods = (food for entries in meals.values() for entry in entries for option in entry for food in option)
+        meals = CompactPlan.from_meals(meals, FoodTable(dict.fromkeys(foods)))
+    return meals.to_dict()
+
+
+def unpack_meals(data) -> Union[dict, CompactPlan]:
+    """Return the meals of a stored profile: a CompactPlan if they were packed, else the meals as they are."""
+    return CompactPlan.from_dict(data) if CompactPlan.is_compact(data) else data
@@ -1,12 +1,16 @@
+import copy
 import numpy as np
 from food_recommender_system.dataloader import DataLoader
 from datetime import datetime
 from food_recommender_system.profiler import UserProfiler
 import pandas as pd
 from pathlib import Path
-import time
 
-from config import MACRONUTRIENTS
+from food_recommender_system.config import MACRONUTRIENTS
+
+
+MEAL_TYPES = ["Breakfast", "Snack", "Lunch", "Snack", "Dinner"]
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
 
 def print_meal(meal: list, df: pd.DataFrame, servings: dict):
@@ -17,51 +21,50 @@ def print_meal(meal: list, df: pd.DataFrame, servings: dict):
         print(f"- {serving_size}g of {food} ({tips})")
 
 
-def print_full_week_meals(user: UserProfiler, df: pd.DataFrame, servings: dict):
-    meal_types = ["Breakfast", "Snack", "Lunch", "Snack", "Dinner"]
-    week_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+def weekly_meals_table(meals: dict) -> pd.DataFrame:
+    """
+    Return the weekly meals as a table with one row per (meal type, option type) and one column per day,
+    each cell holding the foods of an option joined by commas.
+    """
+    rows = []
+    for day_idx, day in enumerate(WEEK_DAYS):
+        for meal in MEAL_TYPES:
+            if meal in meals and day_idx < len(meals[meal]):
+                meal_data = meals[meal][day_idx]
+                for option, foods in zip(["Main", "Alternative", "Chosen"], meal_data[:3]):
+                    rows.append([day, meal, option, ', '.join(foods)])
+
+    table = pd.DataFrame(rows, columns=["Day", "Meal Type", "Option Type", "Foods"])
+    return table.pivot_table(index=["Meal Type", "Option Type"], columns="Day", values="Foods", aggfunc=lambda x: ' | '.join(x))
 
+
+def print_full_week_meals(user: UserProfiler, df: pd.DataFrame, servings: dict):
     meals = user.get_meals()
-    csv_data = []
 
     output_choice = input("Do you want to print the meals in the terminal or save them to a CSV file? (print/csv): ").strip().lower()
 
-    for day_idx, day in enumerate(week_days):
-        if output_choice == "print":
+    if output_choice == "print":
+        for day_idx, day in enumerate(WEEK_DAYS):
             print(f"\n📅 {day}:")
 
-        for meal in meal_types:
-            if meal in meals:
-                if day_idx < len(meals[meal]):
+            for meal in MEAL_TYPES:
+                if meal in meals and day_idx < len(meals[meal]):
                     meal_data = meals[meal][day_idx]
                     main_meal, alternative_meal = meal_data[:2]
 
-                    if output_choice == "print":
-                        print(f"\n🍽️  {meal}:")
-                        print("👉 Main option:")
-                        print_meal(main_meal, df, servings)
-                        print("\n🔄 Alternative option:")
-                        print_meal(alternative_meal, df, servings)
-                        if len(meal_data) == 3:
-                            chosen_meal = meal_data[2]
-                            print("\n✅ Chosen option:")
-                            print_meal(chosen_meal, df, servings)
-                        print("-" * 30)
-                    elif output_choice == "csv":
-                        csv_data.append([day, meal, "Main", ', '.join(main_meal)])
-                        csv_data.append([day, meal, "Alternative", ', '.join(alternative_meal)])
-                        if len(meal_data) == 3:
-                            chosen_meal = meal_data[2]
-                            csv_data.append([day, meal, "Chosen", ', '.join(chosen_meal)])
-
-        if output_choice == "print":
-            time.sleep(0.5)
-
-    if output_choice == "csv":
-        # Save to CSV
-        csv_df = pd.DataFrame(csv_data, columns=["Day", "Meal Type", "Option Type", "Foods"])
-        pivot_df = csv_df.pivot_table(index=["Meal Type", "Option Type"], columns="Day", values="Foods", aggfunc=lambda x: ' | '.join(x))
-        pivot_df.to_csv("weekly_meals.csv")
+                    print(f"\n🍽️  {meal}:")
+                    print("👉 Main option:")
+                    print_meal(main_meal, df, servings)
+                    print("\n🔄 Alternative option:")
+                    print_meal(alternative_meal, df, servings)
+                    if len(meal_data) == 3:
+                        chosen_meal = meal_data[2]
+                        print("\n✅ Chosen option:")
+                        print_meal(chosen_meal, df, servings)
+                    print("-" * 30)
+
+    elif output_choice == "csv":
+        weekly_meals_table(meals).to_csv("weekly_meals.csv")
         print("\n📁 Weekly meals have been saved to 'weekly_meals.csv'.")
 
 
@@ -155,26 +158,44 @@ def recommend_seasonal(seasonal_info: dict, food_name: str) -> str:
     return recommendation
 
 
-def get_current_meal(user: UserProfiler, meal_name: str = None, debug: bool = False):
-    today_day_of_week = datetime.now().weekday()
-    current_hour = datetime.now().hour
+def meal_slot(hour: int) -> str:
+    """Return the meal of an hour of the day (Breakfast before 9, Snack, Lunch from 11 to 14, Snack, Dinner from 17)."""
+    return "Breakfast" if hour < 9 else \
+        "Snack" if hour < 11 else \
+        "Lunch" if hour < 14 else \
+        "Snack" if hour < 17 else "Dinner"
 
-    if debug:
-        meal_name = meal_name
-    else:
-        meal_name = "Breakfast" if current_hour < 9 else \
-            "Snack" if current_hour < 11 else \
-            "Lunch" if current_hour < 14 else \
-            "Snack" if current_hour < 17 else "Dinner"
 
-    current_meal = user.get_meals()[meal_name][today_day_of_week][0]
-    current_alternative = user.get_meals()[meal_name][today_day_of_week][1]
+def find_current_meal(meals: dict, meal_name: str = None, now: datetime = None):
+    """
+    Return the meal of a weekly plan for a given time.
+    Args:
+        meals (dict): The weekly meals, as returned by generate_weekly_meal_plan.
+        meal_name (str, optional): The meal to return. Defaults to the meal of the current hour.
+        now (datetime, optional): The time of the meal. Defaults to now.
+    Returns:
+        tuple: The meal name, the day of the week, the main meal, its alternative and the chosen meal (None if
+               the user did not choose yet).
+    """
+    now = datetime.now() if now is None else now
+    meal_name = meal_slot(now.hour) if meal_name is None else meal_name
+    day = now.weekday()
 
-    if len(user.get_meals()[meal_name][today_day_of_week]) == 3:
-        choosen_meal = user.get_meals()[meal_name][today_day_of_week][2]
-    else:
-        choosen_meal = None
+    meal_data = meals[meal_name][day]
+    chosen_meal = meal_data[2] if len(meal_data) == 3 else None
+    return meal_name, day, meal_data[0], meal_data[1], chosen_meal
 
+
+def with_chosen_meal(meals: dict, meal_name: str, day: int, chosen_meal: list) -> dict:
+    """Return a copy of the weekly meals where the chosen meal of a day is set, leaving meals untouched."""
+    meals = copy.deepcopy(meals)
+    main_meal, alternative_meal = meals[meal_name][day][:2]
+    meals[meal_name][day] = [main_meal, alternative_meal, chosen_meal]
+    return meals
+
+
+def get_current_meal(user: UserProfiler, meal_name: str = None, debug: bool = False):
+    meal_name, _, current_meal, current_alternative, choosen_meal = find_current_meal(user.get_meals(), meal_name if debug else None)
     return meal_name, current_meal, current_alternative, choosen_meal
 
 
@@ -208,9 +229,11 @@ def choose_foods_in_current_meal(user: UserProfiler, filename: Path, df: pd.Data
             print("⚠️ Invalid choice. Keeping the main option.")
             chosen_meal.append(main_food)
 
-    meals = user.get_meals()
-    today_day_of_week = datetime.now().weekday()
-    meals[meal_name][today_day_of_week] = [current_meal, current_alternative, chosen_meal]
-    user.set_meals(meals)
-    user.save_profile(filename)
+    day = datetime.now().weekday()
+
+    def choose_meal(profile: UserProfiler):
+        # Chosen again in the stored profile if someone else changed it in the meantime
+        profile.set_meals(with_chosen_meal(profile.get_meals(), meal_name, day, chosen_meal))
+
+    user.update_profile(filename, choose_meal)
     print("-" * 30)
@@ -1,9 +1,11 @@
+import food_recommender_system.engine as engine
 from food_recommender_system.profiler import UserProfiler
-from food_recommender_system.recommender import ask_seasonal_preferences, ask_user_preferences, get_seasonal_food
+from food_recommender_system.recommender import AlternativesCache, ask_seasonal_preferences, ask_user_preferences
 from food_recommender_system.dataloader import DataLoader
-from food_recommender_system.mealgen import generate_weekly_meal_plan
-from food_recommender_system.justificator import print_meal, print_full_week_meals, choose_foods_in_current_meal, get_current_meal
+from food_recommender_system.justificator import print_meal, print_full_week_meals, choose_foods_in_current_meal
 from food_recommender_system.moodmod import change_meal
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.config import PROCESSED_DATA_PATH, RAW_DATA_PATH
 from pathlib import Path
 
 import sys
@@ -25,6 +27,9 @@ seasonality = dataloader.load_json(food_seasonality_file)
 servings = dataloader.load_json(servings_file)
 fast_food_equiv = dataloader.load_json(fast_food_eqiv_file)
 food_infos = dataloader.load_json(food_infos_file)
+neighbor_index = NeighborIndex.load_or_build(df, RAW_DATA_PATH / nutritional_facts_file, PROCESSED_DATA_PATH / "neighbors.npz")
+# Shared by every plan of the session: the results stay valid as long as the catalog does not change
+alternatives = AlternativesCache()
 
 
 def show_menu():
@@ -42,6 +47,12 @@ def show_menu():
     time.sleep(0.5)
 
 
+def show_progress(done: int, total: int):
+    print(f"Generating 7-day meal plan{'.' * (done * 3 // total)} ({done}/{total})", end="\r")
+    if done == total:
+        print("\nMeal plan generation complete!")
+
+
 def create_or_load_user():
     name_surname = input("🆔 Enter username to create or load your profile: ").strip().lower()
     filename = Path(f"{name_surname}.json")
@@ -66,7 +77,19 @@ def create_or_load_user():
         ask_user_preferences(df, user, filename)
         ask_seasonal_preferences(df, seasonality, user, filename, food_infos)
 
-        generate_weekly_meal_plan(df, servings, user, filename)
+        meals = engine.plan_week(
+            df,
+            servings,
+            user.get_food_preferences(),
+            user.get_seasonal_preferences(),
+            user.get_intolerances(),
+            neighbor_index,
+            alternatives,
+            progress=show_progress
+        )
+        user.set_meals(meals)
+        user.save_profile(filename)
+        print(f"Weekly meal plan saved to {filename}")
     os.system('cls||clear')
     return user, filename
 
@@ -84,7 +107,7 @@ def display_current_meal_and_alternatives(user: UserProfiler, filename: Path):
         None
     """
 
-    meal_name, current_meal, current_alternative, choosen_meal = get_current_meal(user)
+    meal_name, _, current_meal, current_alternative, choosen_meal = engine.current_meal(user.get_meals())
 
     if choosen_meal:
         print(f"\n🍽️ Today's {meal_name.lower()} is:")
@@ -124,8 +147,8 @@ def learn_about_seasonal_food(food_info: dict):
     The user can select a food item to learn more about its health benefits, how to choose and store it, a description,
     nutritional insights, and additional tips. The user can type 'back' to return to the main menu.
     """
-    fruits, vegetables = get_seasonal_food(df, seasonality)
-    seasonal_foods = fruits + vegetables
+    in_season = engine.seasonal_foods(df, seasonality)
+    seasonal_foods = in_season["Fruits"] + in_season["Vegetables"]
 
     print("\n🌍 Why choose seasonal produce?")
     time.sleep(1)
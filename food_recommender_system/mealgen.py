@@ -1,46 +1,155 @@
 import random
+import threading
+import weakref
+import numpy as np
 import pandas as pd
+from food_recommender_system.catalog import FoodCatalog
 from food_recommender_system.profiler import UserProfiler
-from food_recommender_system.recommender import get_similar_food
+from food_recommender_system.recommender import AlternativesCache, get_similar_food
 from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.nutrition import serving_nutrients
+from collections import OrderedDict, deque
 from pathlib import Path
-import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from food_recommender_system.config import EXCLUDED_CATEGORIES, MEAL_GENERATION_CATEGORIES, PLAN_DATA_CACHE_SIZE
+
+# The pools the items of every meal are drawn from, in order, as (categories, merged).
+# None stands for the main category of a lunch or dinner.
+MEAL_LAYOUTS = {
+    "Breakfast": [
+        (("Dairy Breakfast", "Lactose-Free Dairy Breakfast", "Beverages"), False),
+        (("Baked Products Breakfast",), False),
+        (("Sweets Breakfast", "Nuts Breakfast"), False),
+        (("Fruits",), False)
+    ],
+    "Snack": [
+        (("Baked Products Breakfast",), False),
+        (("Sweets Breakfast", "Nuts Breakfast"), False),
+        (("Fruits",), False)
+    ],
+    "Lunch": [
+        (("Grains", "Gluten-Free Grains"), True),
+        ((None,), False),
+        (("Oils",), False),
+        (("Sauces",), False),
+        (("Vegetables",), False),
+        (("Fruits",), False)
+    ]
+}
+MEAL_LAYOUTS["Dinner"] = MEAL_LAYOUTS["Lunch"]
+
+# The plan data of the latest users, see plan_data
+_PLAN_DATA: "OrderedDict[tuple, Tuple[weakref.ref, tuple]]" = OrderedDict()
+_PLAN_DATA_LOCK = threading.Lock()
+
+
+class FoodPools:
+    """
+    The preferred foods of a user grouped once by category, so that the meal generators can sample them
+    without scanning the preferences DataFrame for every meal.
+
+    Foods are identified by their position in the preferences DataFrame, and every pool keeps that order.
+    """
+
+    def __init__(self, preferences_df: pd.DataFrame):
+        self.names = preferences_df["Food Name"].to_numpy(dtype=object)
+        self.food_categories = preferences_df["Category Name"].to_numpy(dtype=object)
+
+        codes, categories = pd.factorize(preferences_df["Category Name"])
+        self.ids: Dict[str, np.ndarray] = {category: np.flatnonzero(codes == code) for code, category in enumerate(categories)}
+
+        self.category_index = {}
+        for food_id, name in enumerate(self.names):
+            self.category_index.setdefault(name, self.food_categories[food_id])
+
+        self._pools: Dict[Tuple, np.ndarray] = {}
+
+    def pool(self, *categories: str, merged: bool = False) -> np.ndarray:
+        """
+        Return the names of the preferred foods of some categories, one category after the other,
+        or in preferences order if merged. Pools are built once and reused.
+        """
+        key = (categories, merged)
+        if key not in self._pools:
+            ids = np.concatenate([self.ids.get(category, np.array([], dtype=np.intp)) for category in categories])
+            self._pools[key] = self.names[np.sort(ids) if merged else ids]
+        return self._pools[key]
+
+    def category_of(self, food_name: str) -> Optional[str]:
+        """Return the category of a preferred food, or None if the food is not preferred."""
+        return self.category_index.get(food_name)
+
+    def meal_pools(self, meal_name: str, category: Optional[str] = None) -> List[np.ndarray]:
+        """Return the pools of the items of a meal (see MEAL_LAYOUTS), with category as the main one of a lunch or dinner."""
+        return [
+            self.pool(*(category if name is None else name for name in categories), merged=merged)
+            for categories, merged in MEAL_LAYOUTS[meal_name]
+        ]
 
-from config import EXCLUDED_CATEGORIES, MEAL_GENERATION_CATEGORIES
+
+def as_generator(seed: Union[None, int, np.random.Generator] = None) -> Optional[np.random.Generator]:
+    """
+    Return the numpy Generator of a seed (a Generator is returned as is), or None if seed is None,
+    in which case the generators draw from the global random module as they always did.
+    """
+    return None if seed is None else np.random.default_rng(seed)
+
+
+def choose(pool: Sequence, rng: Optional[np.random.Generator] = None):
+    """Return a random item of pool, drawn with rng or with the global random module if rng is None."""
+    if rng is None:
+        return random.choice(pool)
+    if len(pool) == 0:
+        raise IndexError("Cannot choose from an empty sequence")
+    return pool[rng.integers(len(pool))]
 
 
-def generate_meal(preferences_df: pd.DataFrame, filtered_df: pd.DataFrame, category: str):
+def sample(population: list, k: int, rng: Optional[np.random.Generator] = None) -> list:
+    """Return k distinct random items of population, drawn with rng or with the global random module if rng is None."""
+    if rng is None:
+        return random.sample(population, k)
+    return [population[i] for i in rng.choice(len(population), k, replace=False)]
+
+
+def generate_meal(
+        preferences_df: pd.DataFrame,
+        filtered_df: pd.DataFrame,
+        category: str,
+        neighbors: Optional[NeighborIndex] = None,
+        pools: Optional[FoodPools] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        rng: Union[None, int, np.random.Generator] = None):
     """
     Parameters:
     preferences_df (pd.DataFrame): DataFrame containing user preferences with columns "Category Name" and "Food Name".
     filtered_df (pd.DataFrame): DataFrame containing filtered food items for recommendation.
     category (str): The specific food category to include in the meal.
+    neighbors (NeighborIndex, optional): Precomputed neighbors used to find similar foods.
+    pools (FoodPools, optional): The preferences grouped by category, built from preferences_df if not given.
+    alternatives (AlternativesCache, optional): Memoizes the similar food lookups.
+    rng (int or np.random.Generator, optional): The seed or Generator the foods are drawn with.
     Returns:
     tuple: A tuple containing two lists:
         - meal (list): A list of selected food items based on user preferences.
         - similar_meal (list): A list of similar food items for each item in the meal.
     """
 
-    meal = []
-    meal.extend([
-        random.choice(
-            preferences_df[preferences_df["Category Name"].isin(["Grains", "Gluten-Free Grains"])]["Food Name"].to_list()
-        ),
-        random.choice(preferences_df[preferences_df["Category Name"] == category]["Food Name"].to_list()),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Oils"]["Food Name"].to_list()),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Sauces"]["Food Name"].to_list()),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Vegetables"]["Food Name"].to_list()),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Fruits"]["Food Name"].to_list())
-    ])
+    pools = FoodPools(preferences_df) if pools is None else pools
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+    rng = as_generator(rng)
+
+    meal = [choose(pool, rng) for pool in pools.meal_pools("Lunch", category)]
 
     # Find similar foods for each item in the meal
     similar_meal = []
     for food in meal:
-        item_category = preferences_df[preferences_df["Food Name"] == food]["Category Name"].values[0]
+        item_category = pools.category_of(food)
 
-        if item_category != ["Oils"]:
-            similar_foods = get_similar_food(
-                filtered_df, food_name=food, same_category=True, low_density_food=True
+        if item_category != "Oils":
+            similar_foods = find_similar_foods(
+                filtered_df, food_name=food, same_category=True, low_density_food=True, neighbors=neighbors, top_k=1
             )
             similar_meal.append(similar_foods[0][0])
         else:
@@ -49,34 +158,35 @@ def generate_meal(preferences_df: pd.DataFrame, filtered_df: pd.DataFrame, categ
     return meal, similar_meal
 
 
-def generate_breakfast(preferences_df: pd.DataFrame, filtered_df: pd.DataFrame):
-    breakfast = []
-
-    breakfast.extend([
-        random.choice(
-            preferences_df[preferences_df["Category Name"] == "Dairy Breakfast"]["Food Name"].to_list()
-            + preferences_df[preferences_df["Category Name"] == "Lactose-Free Dairy Breakfast"]["Food Name"].to_list()
-            + preferences_df[preferences_df["Category Name"] == "Beverages"]["Food Name"].to_list()
-        ),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Baked Products Breakfast"]["Food Name"].to_list()),
-        random.choice(
-            preferences_df[preferences_df["Category Name"] == "Sweets Breakfast"]["Food Name"].to_list()
-            + preferences_df[preferences_df["Category Name"] == "Nuts Breakfast"]["Food Name"].to_list()
-        ),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Fruits"]["Food Name"].to_list())
-    ])
+def generate_breakfast(
+        preferences_df: pd.DataFrame,
+        filtered_df: pd.DataFrame,
+        neighbors: Optional[NeighborIndex] = None,
+        pools: Optional[FoodPools] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        rng: Union[None, int, np.random.Generator] = None):
+    pools = FoodPools(preferences_df) if pools is None else pools
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+    rng = as_generator(rng)
+    breakfast = [choose(pool, rng) for pool in pools.meal_pools("Breakfast")]
 
     similar_breakfast = []
     for item in breakfast:
-        similar_foods = get_similar_food(
-            filtered_df, food_name=item, same_category=True, low_density_food=True
+        similar_foods = find_similar_foods(
+            filtered_df, food_name=item, same_category=True, low_density_food=True, neighbors=neighbors, top_k=1
         )
         similar_breakfast.append(similar_foods[0][0] if similar_foods else item)
 
     return breakfast, similar_breakfast
 
 
-def generate_snack(preferences_df: pd.DataFrame, filtered_df: pd.DataFrame):
+def generate_snack(
+        preferences_df: pd.DataFrame,
+        filtered_df: pd.DataFrame,
+        neighbors: Optional[NeighborIndex] = None,
+        pools: Optional[FoodPools] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        rng: Union[None, int, np.random.Generator] = None):
     """
     Generate a snack based on user preferences and filtered data.
     This function selects a snack consisting of three items from the user's preferences:
@@ -87,127 +197,397 @@ def generate_snack(preferences_df: pd.DataFrame, filtered_df: pd.DataFrame):
     Args:
         preferences_df (pd.DataFrame): DataFrame containing user preferences with columns "Category Name" and "Food Name".
         filtered_df (pd.DataFrame): DataFrame containing filtered food data for finding similar foods.
+        neighbors (NeighborIndex, optional): Precomputed neighbors used to find similar foods.
+        pools (FoodPools, optional): The preferences grouped by category, built from preferences_df if not given.
+        alternatives (AlternativesCache, optional): Memoizes the similar food lookups.
+        rng (int or np.random.Generator, optional): The seed or Generator the foods are drawn with.
     Returns:
         tuple: A tuple containing two lists:
             - snack (list): List of selected snack items.
             - similar_snack (list): List of similar snack items found in the filtered data.
     """
 
-    snack = []
-    snack.extend([
-        random.choice(preferences_df[preferences_df["Category Name"] == "Baked Products Breakfast"]["Food Name"].to_list()),
-        random.choice(
-            preferences_df[preferences_df["Category Name"] == "Sweets Breakfast"]["Food Name"].to_list()
-            + preferences_df[preferences_df["Category Name"] == "Nuts Breakfast"]["Food Name"].to_list()
-        ),
-        random.choice(preferences_df[preferences_df["Category Name"] == "Fruits"]["Food Name"].to_list())
-    ])
+    pools = FoodPools(preferences_df) if pools is None else pools
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+    rng = as_generator(rng)
+
+    snack = [choose(pool, rng) for pool in pools.meal_pools("Snack")]
 
     similar_snack = []
     for item in snack:
-        similar_foods = get_similar_food(
-            filtered_df, food_name=item, same_category=True, low_density_food=True
+        similar_foods = find_similar_foods(
+            filtered_df, food_name=item, same_category=True, low_density_food=True, neighbors=neighbors, top_k=1
         )
         similar_snack.append(similar_foods[0][0] if similar_foods else item)
 
     return snack, similar_snack
 
 
-def compute_meal_calories(meal: list, df: pd.DataFrame, servings: pd.DataFrame, verbose: bool = False) -> float:
+def compute_meal_calories(meal: list, df: pd.DataFrame, servings: dict, verbose: bool = False) -> float:
     """
     Computes the total calories for a given meal.
     Args:
         meal (list): A list of food names included in the meal.
         df (pd.DataFrame): A DataFrame containing nutritional information for various foods.
-        servings (pd.DataFrame): A DataFrame containing serving size information for different food categories.
+        servings (dict): The serving size of every food category, as in food-servings.json.
         verbose (bool, optional): If True, prints detailed information about each food's calorie content. Defaults to False.
     Returns:
         float: The total calorie content of the meal.
     """
 
-    calories = 0
+    catalog = FoodCatalog.for_dataframe(df)
+    rows = [catalog.row_of(food_name) for food_name in meal]
+    # Only the foods of the meal are scaled; foods missing from the dataset take the id -1, which has no calories
+    food_calories = serving_nutrients(catalog, servings, ["Calories"], [-1 if row is None else row for row in rows])[:, 0]
 
-    for food_name in meal:
-        food_info = DataLoader.get_nutritional_info(df, food_name, only_numbers=False)
-        if food_info is not None:
-            food_category = DataLoader.get_food_category(df, food_name)[0]
-            serving_size = servings.get(food_category, {}).get('serving_size')
-            food_calories = (food_info['Calories'].values[0] * serving_size) / 100
-            if verbose:
-                print(f"A serving size of {food_name} ({serving_size}g) has {int(food_calories)} kcal")
-            calories += food_calories
+    if verbose:
+        for food_name, row, calories in zip(meal, rows, food_calories):
+            if row is not None:
+                serving_size = servings.get(catalog.categories[row], {}).get('serving_size')
+                print(f"A serving size of {food_name} ({serving_size}g) has {int(calories)} kcal")
 
-    return calories
+    return float(food_calories.sum())
 
 
-def generate_weekly_meal_plan(df: pd.DataFrame, servings: dict, user_profiler: UserProfiler, filename: Path):
+def plan_data(
+        df: pd.DataFrame,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        intolerances: Optional[List[str]] = None) -> Tuple[pd.DataFrame, FoodPools, pd.DataFrame]:
+    """
+    Return the preferred foods, grouped by category once for all the meals of a plan, and the foods
+    the alternatives are drawn from: the dataset without the excluded categories and the intolerances,
+    plus the seasonal preferences.
+
+    The data of the latest PLAN_DATA_CACHE_SIZE users of a DataFrame are cached, so that regenerating their
+    meals one at a time does not filter the dataset (and build the catalog of the alternatives) again.
+    The DataFrame must not be modified in place after its first plan.
+    """
+    key = (id(df), tuple(food_preferences), tuple(seasonal_preferences), repr(intolerances))
+    with _PLAN_DATA_LOCK:
+        cached = _PLAN_DATA.get(key)
+        if cached is not None and cached[0]() is df:
+            _PLAN_DATA.move_to_end(key)
+            return cached[1]
+
+    # Filter user preferences in the dataset, and group them by category once for all the meals
+    preferences_df = df[df["Food Name"].isin(food_preferences + seasonal_preferences)]
+    pools = FoodPools(preferences_df)
+
+    if intolerances is not None:
+        filtered_df = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES + intolerances)
+    else:
+        filtered_df = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES)
+
+    seasonal_foods = df[df["Food Name"].isin(seasonal_preferences)]
+    filtered_df = pd.concat([filtered_df, seasonal_foods])
+
+    data = (preferences_df, pools, filtered_df)
+    with _PLAN_DATA_LOCK:
+        _PLAN_DATA[key] = (weakref.ref(df), data)
+        while len(_PLAN_DATA) > PLAN_DATA_CACHE_SIZE:
+            _PLAN_DATA.popitem(last=False)
+    return data
+
+
+def category_budget(
+        meals: dict,
+        servings: dict,
+        category_of: Callable[[str], Optional[str]],
+        exclude: Optional[Tuple[str, int]] = None) -> Dict[str, int]:
+    """
+    Return how many more lunches and dinners of every main category a weekly plan can have, out of its
+    frequency_per_week in the servings.
+
+    Args:
+        meals (dict): The weekly plan.
+        servings (dict): Dictionary containing the frequency of servings per week for each category.
+        category_of (Callable[[str], Optional[str]]): Returns the category of a food, e.g. FoodPools.category_of.
+        exclude (Tuple[str, int], optional): The (meal name, day) of a meal not to count, e.g. the one to regenerate.
+
+    Returns:
+        Dict[str, int]: The number of meals left for every category, negative if the plan is over budget.
+    """
+    budget = {
+        category: info["frequency_per_week"] for category, info in servings.items()
+        if category in MEAL_GENERATION_CATEGORIES
+    }
+    for meal_name in ["Lunch", "Dinner"]:
+        for day, entry in enumerate(meals.get(meal_name, [])):
+            main_meal = entry[0]
+            if (meal_name, day) == exclude or len(main_meal) < 2:
+                continue
+            category = category_of(main_meal[1])
+            if category in budget:
+                budget[category] -= 1
+    return budget
+
+
+def choose_category(budget: Dict[str, int], pools: FoodPools, rng: Optional[np.random.Generator] = None) -> str:
+    """
+    Return a main category for a lunch or dinner among the preferred ones left in the budget, drawn with a
+    probability proportional to the meals left, as when the meals of a week are drawn from all the servings.
     """
-    Generates a weekly meal plan based on user preferences, seasonal preferences, and intolerances.
+    categories = [category for category, left in budget.items() if len(pools.pool(category)) > 0 for _ in range(left)]
+    if not categories:
+        raise ValueError("No category is left in the servings budget of the week")
+    return choose(categories, rng)
+
+
+def regenerate_meal(
+        meals: dict,
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        meal_name: str,
+        day: int,
+        item: Optional[int] = None,
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None) -> dict:
+    """
+    Regenerates one meal of a weekly plan, or one item of it, without generating the rest of the week.
+
+    A new lunch or dinner takes a main category still in the servings budget of the week (the category of the
+    meal it replaces included). A new item is drawn from the same pool as the one it replaces, other foods first,
+    so that a lunch or dinner keeps its main category.
     Args:
+        meals (dict): The weekly plan, which is not modified.
         df (pd.DataFrame): DataFrame containing the food dataset.
         servings (dict): Dictionary containing the frequency of servings per week for each category.
-        user_profiler (UserProfiler): UserProfiler object to get user preferences and intolerances.
-        filename (Path): Path to save the generated meal plan.
+        food_preferences (List[str]): The preferred foods.
+        seasonal_preferences (List[str]): The preferred seasonal fruits and vegetables.
+        meal_name (str): The meal to regenerate (e.g., "Lunch").
+        day (int): The day of the week of the meal (0 is Monday).
+        item (int, optional): The position of the item to regenerate. The whole meal is regenerated if not given.
+        intolerances (List[str], optional): The categories the user is intolerant to.
+        neighbors (NeighborIndex, optional): Precomputed neighbors of df, used to find similar foods.
+        alternatives (AlternativesCache, optional): Memoizes the similar food lookups.
+        seed (int or np.random.Generator, optional): The seed or Generator the meal is drawn with.
     Returns:
-        dict: A dictionary containing the generated meals for Breakfast, Snack, Lunch, and Dinner.
+        dict: The delta to apply to the plan: the meal name, day and item, and the new main and alternative meal.
+              The chosen meal of the day, if any, is dropped with the old meal.
     """
+    if meal_name not in MEAL_LAYOUTS or not 0 <= day < len(meals.get(meal_name, [])):
+        raise ValueError(f"The plan has no {meal_name} on day {day}")
+
+    preferences_df, pools, filtered_df = plan_data(df, food_preferences, seasonal_preferences, intolerances)
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+    rng = as_generator(seed)
+
+    main_meal, similar_meal = [list(foods) for foods in meals[meal_name][day][:2]]
+    if item is None:
+        if meal_name == "Breakfast":
+            main_meal, similar_meal = generate_breakfast(preferences_df, filtered_df, neighbors, pools, alternatives, rng)
+        elif meal_name == "Snack":
+            main_meal, similar_meal = generate_snack(preferences_df, filtered_df, neighbors, pools, alternatives, rng)
+        else:
+            budget = category_budget(meals, servings, pools.category_of, exclude=(meal_name, day))
+            category = choose_category(budget, pools, rng)
+            main_meal, similar_meal = generate_meal(preferences_df, filtered_df, category, neighbors, pools, alternatives, rng)
+    else:
+        if not 0 <= item < min(len(main_meal), len(MEAL_LAYOUTS[meal_name])):
+            raise ValueError(f"The {meal_name} of day {day} has no item {item}")
 
-    # Load user profile
-    user_preferences = user_profiler.get_food_preferences()
-    seasonal_preferences = user_profiler.get_seasonal_preferences()
-    user_intolerances = user_profiler.get_intolerances()
-    preferences = user_preferences + seasonal_preferences
+        category = pools.category_of(main_meal[1]) if meal_name in ["Lunch", "Dinner"] else None
+        pool = pools.meal_pools(meal_name, category)[item]
+        others = pool[pool != main_meal[item]]
+        main_meal[item] = choose(others if len(others) > 0 else pool, rng)
 
-    # Filter user preferences in the dataset
-    preferences_df = df[df["Food Name"].isin(preferences)]
+        similar_foods = find_similar_foods(
+            filtered_df, food_name=main_meal[item], same_category=True, low_density_food=True, neighbors=neighbors, top_k=1
+        )
+        similar_meal[item] = similar_foods[0][0] if similar_foods else main_meal[item]
 
-    if user_intolerances is not None:
-        filtered_df = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES + user_intolerances)
-    else:
-        filtered_df = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES)
+    return {"meal": meal_name, "day": day, "item": item, "main": main_meal, "alternative": similar_meal}
 
-    seasonal_foods = df[df["Food Name"].isin(seasonal_preferences)]
-    filtered_df = pd.concat([filtered_df, seasonal_foods])
 
-    servings_count = servings.copy()
-    generated_meals = {"Breakfast": [], "Snack": [], "Lunch": [], "Dinner": []}
-
-    for i in range(3):
-        print(f"Generating 7-day meal plan{'.' * (i + 1)}", end="\r")
-        time.sleep(0.5)
-
-    print("\nMeal plan generation complete!")
-
-    # Generate 7 breakfasts and snacks
-    for _ in range(7):
-        breakfast, similar_breakfast = generate_breakfast(preferences_df, filtered_df)
-        snack, similar_snack = generate_snack(preferences_df, filtered_df)
-        generated_meals["Breakfast"].append((breakfast, similar_breakfast))
-        generated_meals["Snack"].append((snack, similar_snack))
-
-    # Categories for meal generation
-    categories = MEAL_GENERATION_CATEGORIES
-    meals = []
-
-    # Generate meals based on frequency_per_week
-    for category, info in servings_count.items():
-        if category in categories:
-            if not preferences_df[preferences_df["Category Name"] == category].empty:
-                for _ in range(info['frequency_per_week']):
-                    meal, similar_meal = generate_meal(preferences_df, filtered_df, category)
-                    meals.append((meal, similar_meal))
-
-    # Select 7 random lunches and 7 random dinners
-    selected_lunches = random.sample(meals, 7)
-    meals = [meal for meal in meals if meal not in selected_lunches]
-    selected_dinners = random.sample(meals, 7)
-    generated_meals["Lunch"] = selected_lunches
-    generated_meals["Dinner"] = selected_dinners
+def allocate_meals(
+        categories: Sequence[str],
+        slots: int,
+        rng: Optional[np.random.Generator] = None,
+        window: int = 0,
+        history: Sequence[str] = ()) -> List[int]:
+    """
+    Draw the candidate meals of consecutive lunches and dinners (the lunch and the dinner of a day, then of the next day).
+
+    The candidates are drawn as one random permutation of their indices, so duplicated meals stay distinct
+    candidates. With a window, every slot takes the next candidate of the permutation whose main category is
+    not among the window - 1 meals before it (history included), or the next candidate if there is none.
+    Args:
+        categories (Sequence[str]): The main category of every candidate meal.
+        slots (int): The number of meals to draw.
+        rng (np.random.Generator, optional): The Generator the meals are drawn with.
+        window (int, optional): The number of consecutive meals without a repeated main category; 0 or 1 for no limit.
+        history (Sequence[str], optional): The main categories of the meals before, in order.
+    Returns:
+        List[int]: The indices of the drawn candidates, in slot order.
+    """
+    if len(categories) < slots:
+        raise ValueError(f"Cannot draw {slots} meals from {len(categories)} candidates")
+
+    if window <= 1:
+        return sample(range(len(categories)), slots, rng)
+
+    order = sample(range(len(categories)), len(categories), rng)
+    recent = deque(history, maxlen=window - 1)
+    selected = []
+    for _ in range(slots):
+        position = next((i for i, index in enumerate(order) if categories[index] not in recent), 0)
+        index = order.pop(position)
+        selected.append(index)
+        recent.append(categories[index])
+    return selected
+
+
+def build_meal_plans(
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        weeks: int = 1,
+        window: int = 0,
+        progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    Builds the meal plans of consecutive weeks from preferences, seasonal preferences and intolerances, without any side effect.
+    Args:
+        df (pd.DataFrame): DataFrame containing the food dataset.
+        servings (dict): Dictionary containing the frequency of servings per week for each category.
+        food_preferences (List[str]): The preferred foods.
+        seasonal_preferences (List[str]): The preferred seasonal fruits and vegetables.
+        intolerances (List[str], optional): The categories the user is intolerant to.
+        neighbors (NeighborIndex, optional): Precomputed neighbors of df, used to find similar foods.
+        alternatives (AlternativesCache, optional): Memoizes the similar food lookups. A new cache is used for the
+                                                    plans if not given; pass one to reuse it across plans.
+        seed (int or np.random.Generator, optional): The seed or Generator the plans are drawn with, so that the same
+                                                     seed always gives the same plans. The global random module is
+                                                     used if not given.
+        weeks (int, optional): The number of weeks to plan.
+        window (int, optional): The number of consecutive lunches and dinners, across weeks, without a repeated
+                                main category (see allocate_meals). No limit by default.
+        progress (Callable[[int, int], None], optional): Called with the number of generated meals and the total
+                                                         after every meal.
+    Returns:
+        List[dict]: The plan of every week, with the generated meals for Breakfast, Snack, Lunch, and Dinner.
+    """
+
+    preferences_df, pools, filtered_df = plan_data(df, food_preferences, seasonal_preferences, intolerances)
+    alternatives = AlternativesCache() if alternatives is None else alternatives
+    rng = as_generator(seed)
+
+    # Categories for meal generation, and how many meals of each
+    meal_counts = [
+        (category, info['frequency_per_week']) for category, info in servings.items()
+        if category in MEAL_GENERATION_CATEGORIES and len(pools.pool(category)) > 0
+    ]
+    total = weeks * (14 + sum(count for _, count in meal_counts))
+    done = 0
+
+    plans = []
+    # The main categories of the lunches and dinners so far, in order
+    history = []
+    for _ in range(weeks):
+        generated_meals = {"Breakfast": [], "Snack": [], "Lunch": [], "Dinner": []}
+
+        # Generate 7 breakfasts and snacks
+        for _ in range(7):
+            breakfast, similar_breakfast = generate_breakfast(preferences_df, filtered_df, neighbors, pools, alternatives, rng)
+            snack, similar_snack = generate_snack(preferences_df, filtered_df, neighbors, pools, alternatives, rng)
+            generated_meals["Breakfast"].append((breakfast, similar_breakfast))
+            generated_meals["Snack"].append((snack, similar_snack))
+            done += 2
+            if progress is not None:
+                progress(done, total)
+
+        meals = []
+        categories = []
+
+        # Generate meals based on frequency_per_week
+        for category, count in meal_counts:
+            for _ in range(count):
+                meal, similar_meal = generate_meal(preferences_df, filtered_df, category, neighbors, pools, alternatives, rng)
+                meals.append((meal, similar_meal))
+                categories.append(category)
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+
+        # Draw 7 lunches and 7 dinners, day by day
+        selected = allocate_meals(categories, 14, rng, window, history)
+        generated_meals["Lunch"] = [meals[index] for index in selected[0::2]]
+        generated_meals["Dinner"] = [meals[index] for index in selected[1::2]]
+        history.extend(categories[index] for index in selected)
+        plans.append(generated_meals)
+
+    return plans
+
+
+def build_weekly_meal_plan(
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Builds a weekly meal plan from preferences, seasonal preferences and intolerances, without any side effect
+    (see build_meal_plans).
+    Returns:
+        dict: A dictionary containing the generated meals for Breakfast, Snack, Lunch, and Dinner.
+    """
+    return build_meal_plans(
+        df, servings, food_preferences, seasonal_preferences, intolerances, neighbors, alternatives, seed, progress=progress
+    )[0]
+
+
+def generate_weekly_meal_plan(
+        df: pd.DataFrame,
+        servings: dict,
+        user_profiler: UserProfiler,
+        filename: Path,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        progress: Optional[Callable[[int, int], None]] = None):
+    """
+    Generates a weekly meal plan based on user preferences, seasonal preferences, and intolerances,
+    and saves it to the user profile.
+    Args:
+        df (pd.DataFrame): DataFrame containing the food dataset.
+        servings (dict): Dictionary containing the frequency of servings per week for each category.
+        user_profiler (UserProfiler): UserProfiler object to get user preferences and intolerances.
+        filename (Path): Path to save the generated meal plan.
+        neighbors (NeighborIndex, optional): Precomputed neighbors of df, used to find similar foods.
+        alternatives (AlternativesCache, optional): Memoizes the similar food lookups.
+        seed (int or np.random.Generator, optional): The seed or Generator the plan is drawn with.
+        progress (Callable[[int, int], None], optional): Called with the number of generated meals and the total.
+    Returns:
+        dict: A dictionary containing the generated meals for Breakfast, Snack, Lunch, and Dinner.
+    """
+
+    generated_meals = build_weekly_meal_plan(
+        df,
+        servings,
+        user_profiler.get_food_preferences(),
+        user_profiler.get_seasonal_preferences(),
+        user_profiler.get_intolerances(),
+        neighbors,
+        alternatives,
+        seed,
+        progress
+    )
 
     # Save meal plan to profile
     user_profiler.set_meals(generated_meals)
     user_profiler.save_profile(filename)
 
-    print(f"Weekly meal plan saved to {filename}")
-
     return generated_meals
@@ -1,9 +1,48 @@
 from datetime import datetime
 from food_recommender_system.profiler import UserProfiler
 from food_recommender_system.justificator import get_current_meal
+from food_recommender_system.mealgen import as_generator, choose
 from pathlib import Path
+from typing import Optional, Tuple, Union
+import copy
+import numpy as np
 import pandas as pd
-import random
+
+
+def mood_swap(
+        weekly_meals: dict,
+        df: pd.DataFrame,
+        meal_name: str,
+        day: int,
+        used_jolly: bool,
+        stressed: bool,
+        rng: Union[None, int, np.random.Generator] = None) -> Tuple[dict, Optional[str]]:
+    """
+    Swap a stressed user's lunch or dinner for a fast food, once a week (the jolly), without any side effect.
+    Args:
+        weekly_meals (dict): The weekly meals of the user.
+        df (pd.DataFrame): DataFrame containing food items and their categories.
+        meal_name (str): The name of the meal to be changed (e.g., "Lunch", "Dinner").
+        day (int): The day of the week of the meal (0 is Monday).
+        used_jolly (bool): Whether the user already used the jolly this week.
+        stressed (bool): Whether the user is feeling stressed.
+        rng (int or np.random.Generator, optional): The seed or Generator the fast food is drawn with.
+    Returns:
+        tuple: A copy of the weekly meals, with the fast food as the chosen meal if the meal already had one,
+               and the fast food, or None if the meal is not swapped (the jolly must then stay as it is).
+    """
+    if used_jolly or meal_name not in ["Lunch", "Dinner"] or not stressed:
+        return weekly_meals, None
+
+    fast_foods = df[df["Category Name"] == "Fast Foods"]
+    fast_food = choose(fast_foods["Food Name"].to_list(), as_generator(rng))
+
+    # Overwrite the fast food in the third position of the current meal
+    weekly_meals = copy.deepcopy(weekly_meals)
+    if len(weekly_meals[meal_name][day]) >= 3:
+        weekly_meals[meal_name][day][2] = [fast_food]
+
+    return weekly_meals, fast_food
 
 
 def change_meal(user: UserProfiler, df: pd.DataFrame, meal_name: str, filename: Path):
@@ -19,8 +58,6 @@ def change_meal(user: UserProfiler, df: pd.DataFrame, meal_name: str, filename:
     """
 
     today_day_of_week = datetime.now().weekday()
-    weekly_meals = user.get_meals()
-
     has_used_jolly = user.get_used_jolly()
 
     if has_used_jolly:
@@ -33,20 +70,19 @@ def change_meal(user: UserProfiler, df: pd.DataFrame, meal_name: str, filename:
                 get_current_meal(user)
                 print("\n😉 Just for today, let's eat something that could improve your mood!")
 
-                fast_foods = df[df["Category Name"] == "Fast Foods"]
-                fast_food = random.choice(fast_foods["Food Name"].to_list())
+                swapped = {}
 
-                # Overwrite the fast food in the third position of the current meal
-                if len(weekly_meals[meal_name][today_day_of_week]) >= 3:
-                    weekly_meals[meal_name][today_day_of_week][2] = [fast_food]
+                def swap_meal(profile: UserProfiler):
+                    # Swapped again in the stored profile if someone else changed it in the meantime
+                    swapped_meals, swapped["fast_food"] = mood_swap(
+                        profile.get_meals(), df, meal_name, today_day_of_week, has_used_jolly, is_stressed
+                    )
+                    profile.set_used_jolly(True)
+                    profile.set_meals(swapped_meals)
 
-                user.set_used_jolly(True)
-                user.set_meals(weekly_meals)
-                user.save_profile(filename)
+                user.update_profile(filename, swap_meal)
+                fast_food = swapped["fast_food"]
                 print(f"🍽️ Today you can have {fast_food}. Enjoy your meal!")
-
-                user.set_meals(weekly_meals)
-                user.save_profile(filename)
                 print("🫡 Take care of yourself!")
         else:
             print(f"😊 Enjoy your {meal_name.lower()}!")
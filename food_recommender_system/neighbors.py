@@ -0,0 +1,188 @@
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from food_recommender_system.atomicfile import atomic_write
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.config import NEIGHBORS_K, PROCESSED_DATA_PATH, RAW_DATA_PATH
+from food_recommender_system.dataloader import DataLoader
+
+SCOPES = {True: "category", False: "all"}
+RANKINGS = {False: "similarity", True: "low_density"}
+
+
+class NeighborIndex:
+    """
+    The top-k similar foods of every food in a catalog, precomputed once and persisted as a .npz file.
+
+    For every food and every (scope, ranking) pair the index keeps the catalog rows and scores of the first k
+    foods returned by FoodCatalog.similar_foods, plus the full length of that ranking, so that a query
+    can be answered in O(k) and can tell when the stored neighbors are not enough.
+    """
+
+    def __init__(self, source_hash: str, k: int, names: np.ndarray, arrays: Dict[str, np.ndarray]):
+        self.source_hash = source_hash
+        self.k = k
+        self.names = names
+        self.arrays = arrays
+        self.index = {}
+        for row, name in enumerate(self.names):
+            self.index.setdefault(name, row)
+
+    @staticmethod
+    def _key(same_category: bool, low_density: bool) -> str:
+        return f"{SCOPES[same_category]}_{RANKINGS[low_density]}"
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, source_hash: str, k: int = NEIGHBORS_K, cross_category: bool = False) -> "NeighborIndex":
+        """
+        Compute the top-k neighbors of every food of a DataFrame.
+
+        Args:
+            df (pd.DataFrame): DataFrame containing nutritional information of various foods.
+            source_hash (str): Hash of the file the DataFrame was loaded from.
+            k (int, optional): Number of neighbors kept for each food. Defaults to NEIGHBORS_K.
+            cross_category (bool, optional): If True, also keep the neighbors over the whole catalog. Defaults to False.
+
+        Returns:
+            NeighborIndex: The built index.
+        """
+        catalog = FoodCatalog.for_dataframe(df)
+        arrays = {}
+
+        for same_category in [True, False] if cross_category else [True]:
+            for low_density in RANKINGS:
+                rows = np.full((len(catalog), k), -1, dtype=np.int32)
+                scores = np.zeros((len(catalog), k))
+                counts = np.zeros(len(catalog), dtype=np.int32)
+
+                for row, food_name in enumerate(catalog.names):
+                    ranked_rows, ranked_scores = catalog.similar_foods(
+                        food_name, same_category=same_category, low_density=low_density
+                    )
+                    top = min(k, len(ranked_rows))
+                    rows[row, :top] = ranked_rows[:top]
+                    scores[row, :top] = ranked_scores[:top]
+                    counts[row] = len(ranked_rows)
+
+                key = cls._key(same_category, low_density)
+                arrays.update({f"{key}_rows": rows, f"{key}_scores": scores, f"{key}_counts": counts})
+
+        arrays["energy_density"] = catalog.energy_density
+        return cls(source_hash, k, catalog.names.astype(str), arrays)
+
+    def save(self, path: Path):
+        """Atomically write the index to a .npz file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path, "wb") as file:
+            np.savez(file, source_hash=np.array(self.source_hash), k=np.array(self.k), names=self.names, **self.arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "NeighborIndex":
+        """Load an index written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key not in ("source_hash", "k", "names")}
+            return cls(str(data["source_hash"]), int(data["k"]), data["names"], arrays)
+
+    @classmethod
+    def load_or_build(
+            cls,
+            df: pd.DataFrame,
+            source: Path,
+            path: Path,
+            k: int = NEIGHBORS_K,
+            cross_category: bool = False) -> "NeighborIndex":
+        """
+        Load the index of a DataFrame from disk, rebuilding and saving it if the source file changed.
+
+        Args:
+            df (pd.DataFrame): DataFrame loaded from the source file, with the same preprocessing used to serve queries.
+            source (Path): The file the DataFrame was loaded from, whose content hash keys the index.
+            path (Path): Where the index is stored.
+            k (int, optional): Number of neighbors kept for each food. Defaults to NEIGHBORS_K.
+            cross_category (bool, optional): If True, also keep the neighbors over the whole catalog. Defaults to False.
+
+        Returns:
+            NeighborIndex: An index matching the current content of the source file.
+        """
+        source_hash = DataLoader.file_hash(source)
+        names = FoodCatalog.for_dataframe(df).names
+
+        try:
+            index = cls.load(path)
+            if (
+                index.source_hash == source_hash
+                and index.k >= k
+                and (not cross_category or index.has(same_category=False))
+                and np.array_equal(index.names, names)
+            ):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(df, source_hash, k, cross_category)
+        index.save(path)
+        return index
+
+    def has(self, same_category: bool = True, low_density: bool = False) -> bool:
+        """Return True if the index holds the neighbors for the given scope and ranking."""
+        return f"{self._key(same_category, low_density)}_rows" in self.arrays
+
+    def similar_foods(
+            self,
+            food_name: str,
+            k: int,
+            same_category: bool = True,
+            low_density: bool = False,
+            allowed: Optional[FoodCatalog] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the first k foods similar to the given one, in the order of FoodCatalog.similar_foods.
+
+        Args:
+            food_name (str): The name of the food to find similar foods for.
+            k (int): Number of similar foods to return.
+            same_category (bool, optional): If True, only consider foods in the same category. Defaults to True.
+            low_density (bool, optional): If True, use the energy density ranking. Defaults to False.
+            allowed (FoodCatalog, optional): Only return foods in this catalog, e.g. a filtered copy of the indexed data.
+
+        Returns:
+            tuple: The index rows of the similar foods and their scores, or None if the index cannot answer
+                   (unknown food or ranking, or not enough stored neighbors left after filtering).
+        """
+        row = self.index.get(food_name)
+        if row is None or not self.has(same_category, low_density):
+            return None
+
+        key = self._key(same_category, low_density)
+        rows = self.arrays[f"{key}_rows"][row]
+        count = self.arrays[f"{key}_counts"][row]
+
+        positions = []
+        for position in range(min(count, self.k)):
+            if allowed is None or self.names[rows[position]] in allowed.index:
+                positions.append(position)
+                if len(positions) == k:
+                    break
+
+        if len(positions) < k and count > self.k:
+            return None
+
+        return rows[positions], self.arrays[f"{key}_scores"][row][positions]
+
+    def energy_density(self, rows: np.ndarray) -> np.ndarray:
+        return self.arrays["energy_density"][rows]
+
+
+if __name__ == "__main__":
+    cross_category = "--cross-category" in sys.argv[1:]
+    dataloader = DataLoader()
+    nutritional_facts_file = Path("nutritional-facts.csv")
+    df = dataloader.load_csv(nutritional_facts_file)
+
+    index = NeighborIndex.load_or_build(
+        df, RAW_DATA_PATH / nutritional_facts_file, PROCESSED_DATA_PATH / "neighbors.npz", cross_category=cross_category
+    )
+    print(f"Neighbor index for {len(index.names)} foods (k={index.k}) saved to {PROCESSED_DATA_PATH / 'neighbors.npz'}")
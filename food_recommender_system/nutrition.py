@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.config import MACRONUTRIENTS
+
+OPTIONS = ["Main", "Alternative"]
+DAYS = 7
+
+
+def serving_table(catalog: FoodCatalog, servings, nutrients: List[str]) -> np.ndarray:
+    """
+    Return the nutrients of a serving of every food of a catalog, one row per catalog row plus a last row of zeros
+    for the padding id -1.
+
+    Nutrient values are per 100g and scaled by the serving size of the food category. Missing values and
+    categories without a serving size count as 0.
+
+    Args:
+        catalog (FoodCatalog): The catalog of the foods.
+        servings (dict or pd.DataFrame): The serving size of every category, as in food-servings.json.
+        nutrients (List[str]): The nutrient columns.
+
+    Returns:
+        np.ndarray: A (foods + 1) x nutrients array.
+    """
+    codes, categories = pd.factorize(pd.Series(catalog.categories))
+    sizes = np.array([servings.get(category, {}).get("serving_size") or 0 for category in categories], dtype=np.float64)
+
+    columns = [catalog.columns.index(nutrient) for nutrient in nutrients]
+    table = np.zeros((len(catalog) + 1, len(nutrients)))
+    table[:-1] = np.nan_to_num(np.asarray(catalog.matrix[:, columns], dtype=np.float64)) * (sizes[codes] / 100)[:, None]
+    return table
+
+
+def serving_nutrients(catalog: FoodCatalog, servings, nutrients: List[str], rows: Sequence[int]) -> np.ndarray:
+    """
+    Return the nutrients of a serving of some foods of a catalog, as the rows of serving_table would, computing only
+    those rows, e.g. for the few foods of a meal.
+
+    Args:
+        catalog (FoodCatalog): The catalog of the foods.
+        servings (dict or pd.DataFrame): The serving size of every category, as in food-servings.json.
+        nutrients (List[str]): The nutrient columns.
+        rows (Sequence[int]): The catalog rows of the foods, -1 for a food missing from the catalog (no nutrients).
+
+    Returns:
+        np.ndarray: A rows x nutrients array.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    known = rows >= 0
+    sizes = np.array([
+        servings.get(category, {}).get("serving_size") or 0 for category in catalog.categories[rows[known]]
+    ], dtype=np.float64)
+
+    columns = [catalog.columns.index(nutrient) for nutrient in nutrients]
+    table = np.zeros((len(rows), len(nutrients)))
+    values = np.asarray(catalog.matrix[np.ix_(rows[known], columns)], dtype=np.float64)
+    table[known] = np.nan_to_num(values) * (sizes / 100)[:, None]
+    return table
+
+
+def encode_plan(meals: dict, catalog: FoodCatalog) -> Tuple[List[Tuple[str, int]], np.ndarray]:
+    """
+    Encode a weekly plan as a (slot x option x item) matrix of catalog rows.
+
+    Every entry of a meal type is a slot. Entries are spread evenly over the week, so that a meal type with
+    one entry per day (e.g. the snacks of the CLI) or two (the snacks of the API) is assigned the right days.
+    Meals shorter than the longest one are padded with -1, as are foods missing from the catalog.
+
+    Args:
+        meals (dict): The weekly plan, mapping every meal type to its (main, alternative[, chosen]) entries.
+        catalog (FoodCatalog): The catalog of the foods.
+
+    Returns:
+        tuple: The (meal type, day) of every slot, and the slots x 2 x items array of food ids.
+    """
+    slots = []
+    entries = []
+    for meal_type, meal_entries in meals.items():
+        for i, entry in enumerate(meal_entries):
+            slots.append((meal_type, i * DAYS // len(meal_entries)))
+            entries.append(entry[:len(OPTIONS)])
+
+    width = max((len(foods) for entry in entries for foods in entry), default=0)
+    ids = np.full((len(entries), len(OPTIONS), width), -1, dtype=np.intp)
+    for slot, entry in enumerate(entries):
+        for option, foods in enumerate(entry):
+            rows = [catalog.row_of(food_name) for food_name in foods]
+            ids[slot, option, :len(rows)] = [-1 if row is None else row for row in rows]
+    return slots, ids
+
+
+class PlanNutrition:
+    """
+    The calories and nutrients of a weekly plan, for the main and the alternative option of every meal.
+
+    per_meal holds the totals of every slot (slots x options x nutrients). The per-day and per-week totals are
+    sums of it. Arrays are indexed by OPTIONS on their option axis and by nutrients on their last axis.
+    """
+
+    def __init__(self, nutrients: List[str], slots: List[Tuple[str, int]], per_meal: np.ndarray):
+        self.nutrients = nutrients
+        self.slots = slots
+        self.per_meal = per_meal
+
+    @classmethod
+    def of(cls, meals: dict, df: pd.DataFrame, servings, nutrients: Optional[List[str]] = None) -> "PlanNutrition":
+        """
+        Compute the nutrition of a weekly plan.
+
+        Args:
+            meals (dict): The weekly plan, as returned by generate_weekly_meal_plan or by the API.
+            df (pd.DataFrame): DataFrame containing the nutritional information of the foods.
+            servings (dict): The serving size of every category, as in food-servings.json.
+            nutrients (List[str], optional): The nutrient columns. Defaults to MACRONUTRIENTS.
+
+        Returns:
+            PlanNutrition: The nutrition of the plan.
+        """
+        nutrients = MACRONUTRIENTS if nutrients is None else nutrients
+        catalog = FoodCatalog.for_dataframe(df)
+        slots, ids = encode_plan(meals, catalog)
+        table = serving_table(catalog, servings, nutrients)
+        # The padding id -1 picks the last (zero) row of the table
+        return cls(nutrients, slots, table[ids].sum(axis=2))
+
+    @property
+    def per_day(self) -> np.ndarray:
+        """The totals of every day, a days x options x nutrients array."""
+        days = np.array([day for _, day in self.slots], dtype=np.intp)
+        totals = np.zeros((DAYS, len(OPTIONS), len(self.nutrients)))
+        np.add.at(totals, days, self.per_meal)
+        return totals
+
+    @property
+    def per_week(self) -> np.ndarray:
+        """The totals of the week, an options x nutrients array."""
+        return self.per_meal.sum(axis=0)
+
+    def to_dict(self) -> Dict[str, list]:
+        """Return the per-meal, per-day and per-week totals as JSON-serializable dicts of nutrient values."""
+        def values(totals: np.ndarray) -> dict:
+            return {
+                option: dict(zip(self.nutrients, totals[i].tolist())) for i, option in enumerate(OPTIONS)
+            }
+
+        return {
+            "meals": [
+                {"meal": meal_type, "day": day, **values(totals)} for (meal_type, day), totals in zip(self.slots, self.per_meal)
+            ],
+            "days": [{"day": day, **values(totals)} for day, totals in enumerate(self.per_day)],
+            "week": values(self.per_week)
+        }
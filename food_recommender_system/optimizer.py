@@ -0,0 +1,187 @@
+"""
+Daily calorie and macronutrient targets for weekly plans.
+
+A generated plan is improved by local search: every item of every meal is in turn replaced by the food of its
+pool that brings the totals of its day closest to the targets, the scores of all the foods of the pool being
+computed at once. Days already within the tolerance are left as drawn. Items are only swapped within their
+pool, so a lunch or dinner keeps its main category and the plan keeps the servings budget of the week. The search stops when every day is within the tolerance of
+the targets, when no swap improves the plan, or after a maximum number of passes over the items, and reports the remaining gap.
+The order of the swaps only depends on the Generator, so the same seed always gives the same plan, whatever the
+load of the machine. The time budget is a safety cap, checked after every pass, and the report says if it stopped the search.
+"""
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.config import OPTIMIZER_MAX_PASSES, OPTIMIZER_TIME_BUDGET, OPTIMIZER_TOLERANCE
+from food_recommender_system.mealgen import as_generator, plan_data, sample
+from food_recommender_system.neighbors import NeighborIndex
+from food_recommender_system.nutrition import DAYS, encode_plan, serving_table
+from food_recommender_system.recommender import AlternativesCache, get_similar_food
+
+
+def daily_gaps(day_totals: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Return the relative distance of the totals of every day from the targets, a days x nutrients array."""
+    return np.abs(day_totals - targets) / targets
+
+
+def optimize_meals(
+        meals: dict,
+        df: pd.DataFrame,
+        servings: dict,
+        targets: Dict[str, float],
+        item_pools: Callable[[str, list], List[np.ndarray]],
+        alternative_meals: Callable[[str, list], List[list]],
+        tolerance: float = OPTIMIZER_TOLERANCE,
+        rng: Optional[np.random.Generator] = None,
+        time_budget: float = OPTIMIZER_TIME_BUDGET,
+        max_passes: int = OPTIMIZER_MAX_PASSES) -> Tuple[dict, dict]:
+    """
+    Move the daily totals of the main meals of a plan towards the targets, swapping foods within their pools.
+
+    Args:
+        meals (dict): The weekly plan, which is not modified.
+        df (pd.DataFrame): DataFrame containing the nutritional information of the foods.
+        servings (dict): The serving size of every category, as in food-servings.json.
+        targets (Dict[str, float]): The daily target of some nutrient columns, e.g. {"Calories": 2000}.
+        item_pools (Callable[[str, list], List[np.ndarray]]): Returns the pools of the items of a main meal,
+                                                              given the meal name and the meal.
+        alternative_meals (Callable[[str, list], List[list]]): Returns the alternative meals of a main meal, given
+                                                               the meal name and the meal. Called for every
+                                                               changed meal.
+        tolerance (float, optional): The relative distance from the targets every day may have.
+        rng (np.random.Generator, optional): The Generator the order of the swaps is drawn with.
+        time_budget (float, optional): The maximum time of the search, in seconds, checked after every pass. At
+                                       least one pass is made.
+        max_passes (int, optional): The maximum number of passes over the items.
+
+    Returns:
+        tuple: The optimized copy of the plan, and a report with the initial and final objective (the sum of the
+               squared relative distances from the targets), the largest relative distance of a day from every
+               target, whether every day is within the tolerance, the swaps, passes and seconds taken, and whether
+               the time budget stopped the search (out_of_time).
+    """
+    start = time.perf_counter()
+    nutrients = list(targets)
+    target = np.array([targets[nutrient] for nutrient in nutrients], dtype=np.float64)
+    if (target <= 0).any():
+        raise ValueError("The targets must be positive")
+
+    catalog = FoodCatalog.for_dataframe(df)
+    table = serving_table(catalog, servings, nutrients)
+    slots, ids = encode_plan(meals, catalog)
+    main_ids = ids[:, 0]
+    entries = [(meal_name, index) for meal_name, meal_entries in meals.items() for index in range(len(meal_entries))]
+    days = np.array([day for _, day in slots], dtype=np.intp)
+
+    day_totals = np.zeros((DAYS, len(nutrients)))
+    np.add.at(day_totals, days, table[main_ids].sum(axis=1))
+
+    # The catalog rows of the foods every item can be swapped with
+    pool_rows = {}
+    moves = []
+    for slot, (meal_name, index) in enumerate(entries):
+        main_meal = meals[meal_name][index][0]
+        for item, pool in enumerate(item_pools(meal_name, main_meal)[:len(main_meal)]):
+            if id(pool) not in pool_rows:
+                rows = [catalog.row_of(food_name) for food_name in pool]
+                pool_rows[id(pool)] = (pool, np.array([row for row in rows if row is not None], dtype=np.intp))
+            rows = pool_rows[id(pool)][1]
+            if len(rows) > 1 and main_ids[slot, item] >= 0:
+                moves.append((slot, item, rows))
+
+    def day_cost(totals: np.ndarray) -> np.ndarray:
+        return (((totals - target) / target) ** 2).sum(axis=-1)
+
+    initial_objective = float(day_cost(day_totals).sum())
+    swaps, passes = 0, 0
+    out_of_time = False
+    while passes < max_passes and (daily_gaps(day_totals, target) > tolerance).any():
+        passes += 1
+        improved = False
+        for slot, item, rows in sample(moves, len(moves), rng):
+            day = days[slot]
+            # Days within the tolerance are left as drawn
+            if (daily_gaps(day_totals[day], target) <= tolerance).all():
+                continue
+
+            # The totals of the day with every food of the pool in place of the item
+            base = day_totals[day] - table[main_ids[slot, item]]
+            costs = day_cost(base + table[rows])
+            best = int(np.argmin(costs))
+            if costs[best] < day_cost(day_totals[day]) - 1e-12:
+                main_ids[slot, item] = rows[best]
+                day_totals[day] = base + table[rows[best]]
+                swaps += 1
+                improved = True
+        if not improved:
+            break
+        # Only whole passes are made, so a search stopped by the time budget is the one of a smaller max_passes
+        if time.perf_counter() - start > time_budget:
+            out_of_time = True
+            break
+
+    optimized_meals = {meal_name: list(meal_entries) for meal_name, meal_entries in meals.items()}
+    for slot, (meal_name, index) in enumerate(entries):
+        main_meal = meals[meal_name][index][0]
+        new_meal = [
+            catalog.names[row] if row >= 0 else food_name
+            for food_name, row in zip(main_meal, main_ids[slot, :len(main_meal)].tolist())
+        ]
+        if new_meal != list(main_meal):
+            optimized_meals[meal_name][index] = [new_meal, *alternative_meals(meal_name, new_meal)]
+
+    gaps = daily_gaps(day_totals, target)
+    return optimized_meals, {
+        "initial_objective": initial_objective,
+        "objective": float(day_cost(day_totals).sum()),
+        "gaps": dict(zip(nutrients, gaps.max(axis=0).tolist())),
+        "within_tolerance": bool((gaps <= tolerance).all()),
+        "swaps": swaps,
+        "passes": passes,
+        "seconds": time.perf_counter() - start,
+        "out_of_time": out_of_time
+    }
+
+
+def optimize_weekly_plan(
+        meals: dict,
+        df: pd.DataFrame,
+        servings: dict,
+        food_preferences: List[str],
+        seasonal_preferences: List[str],
+        targets: Dict[str, float],
+        tolerance: float = OPTIMIZER_TOLERANCE,
+        intolerances: Optional[List[str]] = None,
+        neighbors: Optional[NeighborIndex] = None,
+        alternatives: Optional[AlternativesCache] = None,
+        seed: Union[None, int, np.random.Generator] = None,
+        time_budget: float = OPTIMIZER_TIME_BUDGET,
+        max_passes: int = OPTIMIZER_MAX_PASSES) -> Tuple[dict, dict]:
+    """
+    Move the daily totals of a plan of mealgen.build_weekly_meal_plan towards the targets (see optimize_meals).
+    The items are swapped within the pools they are drawn from, and the alternatives of the changed meals are
+    found again.
+
+    Returns:
+        tuple: The optimized copy of the plan, and the report of the search.
+    """
+    _, pools, filtered_df = plan_data(df, food_preferences, seasonal_preferences, intolerances)
+    find_similar_foods = get_similar_food if alternatives is None else alternatives
+
+    def item_pools(meal_name: str, main_meal: list) -> List[np.ndarray]:
+        category = pools.category_of(main_meal[1]) if meal_name in ["Lunch", "Dinner"] else None
+        return pools.meal_pools(meal_name, category)
+
+    def alternative_meals(meal_name: str, main_meal: list) -> List[list]:
+        similar_foods = [
+            find_similar_foods(filtered_df, food_name=food, same_category=True, low_density_food=True, neighbors=neighbors, top_k=1)
+            for food in main_meal
+        ]
+        return [[foods[0][0] if isinstance(foods, list) and foods else food for food, foods in zip(main_meal, similar_foods)]]
+
+    return optimize_meals(
+        meals, df, servings, targets, item_pools, alternative_meals, tolerance, as_generator(seed), time_budget, max_passes
+    )
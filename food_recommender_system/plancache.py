@@ -0,0 +1,103 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from food_recommender_system.config import PLAN_CACHE_SIZE
+
+
+def content_version(data) -> str:
+    """Return a digest of JSON-serializable data (e.g. the servings), equal for equal content whatever the key order."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def plan_key(
+        preferences: Iterable[str],
+        intolerances: Optional[Iterable[str]],
+        servings_version: str,
+        seed: int,
+        catalog_version: str = "",
+        options: Optional[dict] = None) -> str:
+    """
+    Return the content address of a weekly plan.
+
+    A plan only depends on the set of preferred foods (not on their order or repetitions), the intolerances,
+    the servings, the seed it is drawn with, the catalog it is drawn from and the options it is generated
+    with (e.g. the targets of the optimizer), so requests that agree on all of them have the same key.
+
+    Args:
+        preferences (Iterable[str]): The preferred foods.
+        intolerances (Iterable[str], optional): The intolerances of the user.
+        servings_version (str): The content_version of the servings.
+        seed (int): The seed of the plan.
+        catalog_version (str, optional): The version of the catalog the plan is drawn from.
+        options (dict, optional): JSON-serializable options of the generation. Plans without options keep the
+                                  keys they had before options existed.
+
+    Returns:
+        str: The key of the plan.
+    """
+    content = {
+        "preferences": sorted(set(preferences)),
+        "intolerances": sorted(set(intolerances or [])),
+        "servings": servings_version,
+        "seed": seed,
+        "catalog": catalog_version
+    }
+    if options is not None:
+        content["options"] = options
+    return content_version(content)
+
+
+class PlanCache:
+    """
+    A bounded, thread-safe cache of generated plans keyed by plan_key, evicting the least recently used plan.
+
+    Cached plans are shared by every request with the same key, so they must not be modified.
+    hits and misses count the plans served from the cache and generated.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_generate(self, key: str, generate: Callable[[], dict]) -> dict:
+        """Return the cached plan of key, or generate, cache and return it."""
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        # Generate without holding the lock: concurrent requests for the same new key may both generate it,
+        # but they get the same plan since it only depends on the key
+        plan = generate()
+        with self.lock:
+            self.entries[key] = plan
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return plan
+
+    def stats(self) -> dict:
+        """Return the number of hits, misses and cached plans, and the hit rate."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Drop every cached plan and reset the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
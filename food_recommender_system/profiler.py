@@ -1,10 +1,579 @@
+import argparse
+import contextlib
 import json
+import marshal
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from food_recommender_system.config import PROCESSED_DATA_PATH
+from typing import Callable, ContextManager, Hashable, Iterable, List, Optional, Tuple
+from food_recommender_system.atomicfile import atomic_write
+from food_recommender_system.config import (
+    PROCESSED_DATA_PATH,
+    PROFILE_CACHE_SIZE,
+    PROFILE_DATABASE_PATH,
+    PROFILE_STORE,
+    PROFILE_UPDATE_RETRIES
+)
+from food_recommender_system.foodids import CompactPlan, pack_meals, unpack_meals
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the profiles are written without advisory locks
+    fcntl = None
+
+# The fields of a stored profile, in the order they are stored
+PROFILE_FIELDS = ["intolerances", "food_preferences", "seasonal_preferences", "meals", "used_jolly"]
+PROFILE_KEYS = set(PROFILE_FIELDS)
+
+
+def write_json_atomically(path: Path, data, min_mtime_ns: Optional[int] = None) -> os.stat_result:
+    """
+    Write data as JSON to a temporary file next to path and rename it over path, so that readers
+    (and a crash in the middle of the write) see either the old or the new content, never a partial file.
+    The file keeps its permissions (see atomicfile.atomic_write).
+
+    Args:
+        path (Path): The file to write.
+        data: The JSON-serializable data.
+        min_mtime_ns (int, optional): The earliest modification time the file may have, in nanoseconds.
+
+    Returns:
+        os.stat_result: The status of the written file, taken before it replaced path.
+    """
+    with atomic_write(path) as file:
+        json.dump(data, file, indent=4)
+        file.flush()
+        status = os.fstat(file.fileno())
+        if min_mtime_ns is not None and status.st_mtime_ns < min_mtime_ns:
+            os.utime(file.fileno(), ns=(status.st_atime_ns, min_mtime_ns))
+            status = os.fstat(file.fileno())
+    return status
+
+
+@contextlib.contextmanager
+def _flock(path: Path, held: threading.local):
+    """
+    Hold the flock of a lock file, waiting for it. A lock the thread already holds (listed in held) is not
+    taken again, so that a write can be made under the lock its caller holds.
+    """
+    paths = held.__dict__.setdefault("paths", set())
+    if path in paths or fcntl is None:
+        yield
+        return
+
+    # Lock files are left in place: removing one would let two writers lock different files
+    with open(path, "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        paths.add(path)
+        try:
+            yield
+        finally:
+            paths.discard(path)
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class VersionConflict(Exception):
+    """Raised by a write expecting a version of a profile that has been written since."""
+
+
+class ProfileStore:
+    """
+    Where the user profiles are kept, as the JSON-serializable dicts of UserProfiler.to_dict.
+    Profiles are addressed by name, e.g. "default.json".
+
+    Every write of a profile gives it a new version, which save and update return and version reads without
+    loading the profile, so that a ProfileCache can tell whether the profile it holds is still current.
+    A write given the expected_version of a profile is a compare-and-swap: it raises a VersionConflict
+    instead of writing if the profile has been written since.
+    """
+
+    def load(self, name) -> Optional[dict]:
+        """Return a profile, or None if there is no such profile."""
+        raise NotImplementedError
+
+    def load_with_version(self, name) -> Tuple[Optional[dict], Optional[Hashable]]:
+        """
+        Return a profile and its version. The version is read first, so that a profile written in between is
+        returned with an earlier version, and a write expecting it fails instead of overwriting the other one.
+        """
+        version = self.version(name)
+        return self.load(name), version
+
+    def save(self, name, data: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        """Create or replace a profile, and return its new version."""
+        raise NotImplementedError
+
+    def save_many(self, profiles: Iterable[Tuple[str, dict]]):
+        """Create or replace many profiles, given as (name, data) pairs."""
+        for name, data in profiles:
+            self.save(name, data)
+
+    def update(self, name, fields: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        """
+        Replace some fields of a profile, keeping the others, and return its new version.
+        The profile is created if it does not exist.
+        """
+        with self.lock(name):
+            data = self.load(name) or {}
+            data.update(fields)
+            return self.save(name, data, expected_version)
+
+    def version(self, name) -> Optional[Hashable]:
+        """Return the current version of a profile, or None if there is no such profile."""
+        raise NotImplementedError
+
+    def check_version(self, name, expected_version: Optional[Hashable]) -> Optional[Hashable]:
+        """Return the current version of a profile, raising a VersionConflict if it is not the expected one."""
+        version = self.version(name)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(f"{self.location(name)} has version {version}, not {expected_version}")
+        return version
+
+    def lock(self, name) -> ContextManager:
+        """
+        Return the context manager of the advisory lock of a profile, which every write of the profile holds.
+        Holding it keeps the profile from being written by others in the meantime. The lock is reentrant
+        within a thread.
+        """
+        return contextlib.nullcontext()
+
+    def exists(self, name) -> bool:
+        return self.load(name) is not None
+
+    def names(self) -> List[str]:
+        """Return the names of the stored profiles (their file names, e.g. "alice.json", on every store), sorted."""
+        raise NotImplementedError
+
+    def location(self, name) -> str:
+        """Return where a profile is kept, for messages."""
+        return str(name)
+
+
+class JsonProfileStore(ProfileStore):
+    """
+    One indented JSON file per profile in a directory. Names are file names, or paths relative to the directory.
+    A file is always written whole, to a temporary file renamed over it, so it is never left partially written.
+
+    The version of a profile is the inode, size and modification time of its file. Every write holds the
+    flock of the profile (on a .lock file next to it, as the file itself is replaced), under which the
+    version is checked and the modification time is kept later than the one of the file it replaces, so a
+    profile never gets a version back. A file rewritten without the lock (e.g. by hand) with the same size,
+    within the timestamp granularity of the filesystem and on a reused inode, keeps its version.
+    """
+
+    def __init__(self, directory: Path = PROCESSED_DATA_PATH):
+        self.directory = Path(directory)
+        # The lock files held by every thread, so that update can save under the lock it holds
+        self._held = threading.local()
+
+    def __reduce__(self):
+        return type(self), (self.directory,)
+
+    def path(self, name) -> Path:
+        return self.directory / name
+
+    def lock_path(self, name) -> Path:
+        path = self.path(name)
+        return path.with_name(f".{path.name}.lock")
+
+    def lock(self, name) -> ContextManager:
+        return _flock(self.lock_path(name), self._held)
+
+    def load(self, name) -> Optional[dict]:
+        try:
+            with open(self.path(name), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, name, data: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        with self.lock(name):
+            previous = self.check_version(name, expected_version)
+            min_mtime_ns = None if previous is None else previous[2] + 1
+            return self._file_version(write_json_atomically(self.path(name), data, min_mtime_ns))
+
+    def version(self, name) -> Optional[Hashable]:
+        try:
+            return self._file_version(os.stat(self.path(name)))
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _file_version(status: os.stat_result) -> Hashable:
+        return status.st_ino, status.st_size, status.st_mtime_ns
+
+    def exists(self, name) -> bool:
+        return os.path.exists(self.path(name))
+
+    def names(self) -> List[str]:
+        return sorted(path.name for path in self.directory.glob("*.json"))
+
+    def location(self, name) -> str:
+        return str(self.path(name))
+
+
+class SqliteProfileStore(ProfileStore):
+    """
+    The profiles in a table of an SQLite database, keyed by the user id: the name without the .json suffix,
+    so that "alice.json" and "alice" are the same profile.
+
+    Every field of a profile is a row of its own, so that changing a field (e.g. used_jolly) only writes the
+    pages of that field instead of the whole profile. The rows are keyed by user id and field, so a profile is
+    found through the index instead of a directory scan. The database is in WAL mode, so readers are not
+    blocked by a writer, and every thread has its own connection.
+
+    The version of a profile is a counter of its writes, kept in a table of its own and incremented in the
+    transaction of every write, which also checks the expected version. Every write also holds the flock of
+    the profile, on a file of the .locks directory next to the database.
+    """
+
+    def __init__(self, path: Path = PROFILE_DATABASE_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        # The connections inherited from the parent process, see connection
+        self._inherited = []
+        self.locks_directory = self.path.with_name(f"{self.path.name}.locks")
+        self.locks_directory.mkdir(parents=True, exist_ok=True)
+        with self.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS profile_fields ("
+                "user_id TEXT NOT NULL, field TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (user_id, field))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS profile_versions (user_id TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def __reduce__(self):
+        # Connections and locks are not pickled: the store is opened again, e.g. in a spawned worker process
+        return type(self), (self.path,)
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, opening it on first use and in every forked process."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid != os.getpid():
+            # A connection must not be used across fork, nor closed by the child, which would release the
+            # locks of the parent on the database: it is kept open and a new one is opened
+            self._inherited.append(connection)
+            connection = None
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode, commits are still atomic and durable against crashes of the application
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def user_id(name) -> str:
+        return Path(name).name.removesuffix(".json")
+
+    def load(self, name) -> Optional[dict]:
+        rows = self.connection().execute(
+            "SELECT field, data FROM profile_fields WHERE user_id = ?", (self.user_id(name),)
+        ).fetchall()
+        return {field: json.loads(data) for field, data in rows} if rows else None
+
+    def save(self, name, data: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        with self.lock(name), self.connection() as connection:
+            return self._write(connection, self.user_id(name), data, expected_version, replace=True)
+
+    def save_many(self, profiles: Iterable[Tuple[str, dict]]):
+        # One transaction for all the profiles
+        with self.connection() as connection:
+            for name, data in profiles:
+                self._write(connection, self.user_id(name), data, replace=True)
+
+    def update(self, name, fields: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        with self.lock(name), self.connection() as connection:
+            return self._write(connection, self.user_id(name), fields, expected_version)
+
+    def lock(self, name) -> ContextManager:
+        return _flock(self.locks_directory / f"{self.user_id(name)}.lock", self._local)
+
+    def _write(
+            self,
+            connection: sqlite3.Connection,
+            user_id: str,
+            fields: dict,
+            expected_version: Optional[int] = None,
+            replace: bool = False) -> int:
+        """Write some fields of a profile (all of them if replace) and return its new version."""
+        # The version is bumped first, so that the write lock of the database is held from the version check on
+        # and a conflicting write is rolled back before anything is written
+        version = self._next_version(connection, user_id, expected_version)
+        if replace:
+            connection.execute("DELETE FROM profile_fields WHERE user_id = ?", (user_id,))
+        connection.executemany(
+            "INSERT INTO profile_fields (user_id, field, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, field) DO UPDATE SET data = excluded.data",
+            ((user_id, field, json.dumps(data)) for field, data in fields.items())
+        )
+        return version
+
+    def _next_version(self, connection: sqlite3.Connection, user_id: str, expected_version: Optional[int]) -> int:
+        if expected_version is None:
+            return connection.execute(
+                "INSERT INTO profile_versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1 RETURNING version",
+                (user_id,)
+            ).fetchone()[0]
+
+        row = connection.execute(
+            "UPDATE profile_versions SET version = version + 1 WHERE user_id = ? AND version = ? RETURNING version",
+            (user_id, expected_version)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        version = self._version(connection, user_id)
+        if version != expected_version:
+            raise VersionConflict(f"{self.location(user_id)} has version {version}, not {expected_version}")
+        # A profile without a version yet
+        connection.execute("INSERT INTO profile_versions (user_id, version) VALUES (?, ?)", (user_id, version + 1))
+        return version + 1
+
+    def version(self, name) -> Optional[Hashable]:
+        return self._version(self.connection(), self.user_id(name))
+
+    @staticmethod
+    def _version(connection: sqlite3.Connection, user_id: str) -> Optional[int]:
+        row = connection.execute("SELECT version FROM profile_versions WHERE user_id = ?", (user_id,)).fetchone()
+        if row is not None:
+            return row[0]
+        # Profiles written before the versions were kept have not been written since
+        exists = connection.execute("SELECT 1 FROM profile_fields WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+        return 0 if exists is not None else None
+
+    def exists(self, name) -> bool:
+        return self.connection().execute(
+            "SELECT 1 FROM profile_fields WHERE user_id = ? LIMIT 1", (self.user_id(name),)
+        ).fetchone() is not None
+
+    def names(self) -> List[str]:
+        # The names of the JSON files the profiles would have, as JsonProfileStore lists them
+        rows = self.connection().execute("SELECT DISTINCT user_id FROM profile_fields ORDER BY user_id")
+        return [f"{user_id}.json" for user_id, in rows]
+
+    def location(self, name) -> str:
+        return f"{self.path} ({self.user_id(name)})"
+
+    def close(self):
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class ProfileCache(ProfileStore):
+    """
+    A bounded, thread-safe, write-through cache of the profiles of a store, evicting the least recently used one.
+
+    Every load checks the version of the profile in the store (a stat of its file, or a lookup of its counter),
+    and the cached profile is only returned if it has not been written since, e.g. by another process. Saves
+    and updates go to the store and then to the cache, so a profile read after it is written is served from
+    memory. Profiles are kept marshalled, so every load returns a copy the caller may modify, in a fraction of
+    the time parsing them takes. hits and misses count the profiles served from the cache and from the store.
+    """
+
+    def __init__(self, store: ProfileStore, max_entries: int = PROFILE_CACHE_SIZE):
+        self.store = store
+        self.max_entries = max_entries
+        # (version, marshalled profile) of every cached profile, keyed by location
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.entries_lock = threading.Lock()
+
+    def __reduce__(self):
+        # The cached profiles are not pickled
+        return type(self), (self.store, self.max_entries)
+
+    def load(self, name) -> Optional[dict]:
+        return self.load_with_version(name)[0]
+
+    def load_with_version(self, name) -> Tuple[Optional[dict], Optional[Hashable]]:
+        key = self.store.location(name)
+        # The version is read before the profile, so that a profile is never cached with a later version
+        version = self.store.version(name)
+        with self.entries_lock:
+            entry = self.entries.get(key)
+            if entry is not None and version is not None and entry[0] == version:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return marshal.loads(entry[1]), version
+            self.misses += 1
+
+        data = self.store.load(name)
+        self._put(key, version, data)
+        return data, version
+
+    def save(self, name, data: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        version = self.store.save(name, data, expected_version)
+        # The profile is cached as it will be loaded from the store, not as the caller holds it
+        self._put(self.store.location(name), version, json.loads(json.dumps(data)))
+        return version
+
+    def save_many(self, profiles: Iterable[Tuple[str, dict]]):
+        # Bulk writes (e.g. migrations) would evict every profile in use, so they are not cached
+        profiles = list(profiles)
+        self.store.save_many(profiles)
+        for name, _ in profiles:
+            self.invalidate(name)
+
+    def update(self, name, fields: dict, expected_version: Optional[Hashable] = None) -> Hashable:
+        key = self.store.location(name)
+        with self.store.lock(name):
+            previous = self.store.check_version(name, expected_version)
+            with self.entries_lock:
+                entry = self.entries.get(key)
+            if entry is None or previous is None or entry[0] != previous:
+                self.invalidate(name)
+                return self.store.update(name, fields, expected_version)
+
+            data = marshal.loads(entry[1])
+            data.update(json.loads(json.dumps(fields)))
+            try:
+                # The write expects the version of the cached profile, which is then known to be the one updated
+                if type(self.store).update is ProfileStore.update:
+                    # The store rewrites whole profiles anyway, so the cached one saves it a load
+                    version = self.store.save(name, data, previous)
+                else:
+                    version = self.store.update(name, fields, previous)
+            except VersionConflict:
+                # Written since the version was read, which only stores without locks allow
+                self.invalidate(name)
+                if expected_version is not None:
+                    raise
+                return self.store.update(name, fields)
+        self._put(key, version, data)
+        return version
+
+    def _put(self, key: str, version: Optional[Hashable], data: Optional[dict]):
+        with self.entries_lock:
+            if version is None or data is None:
+                self.entries.pop(key, None)
+                return
+            self.entries[key] = (version, marshal.dumps(data))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, name):
+        """Drop the cached profile of a name, if any."""
+        with self.entries_lock:
+            self.entries.pop(self.store.location(name), None)
+
+    def version(self, name) -> Optional[Hashable]:
+        return self.store.version(name)
+
+    def lock(self, name) -> ContextManager:
+        return self.store.lock(name)
+
+    def exists(self, name) -> bool:
+        return self.store.exists(name)
+
+    def names(self) -> List[str]:
+        return self.store.names()
+
+    def location(self, name) -> str:
+        return self.store.location(name)
+
+    def stats(self) -> dict:
+        """Return the number of hits, misses and cached profiles, and the hit rate."""
+        with self.entries_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Drop every cached profile and reset the counters."""
+        with self.entries_lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# The store of UserProfiler, built from the configuration on first use
+_profile_store = None
+
+
+def get_profile_store() -> ProfileStore:
+    """
+    Return the store the profiles are loaded from and saved to, by default the one of PROFILE_STORE behind a
+    ProfileCache of PROFILE_CACHE_SIZE profiles (none if 0).
+    """
+    global _profile_store
+    if _profile_store is None:
+        store = SqliteProfileStore() if PROFILE_STORE == "sqlite" else JsonProfileStore()
+        _profile_store = ProfileCache(store) if PROFILE_CACHE_SIZE > 0 else store
+    return _profile_store
+
+
+def set_profile_store(store: Optional[ProfileStore]):
+    """Set the store of the profiles. None goes back to the one of PROFILE_STORE."""
+    global _profile_store
+    _profile_store = store
+
+
+def profile_display_name(name) -> str:
+    """
+    Return the name of a profile to show to the user, e.g. "Jane doe" for "jane_doe.json".
+
+    Args:
+        name: The name of the profile in its store, as listed by ProfileStore.names.
+
+    Returns:
+        The name of the profile without its extension, with spaces for underscores and capitalized.
+    """
+    return Path(name).name.removesuffix(".json").replace("_", " ").capitalize()
+
+
+def migrate_profiles(source: ProfileStore, target: ProfileStore) -> Tuple[int, List[str]]:
+    """
+    Copy every profile of a store to another one, e.g. from the JSON files to an SQLite database.
+
+    Args:
+        source (ProfileStore): The store to copy the profiles from.
+        target (ProfileStore): The store to copy the profiles to. Profiles with the same name are replaced.
+
+    Returns:
+        tuple: The number of copied profiles, and the names of the skipped ones, which are unreadable
+               or miss some profile fields.
+    """
+    profiles, skipped = [], []
+    for name in source.names():
+        try:
+            data = source.load(name)
+        except (OSError, ValueError):
+            data = None
+        if isinstance(data, dict) and PROFILE_KEYS <= data.keys():
+            profiles.append((name, data))
+        else:
+            skipped.append(name)
+
+    target.save_many(profiles)
+    return len(profiles), skipped
 
 
 class UserProfiler:
+    """
+    The profile of a user. The fields set since the profile was loaded or saved are tracked, so that saving it
+    again only writes those (see save_profile). So is the version of the profile in its store, so that a change
+    made by update_profile is applied again, instead of overwriting the profile, if someone else wrote it since.
+
+    Weekly plans are stored as the packed form of a CompactPlan of food ids (see foodids.py), and held packed once
+    loaded or saved, so that loading a profile does not decode them. The first get_meals() decodes them to a
+    CompactPlan, and every get_meals() returns them in the dict-of-lists format.
+    """
+
     def __init__(
             self,
             # TODO diet="omnivore",
@@ -14,19 +583,41 @@ class UserProfiler:
             meals=None,
             used_jolly=False):
         # TODO self.diet = "omnivore"
+        self._dirty = set()
+        # The store and location the profile was last loaded from or saved to, and its version there
+        self._saved_to = None
+        self._version = None
         self.intolerances = intolerances if intolerances else []
         self.food_preferences = food_preferences if food_preferences else []
         self.seasonal_preferences = seasonal_preferences if seasonal_preferences else []
         self.meals = meals if meals else {}
         self.used_jolly = used_jolly if used_jolly else False
 
+    def __setattr__(self, name, value):
+        if name in PROFILE_KEYS:
+            self._dirty.add(name)
+        super().__setattr__(name, value)
+
+    @property
+    def meals(self) -> dict:
+        meals = self._meals
+        if CompactPlan.is_compact(meals):
+            meals = self._meals = unpack_meals(meals)
+        return meals.to_meals() if isinstance(meals, CompactPlan) else meals
+
+    @meals.setter
+    def meals(self, meals):
+        self._meals = meals
+
     def set_intolerances(self, intolerance: str):
         """Add an intolerance to the profile"""
 
         if intolerance == "Lactose":
             self.intolerances.append(["Dairy", "Dairy Breakfast"])
+            self._dirty.add("intolerances")
         if intolerance == "Gluten":
             self.intolerances.append(["Grains", "Baked Products", "Baked Products Breakfast"])
+            self._dirty.add("intolerances")
 
     def get_intolerances(self) -> list:
         return self.intolerances
@@ -58,9 +649,12 @@ class UserProfiler:
     def get_used_jolly(self) -> bool:
         return self.used_jolly
 
-    def save_profile(self, filename: Path):
+    def get_dirty_fields(self) -> set:
+        """Return the fields set since the profile was loaded or saved."""
+        return set(self._dirty)
 
-        profile_data = {
+    def to_dict(self) -> dict:
+        return {
             # TODO "diet": self.diet,
             "intolerances": self.intolerances,
             "food_preferences": self.food_preferences,
@@ -68,59 +662,120 @@ class UserProfiler:
             "meals": self.meals,
             "used_jolly": self.used_jolly
         }
-        with open(PROCESSED_DATA_PATH / filename, "w") as file:
-            json.dump(profile_data, file, indent=4)
+
+    def _stored_fields(self, fields: Iterable[str]) -> dict:
+        """Return some fields as they are stored, with the meals packed (see foodids.pack_meals)."""
+        stored = {}
+        for field in fields:
+            if field == "meals":
+                stored[field] = pack_meals(self._meals)
+                # The plan is held packed from now on
+                self._meals = stored[field]
+            else:
+                stored[field] = getattr(self, field)
+        return stored
+
+    def save_profile(self, filename: Path, store: Optional[ProfileStore] = None, check_version: bool = False):
+        """
+        Save the profile to a store, by default the one of get_profile_store.
+
+        A profile saved where it was loaded from or last saved to only writes the fields set since then, and
+        nothing if there are none. Otherwise the whole profile is written. With check_version, the fields are
+        only written if the profile has not been written since, and a VersionConflict is raised otherwise.
+        """
+        store = get_profile_store() if store is None else store
+        saved_to = (store, store.location(filename))
+        if self._saved_to != saved_to:
+            self._version = store.save(filename, self._stored_fields(PROFILE_FIELDS))
+        elif self._dirty:
+            expected_version = self._version if check_version else None
+            self._version = store.update(filename, self._stored_fields(sorted(self._dirty)), expected_version)
+        self._dirty.clear()
+        self._saved_to = saved_to
+
+    def update_profile(
+            self,
+            filename: Path,
+            change: Callable[["UserProfiler"], None],
+            store: Optional[ProfileStore] = None,
+            retries: int = PROFILE_UPDATE_RETRIES):
+        """
+        Apply a change to the profile and save it, without losing the writes made to the stored profile by others
+        (e.g. the demo and the CLI) since it was loaded.
+
+        The profile is saved with check_version, without locking it. On a conflict, the change is made again
+        to the stored profile under the lock of the profile, so that no other writer of the store can write it
+        in between. Only writers that do not take the lock (e.g. edits by hand) can make that attempt conflict,
+        in which case it is made again.
+
+        Args:
+            filename (Path): The name of the profile.
+            change (Callable[[UserProfiler], None]): Sets some fields of the profile it is given. It is called
+                                                     again with the stored profile after every conflict.
+            store (ProfileStore, optional): The store of the profile. Defaults to get_profile_store().
+            retries (int, optional): The number of attempts under the lock before giving up.
+
+        Raises:
+            VersionConflict: If the profile was still written by others on the last attempt.
+        """
+        store = get_profile_store() if store is None else store
+        for attempt in range(retries + 1):
+            with store.lock(filename) if attempt else contextlib.nullcontext():
+                if attempt:
+                    # The fields set by the change, and any other unsaved ones, are replaced by the stored ones
+                    self.__dict__.update(self.load_profile(filename, store).__dict__)
+                change(self)
+                try:
+                    self.save_profile(filename, store, check_version=True)
+                    return
+                except VersionConflict:
+                    if attempt == retries:
+                        raise
 
     @classmethod
-    def check_profile(self, filename: Path):
+    def check_profile(self, filename: Path, store: Optional[ProfileStore] = None):
         """
         Checks if a profile exists for the given filename. If the profile does not exist,
         it creates a new one.
 
         Args:
             filename (Path): The name of the file to check for the profile.
+            store (ProfileStore, optional): The store of the profile. Defaults to get_profile_store().
 
         Returns:
             None
         """
-
-        if not os.path.exists(PROCESSED_DATA_PATH / filename):
+        store = get_profile_store() if store is None else store
+        if not store.exists(filename):
             print("🆕 Profile not found. Creating a new one...")
-            self.create_new_profile(filename)
+            self.create_new_profile(filename, store)
 
     @classmethod
-    def load_profile(cls, filename: Path):
-
-        try:
-            with open(PROCESSED_DATA_PATH / filename, "r") as file:
-                data = json.load(file)
-                return cls(
-                    # TODO diet=data["diet"],
-                    intolerances=data["intolerances"],
-                    food_preferences=data["food_preferences"],
-                    seasonal_preferences=data["seasonal_preferences"],
-                    meals=data["meals"],
-                    used_jolly=data["used_jolly"])
-        except FileNotFoundError:
+    def load_profile(cls, filename: Path, store: Optional[ProfileStore] = None):
+        store = get_profile_store() if store is None else store
+        data, version = store.load_with_version(filename)
+        if data is None:
             print("File not found")
             return cls()
 
-    @staticmethod
-    def create_new_profile(filename: Path):
-
-        empty_profile = {
-            # TODO "diet": "omnivore",
-            "intolerances": [],
-            "food_preferences": [],
-            "seasonal_preferences": [],
-            "meals": {},
-            "used_jolly": False
-        }
+        profile = cls(
+            # TODO diet=data["diet"],
+            intolerances=data["intolerances"],
+            food_preferences=data["food_preferences"],
+            seasonal_preferences=data["seasonal_preferences"],
+            meals=data["meals"],
+            used_jolly=data["used_jolly"])
+        profile._dirty.clear()
+        profile._saved_to = (store, store.location(filename))
+        profile._version = version
+        return profile
 
-        with open(PROCESSED_DATA_PATH / filename, "w") as f:
-            json.dump(empty_profile, f, indent=4)
+    @staticmethod
+    def create_new_profile(filename: Path, store: Optional[ProfileStore] = None):
+        store = get_profile_store() if store is None else store
+        store.save(filename, UserProfiler().to_dict())
 
-        print(f"🆕 Empty profile created at {PROCESSED_DATA_PATH / filename}")
+        print(f"🆕 Empty profile created at {store.location(filename)}")
 
     def __str__(self) -> str:
 
@@ -131,3 +786,19 @@ class UserProfiler:
             \nMeals: {self.meals}
             \nUsed jolly: {self.used_jolly}
         """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the JSON profiles of a directory to an SQLite profile database.")
+    parser.add_argument("--directory", type=Path, default=PROCESSED_DATA_PATH, help="directory of the JSON profiles")
+    parser.add_argument("--database", type=Path, default=PROFILE_DATABASE_PATH, help="SQLite database to copy them to")
+    args = parser.parse_args()
+
+    migrated, skipped = migrate_profiles(JsonProfileStore(args.directory), SqliteProfileStore(args.database))
+    print(f"Migrated {migrated} profiles from {args.directory} to {args.database}")
+    for name in skipped:
+        print(f"Skipped {name}: not a profile")
+
+
+if __name__ == "__main__":
+    main()
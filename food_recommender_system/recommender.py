@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
-from numpy.linalg import norm
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, List, Optional
 
+from food_recommender_system.catalog import FoodCatalog
 from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.neighbors import NeighborIndex
 from food_recommender_system.profiler import UserProfiler
 from food_recommender_system.config import EXCLUDED_CATEGORIES, PREFERENCES, LACTOSE_INTOLERANCE, GLUTEN_INTOLERANCE, LACTOSE_AND_GLUTEN_INTOLERANCE
 
@@ -29,7 +31,7 @@ def get_seasonal_food(df: pd.DataFrame, seasonality: dict, nationality: str = "I
     seasonal_food = seasonality.get(nationality, {}).get(current_month, [])
 
     for food in seasonal_food:
-        food_category = df[df["Food Name"] == food]["Category Name"].values
+        food_category = DataLoader.get_food_category(df, food)
 
         if len(food_category) > 0:
             category = food_category[0]
@@ -42,51 +44,166 @@ def get_seasonal_food(df: pd.DataFrame, seasonality: dict, nationality: str = "I
     return fruits, vegetables
 
 
-def get_similar_food(df: pd.DataFrame, food_name: str, same_category: bool = True, low_density_food: bool = True):
+def get_similar_food(
+        df: pd.DataFrame,
+        food_name: str,
+        same_category: bool = True,
+        low_density_food: bool = True,
+        neighbors: Optional[NeighborIndex] = None,
+        top_k: Optional[int] = None):
     """
     Get a list of foods similar to the given food based on nutritional information.
     Parameters:
     df (pd.DataFrame): DataFrame containing nutritional information of various foods.
     food_name (str): The name of the food to find similar foods for.
-    same_category (bool, optional): If True, only consider foods in the same category as the given food. Default is True.
+    same_category (bool, optional): If True, only consider foods in the same category as the given food,
+                                    otherwise the whole catalog. Default is True.
     low_density_food (bool, optional): If True, sort similar foods by energy density. Default is True.
+    neighbors (NeighborIndex, optional): Precomputed neighbors of the dataset df was filtered from, used to answer
+                                         top_k queries without scanning the category. Default is None.
+    top_k (int, optional): If given, only return the first top_k similar foods. Default is None.
     Returns:
     list: A list of tuples containing similar foods and their similarity scores. If low_density_food is True,
           each tuple also includes the energy density of the food.
     """
 
-    similar_foods = []
+    catalog = FoodCatalog.for_dataframe(df)
+    if catalog.row_of(food_name) is None:
+        return f"No information found for {food_name}"
 
-    if same_category:
-        food_info = DataLoader.get_nutritional_info(df, food_name, only_numbers=False)
-        if food_info is None:
-            return f"No information found for {food_name}"
+    ranking = None
+    if neighbors is not None and top_k is not None:
+        ranking = neighbors.similar_foods(food_name, top_k, same_category, low_density_food, allowed=catalog)
 
-        category = food_info["Category Name"].values[0]
-        food_A = DataLoader.get_nutritional_info(df, food_name).to_numpy().flatten()
+    if ranking is not None:
+        rows, similarities = ranking
+        names = neighbors.names[rows].tolist()
+        rows = [catalog.row_of(name) for name in names]
+    else:
+        # Ranked by energy density (ascending) and then by similarity if low_density_food, otherwise by similarity
+        rows, similarities = catalog.similar_foods(food_name, same_category=same_category, low_density=low_density_food)
+        rows, similarities = rows[:top_k], similarities[:top_k]
+        names = catalog.names[rows].tolist()
 
-        for food in df[df["Category Name"] == category]["Food Name"]:
-            if food == food_name:
-                continue
-            food_B = DataLoader.get_nutritional_info(df, food).to_numpy().flatten()
+    if low_density_food:
+        return list(zip(names, similarities.tolist(), catalog.energy_density_class[rows].tolist()))
 
-            norm_A = norm(food_A)
-            norm_B = norm(food_B)
+    return list(zip(names, similarities.tolist()))
 
-            if norm_A == 0 or norm_B == 0:
-                similarity = 0
-            else:
-                similarity = np.dot(food_A, food_B) / (norm_A * norm_B)
 
-            similar_foods.append((food, similarity))
+class AlternativesCache:
+    """
+    Memoizes get_similar_food, so that the alternatives of a food are searched once even when the food
+    is drawn many times, e.g. by the meals of a weekly plan.
 
-        similar_foods = sorted(similar_foods, key=lambda x: x[1], reverse=True)
+    Results are keyed by (food, same_category, low_density_food, top_k, catalog version), where the catalog
+    version is a digest of the DataFrame content, so a cache stays valid across plans as long as the data
+    it is queried with does not change. hits and misses count the lookups served from the cache and searched.
+    """
 
-        if low_density_food:
-            similar_foods = sorted(similar_foods, key=lambda x: (DataLoader.compute_energy_density(df, x[0])[1], x[1]))
-            similar_foods = [(food, similarity, DataLoader.compute_energy_density(df, food)[0]) for food, similarity in similar_foods]
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(
+            self,
+            df: pd.DataFrame,
+            food_name: str,
+            same_category: bool = True,
+            low_density_food: bool = True,
+            neighbors: Optional[NeighborIndex] = None,
+            top_k: Optional[int] = None):
+        """Return get_similar_food(df, food_name, same_category, low_density_food, neighbors, top_k), memoized."""
+        key = (food_name, same_category, low_density_food, top_k, FoodCatalog.for_dataframe(df).version)
+        if key in self.entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.entries[key] = get_similar_food(df, food_name, same_category, low_density_food, neighbors, top_k)
+
+        similar_foods = self.entries[key]
+        # Callers get their own copy of the list, so they cannot change the cached one
+        return list(similar_foods) if isinstance(similar_foods, list) else similar_foods
+
+    def stats(self) -> dict:
+        """Return the number of hits, misses and cached results, and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Drop every cached result and reset the counters."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def default_preferences(intolerances: List[str]) -> Dict[str, List[str]]:
+    """Return the default preferred foods of each category for a list of intolerances."""
+    if intolerances == LACTOSE_INTOLERANCE:
+        return PREFERENCES["lactose_intolerance"]
+    if intolerances == GLUTEN_INTOLERANCE:
+        return PREFERENCES["gluten_intolerance"]
+    if intolerances == LACTOSE_AND_GLUTEN_INTOLERANCE:
+        return PREFERENCES["lactose_and_gluten_intolerance"]
+    return PREFERENCES["no_intolerances"]
+
+
+def preference_data(df: pd.DataFrame, intolerances: List[str]) -> pd.DataFrame:
+    """Return the foods a user with some intolerances can choose as preferences."""
+    return DataLoader.filter_categories(DataLoader.filter_categories(df, EXCLUDED_CATEGORIES), intolerances)
+
+
+def preference_options(df: pd.DataFrame, intolerances: List[str]) -> Dict[str, List[str]]:
+    """
+    Return the foods a user can choose as preferences, by category.
+    Args:
+        df (pd.DataFrame): DataFrame containing food data.
+        intolerances (List[str]): The categories the user is intolerant to.
+    Returns:
+        Dict[str, List[str]]: The foods of every category the user is not intolerant to.
+    """
+    categories = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES)["Category Name"].unique()
+    if intolerances != []:
+        # Remove those categories related to intolerances
+        categories = np.setdiff1d(categories, intolerances)
 
-        return similar_foods
+    data = preference_data(df, intolerances)
+    return {category: data[data["Category Name"] == category]["Food Name"].tolist() for category in categories}
+
+
+def resolve_preferences(df: pd.DataFrame, intolerances: List[str], selections: Dict[str, Optional[List[str]]]) -> List[str]:
+    """
+    Return the food preferences of a user from the foods selected in every category.
+    Args:
+        df (pd.DataFrame): DataFrame containing food data.
+        intolerances (List[str]): The categories the user is intolerant to.
+        selections (Dict[str, List[str]]): The selected foods of each category. The default preferences are used
+                                           for the categories with no (or an empty) selection.
+    Returns:
+        List[str]: The preferred foods, empty if none of them is in the dataset.
+    """
+    defaults = default_preferences(intolerances)
+    data = preference_data(df, intolerances)
+
+    frames = [
+        data[data["Food Name"].isin(selections.get(category) or defaults[category])]
+        for category in preference_options(df, intolerances)
+    ]
+    if not frames:
+        return []
+    return pd.concat(frames)["Food Name"].unique().tolist()
+
+
+def resolve_seasonal_preferences(df: pd.DataFrame, fruits: List[str], vegetables: List[str]) -> List[str]:
+    """Return the seasonal preferences of a user from the selected seasonal fruits and vegetables."""
+    combined_preferences = pd.concat([df[df['Food Name'].isin(fruits)], df[df['Food Name'].isin(vegetables)]])
+    return combined_preferences["Food Name"].unique().tolist()
 
 
 def ask_user_preferences(df: pd.DataFrame, user_profiler: UserProfiler, filename: Path):
@@ -99,46 +216,27 @@ def ask_user_preferences(df: pd.DataFrame, user_profiler: UserProfiler, filename
     filename (Path): The path where the user profile will be saved.
     The function performs the following steps:
     1. Sets default preferences based on user intolerances.
-    2. Filters the dataframe to exclude certain categories and intolerances.
-    3. Prompts the user to select their preferred foods from each category.
-    4. Combines the selected preferences into a single dataframe.
-    5. Saves the user's food preferences to a profile.
+    2. Prompts the user to select their preferred foods from each category (see preference_options).
+    3. Resolves the selections into a list of foods (see resolve_preferences).
+    4. Saves the user's food preferences to a profile.
     If no preferences are selected for a category, default preferences are used.
-    If the combined preferences dataframe is empty, the original filtered data is used.
+    If the combined preferences are empty, the filtered data is returned and nothing is saved.
     """
 
-    preferences = {}
-    # Set the default preferences
-    default_preferences = PREFERENCES["no_intolerances"]
-
-    # Remove those categories that are not required
-    filtered_df = DataLoader.filter_categories(df, EXCLUDED_CATEGORIES)
-    # Get all category names from the filtered dataframe
-    categories = filtered_df["Category Name"].unique()
+    selections = {}
     # Get user intolerances to update default preferences
     user_intolerances = user_profiler.get_intolerances()
 
     if user_intolerances == LACTOSE_INTOLERANCE:
         print("Loading default preferences for lactose intolerance...")
-        default_preferences = PREFERENCES["lactose_intolerance"]
     if user_intolerances == GLUTEN_INTOLERANCE:
         print("Loading default preferences for gluten intolerance...")
-        default_preferences = PREFERENCES["gluten_intolerance"]
     if user_intolerances == LACTOSE_AND_GLUTEN_INTOLERANCE:
         print("Loading default preferences for lactose and gluten intolerance...")
-        default_preferences = PREFERENCES["lactose_and_gluten_intolerance"]
-
-    # Filter again the dataframe taking into account intolerances
-    data = DataLoader.filter_categories(filtered_df, user_intolerances)
-    if user_intolerances != []:
-        # Remove those categories related to intolerances
-        categories = np.setdiff1d(categories, user_intolerances)
 
     print("To create your profile, please follow the instructions below:")
 
-    for category in categories:
-        foods = data[data["Category Name"] == category]["Food Name"].tolist()
-
+    for category, foods in preference_options(df, user_intolerances).items():
         print(f"\n{category}:")
         for i, food in enumerate(foods, 1):
             print(f"{i}. {food}")
@@ -148,30 +246,25 @@ def ask_user_preferences(df: pd.DataFrame, user_profiler: UserProfiler, filename
                 choices = input(f"Press Enter to use default preferences or select {category} (1-{len(foods)}): ")
                 if not choices:
                     print(f"No selection made for {category}, using default preferences...")
-                    preferences[category] = default_preferences[category]
                     break
 
                 selected = [int(x) for x in choices.split()]
 
                 if all(1 <= x <= len(foods) for x in selected):
-                    preferences[category] = [foods[i - 1] for i in selected]
+                    selections[category] = [foods[i - 1] for i in selected]
                     break
                 else:
                     print("Invalid selection. Please try again.")
             except ValueError:
                 print("Please enter valid numbers separated by spaces.")
 
-    # Combine all preferences into a single dataframe
-    combined_preferences = pd.concat(
-        [data[data["Food Name"].isin(preferences[category])] for category in preferences]
-    )
+    food_list = resolve_preferences(df, user_intolerances, selections)
 
-    # If combined_preferences is empty, fallback to data
-    if combined_preferences.empty:
-        return data
+    # If there are no preferences, fallback to data
+    if not food_list:
+        return preference_data(df, user_intolerances)
 
-    food_list = combined_preferences["Food Name"].unique()
-    user_profiler.set_food_preferences(food_list.tolist())
+    user_profiler.set_food_preferences(food_list)
     user_profiler.save_profile(filename)
 
     print("\n✅ Your preferences have been saved successfully!")
@@ -223,16 +316,9 @@ def ask_seasonal_preferences(df: pd.DataFrame, seasonality: dict, user_profiler:
     else:
         selected_vegetables = vegetables
 
-    # Filter the user preferences dataframe to include only selected seasonal fruits and vegetables
-    selected_fruits_df = df[df['Food Name'].isin(selected_fruits)]
-    selected_vegetables_df = df[df['Food Name'].isin(selected_vegetables)]
-
-    # Add selected preferences to combined_preferences
-    combined_preferences = pd.concat([selected_fruits_df, selected_vegetables_df])
-
     # Save selected seasonal preferences
-    food_list = combined_preferences["Food Name"].unique()
-    user_profiler.set_seasonal_preferences(food_list.tolist())
+    food_list = resolve_seasonal_preferences(df, selected_fruits, selected_vegetables)
+    user_profiler.set_seasonal_preferences(food_list)
     user_profiler.save_profile(filename)
 
     print("\n✅ Your seasonal preferences have been saved successfully!")
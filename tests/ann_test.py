@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+import pandas as pd
+from food_recommender_system.ann import ExactSearch, IVFSearch, normalize
+from food_recommender_system.catalog import FoodCatalog
+
+
+@pytest.fixture
+def large_data():
+    # 2000 foods around 20 nutrient profiles, in two categories
+    rng = np.random.default_rng(0)
+    profiles = rng.uniform(0, 100, size=(20, 6))
+    matrix = profiles[rng.integers(0, 20, size=2000)] * rng.lognormal(0, 0.2, size=(2000, 6))
+    df = pd.DataFrame(matrix, columns=["Calories", "Carbs", "Fats", "Fiber", "Protein", "Sugar"])
+    df.insert(0, "Food Name", [f"Food {i}" for i in range(2000)])
+    df.insert(1, "Category Name", ["Snacks"] * 1500 + ["Sweets"] * 500)
+    return df
+
+
+def test_normalize():
+    vectors = normalize(np.array([[3.0, 4.0], [0.0, 0.0], [np.nan, 1.0]]))
+    assert vectors.tolist() == [[0.6, 0.8], [0.0, 0.0], [0.0, 1.0]]
+
+
+def test_candidates_exact_fallback(large_data):
+    catalog = FoodCatalog.from_dataframe(large_data)
+    vector = catalog.matrix[0]
+
+    assert ExactSearch().candidates(vector, 0, 2000) is None
+    assert IVFSearch(catalog.matrix, n_lists=10, n_probe=10, exact_below=0).candidates(vector, 0, 2000) is None
+    assert IVFSearch(catalog.matrix, n_lists=10, n_probe=2, exact_below=2000).candidates(vector, 0, 2000) is None
+    # Every cluster must be probed to find that many candidates
+    assert IVFSearch(catalog.matrix, n_lists=10, n_probe=2, min_candidates=5000, exact_below=0).candidates(vector, 0, 2000) is None
+
+
+def test_candidates_in_range(large_data):
+    catalog = FoodCatalog.from_dataframe(large_data)
+    search = IVFSearch(catalog.matrix, n_lists=20, n_probe=2, min_candidates=10, exact_below=0)
+    candidates = search.candidates(catalog.matrix[0], 100, 1500)
+    assert 10 <= len(candidates) < 1400
+    assert candidates.min() >= 100 and candidates.max() < 1500
+    assert (np.diff(candidates) > 0).all()
+
+
+def test_similar_foods_recall(large_data):
+    catalog = FoodCatalog.from_dataframe(large_data)
+    queries = catalog.names[::50]
+    exact = [catalog.similar_foods(food_name)[0][:10] for food_name in queries]
+
+    catalog.use_search(IVFSearch(catalog.matrix, n_lists=40, n_probe=4, min_candidates=10, exact_below=0))
+    approximate = [catalog.similar_foods(food_name)[0][:10] for food_name in queries]
+    recall = np.mean([len(np.intersect1d(e, a)) / 10 for e, a in zip(exact, approximate)])
+    assert recall >= 0.9
+
+    catalog.use_search(ExactSearch())
+    assert all((catalog.similar_foods(food_name)[0][:10] == e).all() for food_name, e in zip(queries, exact))
+
+
+def test_similar_foods_batch_with_ivf(large_data):
+    catalog = FoodCatalog.from_dataframe(large_data)
+    catalog.use_search(IVFSearch(catalog.matrix, n_lists=40, n_probe=2, min_candidates=10, exact_below=0))
+    queries = [("Food 1", None, False), ("Food 1999", None, True), ("Food 3", "Sweets", False)]
+
+    for (food_name, category, low_density), (rows, _) in zip(queries, catalog.similar_foods_batch(queries)):
+        expected, _ = catalog.similar_foods(food_name, category=category, low_density=low_density)
+        assert rows.tolist() == expected.tolist()
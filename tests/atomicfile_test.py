@@ -0,0 +1,40 @@
+import os
+import stat
+import pytest
+
+from food_recommender_system.atomicfile import atomic_write, file_permissions
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "data.json"
+    with atomic_write(path) as file:
+        file.write("{}")
+    assert path.read_text() == "{}"
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as file:
+            file.write("{")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "{}"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_atomic_write_permissions(tmp_path):
+    # A new file gets the permissions of open(), not the 0o600 of the temporary file
+    umask = os.umask(0o022)
+    os.umask(umask)
+    path = tmp_path / "data.bin"
+    with atomic_write(path, "wb") as file:
+        file.write(b"\0")
+    assert mode(path) == file_permissions(tmp_path / "new.bin") == 0o666 & ~umask
+
+    # A file that is replaced keeps its permissions
+    for permissions in [0o644, 0o640, 0o664]:
+        os.chmod(path, permissions)
+        with atomic_write(path, "wb") as file:
+            file.write(b"\1")
+        assert mode(path) == permissions and path.read_bytes() == b"\1"
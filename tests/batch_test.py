@@ -0,0 +1,108 @@
+import pytest
+from pathlib import Path
+
+from food_recommender_system.batch import discover_profiles, generate_all, journal_path, read_journal
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.profiler import JsonProfileStore, SqliteProfileStore, UserProfiler, set_profile_store
+
+
+@pytest.fixture(scope="module")
+def df():
+    return DataLoader().load_csv(Path("nutritional-facts.csv"))
+
+
+@pytest.fixture(scope="module")
+def servings():
+    return DataLoader().load_json(Path("food-servings.json"))
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        return JsonProfileStore(tmp_path)
+    return SqliteProfileStore(tmp_path / "profiles.db")
+
+
+@pytest.fixture
+def profiles(store):
+    default = UserProfiler.load_profile(Path("default.json"))
+    data = {
+        "intolerances": default.get_intolerances(),
+        "food_preferences": default.get_food_preferences(),
+        "seasonal_preferences": default.get_seasonal_preferences(),
+        "meals": {},
+        "used_jolly": False
+    }
+    names = [f"user-{i}.json" for i in range(4)]
+    for name in names:
+        store.save(name, data)
+    return names
+
+
+def test_discover_profiles(store, profiles):
+    store.save("settings.json", {"theme": "dark"})
+    assert discover_profiles(store) == profiles
+
+
+def test_discover_profiles_default_store(store, profiles):
+    set_profile_store(store)
+    try:
+        assert discover_profiles() == profiles
+    finally:
+        set_profile_store(None)
+
+
+def test_discover_broken_profiles(tmp_path):
+    store = JsonProfileStore(tmp_path)
+    UserProfiler().save_profile("user.json", store)
+    (tmp_path / "broken.json").write_text("{")
+    (tmp_path / "notes.txt").write_text("")
+    assert discover_profiles(store) == ["broken.json", "user.json"]
+
+
+def test_generate_all(df, servings, store, profiles, tmp_path):
+    journal = journal_path("test", tmp_path)
+    results = generate_all(profiles, df, servings, workers=1, journal=journal, seed=0, store=store)
+
+    assert results["planned"] == 4 and results["skipped"] == 0 and results["failures"] == {}
+    assert results["profiles_per_second"] > 0
+    assert read_journal(journal) == set(profiles)
+    for name in profiles:
+        assert "food_ids" in store.load(name)["meals"]
+        meals = UserProfiler.load_profile(name, store).get_meals()
+        assert [len(meals[meal]) for meal in ["Breakfast", "Snack", "Lunch", "Dinner"]] == [7, 7, 7, 7]
+    # No temporary file is left behind
+    assert sorted(tmp_path.glob("*.tmp")) == []
+
+
+def test_generate_all_resume(df, servings, store, profiles, tmp_path):
+    journal = journal_path("test", tmp_path)
+    journal.write_text(f"{profiles[0]}\n{profiles[1]}\n")
+
+    results = generate_all(profiles, df, servings, workers=1, journal=journal, seed=0, store=store)
+    assert results["planned"] == 2 and results["skipped"] == 2
+    assert store.load(profiles[0])["meals"] == {}
+    assert store.load(profiles[2])["meals"] != {}
+
+
+def test_generate_all_failures(df, servings, tmp_path):
+    store = JsonProfileStore(tmp_path)
+    UserProfiler.load_profile(Path("default.json")).save_profile("user.json", store)
+    (tmp_path / "broken.json").write_text("{")
+    journal = journal_path("test", tmp_path)
+
+    results = generate_all(["user.json", "broken.json", "missing.json"], df, servings, workers=1, journal=journal, seed=0, store=store)
+    assert results["planned"] == 1
+    assert list(results["failures"]) == ["broken.json", "missing.json"]
+    assert read_journal(journal) == {"user.json"}
+
+
+def test_generate_all_pool_matches_serial(df, servings, store, profiles):
+    generate_all(profiles, df, servings, workers=1, seed=3, store=store)
+    serial = [store.load(name)["meals"] for name in profiles]
+    for name in profiles:
+        store.update(name, {"meals": {}})
+
+    results = generate_all(profiles, df, servings, workers=2, seed=3, store=store)
+    assert results["planned"] == 4 and results["failures"] == {}
+    assert [store.load(name)["meals"] for name in profiles] == serial
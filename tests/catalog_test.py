@@ -0,0 +1,188 @@
+import pytest
+import numpy as np
+import pandas as pd
+from food_recommender_system.catalog import FoodCatalog
+
+
+@pytest.fixture
+def sample_data():
+    data = {
+        "Food Name": ["Apple", "Carrot", "Banana", "Broccoli", "Pear"],
+        "Category Name": ["Fruits", "Vegetables", "Fruits", "Vegetables", "Fruits"],
+        "Calories": [52, 41, 89, 55, 0],
+        "Carbs": [14, 10, 23, 11, 0],
+        "Protein": [0.3, 0.9, 1.1, 3.7, 0]
+    }
+    return pd.DataFrame(data)
+
+
+def test_from_dataframe_groups_categories(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    assert catalog.names.tolist() == ["Apple", "Banana", "Pear", "Carrot", "Broccoli"]
+    assert catalog.category_rows("Fruits") == (0, 3)
+    assert catalog.category_rows("Vegetables") == (3, 5)
+    assert catalog.category_rows("Unknown") == (0, 0)
+    assert catalog.matrix.flags["C_CONTIGUOUS"]
+    assert catalog.matrix.shape == (5, 3)
+
+
+def test_row_of(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    assert catalog.names[catalog.row_of("Carrot")] == "Carrot"
+    assert catalog.row_of("Pizza") is None
+
+
+def test_cosine_similarity_matches_numpy(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    apple = sample_data.iloc[0, 2:].to_numpy(dtype=float)
+    banana = sample_data.iloc[2, 2:].to_numpy(dtype=float)
+    expected = np.dot(apple, banana) / (np.linalg.norm(apple) * np.linalg.norm(banana))
+
+    similarities = catalog.cosine_similarity(catalog.row_of("Apple"), *catalog.category_rows("Fruits"))
+    assert similarities[1] == pytest.approx(expected)
+    assert similarities[2] == 0  # zero vector
+
+
+def test_similar_foods_same_category(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    rows, similarities = catalog.similar_foods("Apple")
+    assert catalog.names[rows].tolist() == ["Banana", "Pear"]
+    assert similarities[0] > similarities[1]
+
+
+def test_similar_foods_whole_catalog(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    rows, _ = catalog.similar_foods("Apple", same_category=False)
+    assert "Apple" not in catalog.names[rows]
+    assert len(rows) == 4
+
+
+def test_similar_foods_low_density(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    rows, _ = catalog.similar_foods("Apple", low_density=True)
+    assert catalog.names[rows].tolist() == ["Pear", "Banana"]
+    assert catalog.energy_density[rows].tolist() == [0, 0.89]
+
+
+def test_energy_density_class():
+    df = pd.DataFrame({
+        "Food Name": ["Apple", "Pasta", "Dates", "Butter"],
+        "Category Name": ["Fruits", "Grains", "Fruits", "Dairy"],
+        "Calories": [52, 150, 250, 717]
+    })
+    catalog = FoodCatalog.from_dataframe(df)
+    classes = dict(zip(catalog.names, catalog.energy_density_class))
+    assert classes == {"Apple": "Low", "Pasta": "Medium", "Dates": "Medium", "Butter": "High"}
+
+
+def test_similar_foods_other_category(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    rows, _ = catalog.similar_foods("Apple", category="Vegetables")
+    assert sorted(catalog.names[rows].tolist()) == ["Broccoli", "Carrot"]
+
+
+def test_similar_foods_unknown(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    assert catalog.similar_foods("Pizza") is None
+
+
+def test_for_dataframe_is_cached(sample_data):
+    catalog = FoodCatalog.for_dataframe(sample_data)
+    assert FoodCatalog.for_dataframe(sample_data) is catalog
+    assert FoodCatalog.for_dataframe(sample_data.copy()) is not catalog
+
+
+def test_version(sample_data):
+    version = FoodCatalog.from_dataframe(sample_data).version
+    assert FoodCatalog.from_dataframe(sample_data.copy()).version == version
+
+    changed = sample_data.copy()
+    changed.loc[0, "Carbs"] = 15
+    assert FoodCatalog.from_dataframe(changed).version != version
+    renamed = sample_data.rename(columns={"Carbs": "Sugar"})
+    assert FoodCatalog.from_dataframe(renamed).version != version
+
+
+def test_cosine_similarities_matches_single_rows(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    rows = np.array([0, 3, 2])
+    similarities = catalog.cosine_similarities(rows, 0, 3)
+    assert similarities.shape == (3, 3)
+    for row, row_similarities in zip(rows, similarities):
+        assert row_similarities == pytest.approx(catalog.cosine_similarity(row, 0, 3))
+
+
+def test_similar_foods_batch(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    queries = [("Apple", None, True), ("Pizza", None, False), ("Carrot", "Fruits", False), ("Banana", None, False)]
+    results = catalog.similar_foods_batch(queries)
+
+    assert results[1] is None
+    for (food_name, category, low_density), result in zip(queries, results):
+        if result is not None:
+            expected = catalog.similar_foods(food_name, category=category, low_density=low_density)
+            assert result[0].tolist() == expected[0].tolist()
+            assert result[1] == pytest.approx(expected[1])
+
+
+def test_save_and_load(sample_data, tmp_path):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    catalog.save(tmp_path / "catalog.bin", "hash")
+    loaded = FoodCatalog.load(tmp_path / "catalog.bin")
+
+    assert FoodCatalog.source_hash_of(tmp_path / "catalog.bin") == "hash"
+    assert loaded.names.tolist() == catalog.names.tolist()
+    assert loaded.columns == catalog.columns
+    assert np.array_equal(loaded.matrix, catalog.matrix)
+    assert loaded.category_ranges == catalog.category_ranges
+    assert loaded.energy_density_class.tolist() == catalog.energy_density_class.tolist()
+    for food_name in ["Apple", "Broccoli", "Pizza"]:
+        assert loaded.row_of(food_name) == catalog.row_of(food_name)
+    for low_density in [True, False]:
+        assert loaded.similar_foods("Apple", low_density=low_density)[0].tolist() == catalog.similar_foods("Apple", low_density=low_density)[0].tolist()
+
+
+def test_loaded_arrays_are_read_only_views(sample_data, tmp_path):
+    FoodCatalog.from_dataframe(sample_data).save(tmp_path / "catalog.bin")
+    loaded = FoodCatalog.load(tmp_path / "catalog.bin")
+
+    for array in [loaded.matrix, loaded.norms, loaded.names, loaded.categories, loaded.index.sorted_names]:
+        assert not array.flags.writeable
+        assert not array.flags.owndata
+    with pytest.raises(ValueError):
+        loaded.matrix[0, 0] = 1
+
+    df = loaded.to_dataframe()
+    assert np.shares_memory(df["Calories"].to_numpy(), loaded.matrix)
+    assert FoodCatalog.for_dataframe(df) is loaded
+    assert df["Food Name"].tolist() == loaded.names.tolist()
+
+
+def test_sorted_name_index_duplicates(tmp_path):
+    df = pd.DataFrame({
+        "Food Name": ["Pear", "Apple", "Pear"],
+        "Category Name": ["Fruits", "Fruits", "Fruits"],
+        "Calories": [57, 52, 60]
+    })
+    FoodCatalog.from_dataframe(df).save(tmp_path / "catalog.bin")
+    loaded = FoodCatalog.load(tmp_path / "catalog.bin")
+    assert loaded.row_of("Pear") == 0
+    assert "Apple" in loaded.index
+    assert "Banana" not in loaded.index
+
+
+def test_load_or_build(sample_data, tmp_path):
+    path = tmp_path / "catalog.bin"
+    calls = []
+
+    def load_dataframe():
+        calls.append(1)
+        return sample_data
+
+    FoodCatalog.load_or_build(path, "hash", load_dataframe)
+    FoodCatalog.load_or_build(path, "hash", load_dataframe)
+    assert len(calls) == 1
+    FoodCatalog.load_or_build(path, "other", load_dataframe)
+    assert len(calls) == 2
+    assert FoodCatalog.source_hash_of(path) == "other"
+    assert FoodCatalog.source_hash_of(tmp_path / "missing.bin") is None
@@ -0,0 +1,52 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from food_recommender_system.datacache import cache_path, read_cache, write_cache
+from food_recommender_system.dataloader import DataLoader
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "nutritional-facts.csv"
+    pd.DataFrame({
+        "Food Name": ["Apple", "Banana", "Carrot", None],
+        "Category Name": ["Fruits", "Fruits", "Vegetables", "Vegetables"],
+        "Calories": [52, 89, 41, 55],
+        "Protein": [0.3, 1.1, np.nan, 3.7]
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_cache_matches_csv(source):
+    path = write_cache(source)
+    assert path == cache_path(source) == source.with_suffix(".npz")
+    pd.testing.assert_frame_equal(read_cache(source), pd.read_csv(source))
+
+
+def test_cache_stores_ids(source):
+    write_cache(source)
+    with np.load(cache_path(source)) as data:
+        assert data["text_1_ids"].dtype == np.int16
+        assert data["text_1_values"].tolist() == ["Fruits", "Vegetables"]
+
+
+def test_missing_or_stale_cache(source):
+    assert read_cache(source) is None
+
+    write_cache(source)
+    stat = os.stat(source)
+    os.utime(cache_path(source), (stat.st_atime, stat.st_mtime - 10))
+    assert read_cache(source) is None
+
+
+def test_load_csv_prefers_cache(source):
+    dataloader = DataLoader(source.parent)
+    write_cache(source, df=pd.read_csv(source).head(2))
+    assert dataloader.load_csv(source.name)["Food Name"].tolist() == ["Apple", "Banana"]
+
+    # Rewriting the CSV makes the cache stale
+    pd.read_csv(source).to_csv(source, index=False)
+    stat = os.stat(cache_path(source))
+    os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+    assert len(dataloader.load_csv(source.name)) == 4
@@ -1,7 +1,10 @@
 import pytest
+import numpy as np
 import pandas as pd
 import json
+from pathlib import Path
 from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.recommender import get_similar_food
 
 # Sample data for testing
 sample_data = {
@@ -63,3 +66,81 @@ def test_compute_energy_density(sample_df):
 def test_get_food_category(sample_df):
     category = DataLoader.get_food_category(sample_df, "Apple")
     assert category == "Fruit"
+
+
+def test_get_nutritional_info_not_found(sample_df):
+    assert DataLoader.get_nutritional_info(sample_df, "Pizza") is None
+
+
+def test_get_nutritional_info_keeps_row(sample_df):
+    nutritional_info = DataLoader.get_nutritional_info(sample_df, "Carrot", only_numbers=False)
+    assert nutritional_info.index.tolist() == [2]
+    assert nutritional_info["Category Name"].values[0] == "Vegetable"
+
+
+def test_get_nutrient_vector(sample_df):
+    vector = DataLoader.get_nutrient_vector(sample_df, "Banana")
+    assert vector.tolist() == [89, 1.1]
+    assert not vector.flags.writeable
+    assert np.shares_memory(vector, DataLoader.get_catalog(sample_df).matrix)
+    assert DataLoader.get_nutrient_vector(sample_df, "Pizza") is None
+
+
+def test_compute_energy_density_not_found(sample_df):
+    assert DataLoader.compute_energy_density(sample_df, "Pizza") == "No information found for Pizza"
+
+
+def test_get_food_category_not_found(sample_df):
+    assert len(DataLoader.get_food_category(sample_df, "Pizza")) == 0
+
+
+def test_compact_dataframe():
+    df = pd.DataFrame({
+        "Food Name": ["Apple", "Banana", "Carrot", "Broccoli"],
+        "Category Name": ["Fruit", "Fruit", "Vegetable", "Vegetable"],
+        "Calories": [52.0, 89.0, 41.0, 34.0],
+        "Protein": [0.3, 1.1, 0.9, 2.8],
+        "Trans Fat": [0.0, 0.0, 0.0, 0.0]
+    })
+    compact_df, report = DataLoader.compact_dataframe(df)
+
+    assert report["dropped_columns"] == ["Trans Fat"]
+    assert report["saved"] == report["before"] - report["after"] > 0
+    assert compact_df["Calories"].dtype == np.float32
+    assert isinstance(compact_df["Category Name"].dtype, pd.CategoricalDtype)
+    assert DataLoader.get_catalog(compact_df).matrix.dtype == np.float32
+
+    for food_name in df["Food Name"]:
+        expected = get_similar_food(df, food_name, same_category=False)
+        similar_foods = get_similar_food(compact_df, food_name, same_category=False)
+        assert [food for food, _, _ in similar_foods] == [food for food, _, _ in expected]
+        assert [similarity for _, similarity, _ in similar_foods] == pytest.approx([similarity for _, similarity, _ in expected], abs=1e-6)
+        assert [density for _, _, density in similar_foods] == [density for _, _, density in expected]
+
+
+def test_load_csv_compact(tmp_path):
+    pd.DataFrame(sample_data).to_csv(tmp_path / "sample.csv", index=False)
+    dataloader = DataLoader(tmp_path, compact=True)
+    df = dataloader.load_csv("sample.csv")
+    assert df["Protein"].dtype == np.float32
+    assert dataloader.memory_report["after"] < dataloader.memory_report["before"]
+
+
+def test_load_csv_compact_dataset():
+    df = DataLoader().load_csv(Path("nutritional-facts.csv")).fillna(0)
+    dataloader = DataLoader(compact=True)
+    compact_df = dataloader.load_csv(Path("nutritional-facts.csv"))
+
+    # The missing values are filled before compaction, so the column with no value is dropped
+    report = dataloader.memory_report
+    assert report["dropped_columns"] == ["Omega-6 - Arachidonic acid"]
+    assert list(compact_df.columns) == [column for column in df.columns if column != "Omega-6 - Arachidonic acid"]
+    assert not compact_df.isna().any().any()
+    assert report["before"] == df.memory_usage(deep=True).sum()
+    assert report["after"] == compact_df.memory_usage(deep=True).sum() < report["before"] / 1.9
+
+    for food_name in ["Apple", "Tuna", "Pasta"]:
+        expected = get_similar_food(df, food_name, same_category=True, top_k=5)
+        similar_foods = get_similar_food(compact_df, food_name, same_category=True, top_k=5)
+        assert len(similar_foods) == len(expected) > 0 and [food for food, _, _ in similar_foods] == [food for food, _, _ in expected]
+        assert [similarity for _, similarity, _ in similar_foods] == pytest.approx([similarity for _, similarity, _ in expected], abs=1e-6)
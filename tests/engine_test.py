@@ -0,0 +1,150 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+import food_recommender_system.engine as engine
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.profiler import UserProfiler
+
+
+@pytest.fixture(scope="module")
+def df():
+    return DataLoader().load_csv(Path("nutritional-facts.csv"))
+
+
+@pytest.fixture(scope="module")
+def servings():
+    return DataLoader().load_json(Path("food-servings.json"))
+
+
+@pytest.fixture(scope="module")
+def profile():
+    return UserProfiler.load_profile(Path("default.json"))
+
+
+@pytest.fixture
+def meals():
+    return {
+        "Breakfast": [[["Apple", "Milk"], ["Pear", "Kefir"]] for _ in range(7)],
+        "Lunch": [[["Pasta", "Cod"], ["Rice", "Tuna"]] for _ in range(7)]
+    }
+
+
+def test_plan_week(df, servings, profile, capsys):
+    calls = []
+    args = (df, servings, profile.get_food_preferences(), profile.get_seasonal_preferences(), profile.get_intolerances())
+    plan = engine.plan_week(*args, seed=0, progress=lambda done, total: calls.append((done, total)))
+
+    assert [len(plan[meal]) for meal in ["Breakfast", "Snack", "Lunch", "Dinner"]] == [7, 7, 7, 7]
+    assert engine.plan_week(*args, seed=0) == plan
+    assert capsys.readouterr().out == ""
+
+    done, total = zip(*calls)
+    assert list(done) == sorted(done) and done[-1] == total[0]
+    assert set(total) == {total[0]}
+
+
+def test_find_alternatives(df):
+    alternatives = engine.find_alternatives(df, "Apple", top_k=3)
+    assert len(alternatives) == 3
+    assert engine.find_alternatives(df, "Pizza with pineapple") == []
+
+
+def test_justify(df):
+    assert "Comparing Apple vs Pear" in engine.justify(df, ["Apple"], ["Pear"])[0]
+    with pytest.raises(ValueError):
+        engine.justify(df, ["Apple"], ["Pear", "Kiwifruit"])
+
+
+def test_current_meal(meals):
+    tuesday_lunch = datetime(2025, 1, 7, 12)
+    assert engine.current_meal(meals, now=tuesday_lunch) == ("Lunch", 1, ["Pasta", "Cod"], ["Rice", "Tuna"], None)
+    assert engine.current_meal(meals, "Breakfast", tuesday_lunch)[0] == "Breakfast"
+
+
+def test_choose_meal(meals):
+    chosen = engine.choose_meal(meals, "Lunch", 1, [2, 1])
+    assert chosen["Lunch"][1] == [["Pasta", "Cod"], ["Rice", "Tuna"], ["Rice", "Cod"]]
+    assert engine.current_meal(chosen, now=datetime(2025, 1, 7, 12))[4] == ["Rice", "Cod"]
+    # The input is left untouched
+    assert len(meals["Lunch"][1]) == 2
+
+
+def test_mood_swap(df, meals):
+    meals = engine.choose_meal(meals, "Lunch", 1, [1, 1])
+    swapped, fast_food = engine.mood_swap(meals, df, "Lunch", 1, used_jolly=False, stressed=True, rng=0)
+
+    assert fast_food in df[df["Category Name"] == "Fast Foods"]["Food Name"].to_list()
+    assert swapped["Lunch"][1][2] == [fast_food]
+    assert meals["Lunch"][1][2] == ["Pasta", "Cod"]
+    assert engine.mood_swap(meals, df, "Lunch", 1, used_jolly=False, stressed=True, rng=0)[1] == fast_food
+
+    assert engine.mood_swap(meals, df, "Lunch", 1, used_jolly=True, stressed=True) == (meals, None)
+    assert engine.mood_swap(meals, df, "Breakfast", 1, used_jolly=False, stressed=True) == (meals, None)
+    assert engine.mood_swap(meals, df, "Lunch", 1, used_jolly=False, stressed=False) == (meals, None)
+
+
+def test_preferences(df):
+    options = engine.preference_options(df, ["Dairy"])
+    assert "Dairy" not in options and "Cod" in options["Seafood"]
+
+    preferences = engine.resolve_preferences(df, [], {"Seafood": ["Cod"]})
+    assert "Cod" in preferences and "Tuna" not in preferences
+    assert "Pasta" in preferences
+
+    assert engine.resolve_seasonal_preferences(df, ["Apple", "Apple"], ["Carrot"]) == ["Apple", "Carrot"]
+
+
+def test_weekly_meals_table(meals):
+    table = engine.weekly_meals_table(meals)
+    assert isinstance(table, pd.DataFrame)
+    assert table.loc[("Lunch", "Main"), "Monday"] == "Pasta, Cod"
+    assert table.loc[("Breakfast", "Alternative"), "Sunday"] == "Pear, Kefir"
+
+
+def test_regenerate_slot(df, servings, profile):
+    args = (df, servings, profile.get_food_preferences(), profile.get_seasonal_preferences())
+    plan = engine.plan_week(*args, profile.get_intolerances(), seed=0)
+
+    delta = engine.regenerate_slot(plan, *args, "Lunch", 3, intolerances=profile.get_intolerances(), seed=1)
+    assert (delta["meal"], delta["day"], delta["item"]) == ("Lunch", 3, None)
+    assert len(delta["main"]) == len(delta["alternative"]) == 6
+    assert engine.regenerate_slot(plan, *args, "Lunch", 3, intolerances=profile.get_intolerances(), seed=1) == delta
+
+    updated = engine.apply_slot(plan, delta)
+    assert updated["Lunch"][3] == [delta["main"], delta["alternative"]]
+    assert updated["Lunch"][:3] == plan["Lunch"][:3] and updated["Dinner"] == plan["Dinner"]
+    assert plan["Lunch"][3] != updated["Lunch"][3]
+
+    delta = engine.regenerate_slot(plan, *args, "Breakfast", 0, item=3, intolerances=profile.get_intolerances(), seed=1)
+    main_meal = plan["Breakfast"][0][0]
+    assert delta["main"][:3] == main_meal[:3] and delta["main"][3] != main_meal[3]
+
+    with pytest.raises(ValueError):
+        engine.regenerate_slot(plan, *args, "Lunch", 7)
+    with pytest.raises(ValueError):
+        engine.regenerate_slot(plan, *args, "Snack", 0, item=3)
+
+
+def test_plan_weeks(df, servings, profile):
+    args = (df, servings, profile.get_food_preferences(), profile.get_seasonal_preferences())
+    plans = engine.plan_weeks(*args, weeks=4, window=3, intolerances=profile.get_intolerances(), seed=0)
+    assert len(plans) == 4
+
+    categories = [
+        df[df["Food Name"] == meals[day][0][1]]["Category Name"].iloc[0]
+        for plan in plans for day in range(7) for meals in (plan["Lunch"], plan["Dinner"])
+    ]
+    assert all(len(set(categories[i:i + 3])) == 3 for i in range(len(categories) - 2))
+
+
+def test_optimize_week(df, servings, profile):
+    args = (df, servings, profile.get_food_preferences(), profile.get_seasonal_preferences())
+    plan = engine.plan_week(*args, profile.get_intolerances(), seed=0)
+
+    optimized, report = engine.optimize_week(plan, *args, {"Calories": 2000}, intolerances=profile.get_intolerances(), seed=0)
+    assert report["objective"] <= report["initial_objective"]
+    calories = engine.plan_nutrition(optimized, df, servings, ["Calories"]).per_day[:, 0, 0]
+    assert np.allclose(np.abs(calories - 2000).max() / 2000, report["gaps"]["Calories"])
@@ -0,0 +1,83 @@
+import json
+import pytest
+import numpy as np
+from pathlib import Path
+
+from food_recommender_system.foodids import CompactPlan, FoodTable, is_plan, pack_meals, unpack_meals
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.profiler import UserProfiler
+
+
+@pytest.fixture(scope="module")
+def meals():
+    return UserProfiler.load_profile(Path("default.json")).get_meals()
+
+
+@pytest.fixture(scope="module")
+def table():
+    return FoodTable.of(DataLoader().load_csv(Path("nutritional-facts.csv"))["Food Name"])
+
+
+def test_food_table():
+    table = FoodTable(["Apple", "Pear", "Apple"])
+    assert table.ids == {"Apple": 0, "Pear": 1}
+    assert FoodTable(["Apple", "Pear", "Apple"]).version == table.version
+    assert FoodTable(["Pear", "Apple", "Apple"]).version != table.version
+    assert FoodTable.of(["Apple", "Pear", "Apple"]) is FoodTable.of(["Apple", "Pear", "Apple"])
+
+
+def test_compact_plan(meals, table):
+    plan = CompactPlan.from_meals(meals, table)
+    assert plan.ids.dtype == np.int16 and plan.extra == []
+    assert plan.to_meals() == meals
+    assert CompactPlan.from_dict(json.loads(json.dumps(plan.to_dict()))).to_meals() == meals
+
+    # Chosen meals, tuples and foods missing from the table are kept
+    lunches = [list(entry) for entry in meals["Lunch"]]
+    lunches[0] = (lunches[0][0], lunches[0][1], ["Pizza with pineapple"])
+    lunches[1] = lunches[1] + [["Pizza with pineapple", "Apple"]]
+    plan = CompactPlan.from_meals(dict(meals, Lunch=lunches, Brunch=[]), table)
+    assert plan.extra == ["Pizza with pineapple"]
+    decoded = plan.to_meals()
+    assert decoded["Lunch"][0] == [lunches[0][0], lunches[0][1], ["Pizza with pineapple"]]
+    assert decoded["Lunch"][1][2] == ["Pizza with pineapple", "Apple"]
+    assert decoded["Brunch"] == [] and list(decoded) == list(meals) + ["Brunch"]
+    # The stored form holds the foods of the plan only, the missing ones included
+    stored = json.loads(json.dumps(plan.to_dict()))
+    assert "Pizza with pineapple" in stored["foods"] and len(stored["foods"]) < len(table)
+    assert CompactPlan.from_dict(stored).to_meals() == decoded
+
+    with pytest.raises(ValueError):
+        CompactPlan.from_meals({"Breakfast": "Pancakes"}, table)
+    with pytest.raises(ValueError):
+        CompactPlan.from_meals({"Snack": [[["Apple"] * 256]]}, table)
+
+
+def test_compact_plan_large_table():
+    table = FoodTable(f"Food {i}" for i in range(40000))
+    plan = CompactPlan.from_meals({"Lunch": [[["Food 39999", "Food 0"]]]}, table)
+    assert plan.ids.dtype == np.int32
+    assert plan.to_meals() == {"Lunch": [[["Food 39999", "Food 0"]]]}
+    stored = plan.to_dict()
+    assert stored["foods"] == ["Food 0", "Food 39999"] and np.dtype(stored["dtype"]) == np.int16
+    assert CompactPlan.from_dict(stored).to_meals() == {"Lunch": [[["Food 39999", "Food 0"]]]}
+
+
+def test_is_plan(meals):
+    assert is_plan(meals) and is_plan({}) and is_plan({"Lunch": []})
+    assert not is_plan({"breakfast": "Pancakes"})
+    assert not is_plan({"Lunch": [[["Pasta", 1]]]})
+    assert not is_plan([])
+
+
+def test_pack_meals(meals):
+    packed = pack_meals(meals)
+    assert CompactPlan.is_compact(packed) and packed["foods"][0] == meals["Breakfast"][0][0][0]
+    assert len(packed["foods"]) == len({food for entries in meals.values() for entry in entries for foods in entry for food in foods})
+    assert unpack_meals(json.loads(json.dumps(packed))).to_meals() == meals
+    assert pack_meals(unpack_meals(packed)) == packed
+    assert pack_meals(packed) is packed
+
+    assert pack_meals({}) == {} and unpack_meals({}) == {}
+    assert pack_meals({"breakfast": "Pancakes"}) == {"breakfast": "Pancakes"}
+    assert unpack_meals({"breakfast": "Pancakes"}) == {"breakfast": "Pancakes"}
@@ -1,13 +1,24 @@
 import pytest
+import random
 import pandas as pd
 from food_recommender_system.profiler import UserProfiler
+from food_recommender_system.recommender import AlternativesCache
 
+import numpy as np
 from food_recommender_system.mealgen import (
+    FoodPools,
+    allocate_meals,
+    build_meal_plans,
+    category_budget,
+    choose,
+    choose_category,
+    sample,
     generate_meal,
     generate_breakfast,
     generate_snack,
     compute_meal_calories,
-    generate_weekly_meal_plan
+    generate_weekly_meal_plan,
+    regenerate_meal
 )
 
 
@@ -142,6 +153,23 @@ def test_generate_meal(sample_data):
     assert len(similar_meal) == 6
 
 
+def test_generate_meal_keeps_oils(sample_data):
+    searched = []
+
+    def find_similar_foods(filtered_df, food_name, **kwargs):
+        searched.append(food_name)
+        return [(f"{food_name} alternative", 1.0)]
+
+    meal, similar_meal = generate_meal(
+        sample_data, sample_data, "Vegetables", alternatives=find_similar_foods, rng=0
+    )
+    oil = meal[2]
+    assert oil in sample_data[sample_data["Category Name"] == "Oils"]["Food Name"].to_list()
+    # Oils have no alternative, so they are not searched
+    assert similar_meal[2] == oil and oil not in searched
+    assert len(searched) == 5
+
+
 def test_generate_breakfast(sample_data):
     preferences_df = sample_data
     filtered_df = sample_data
@@ -158,6 +186,150 @@ def test_generate_snack(sample_data):
     assert len(similar_snack) == 3
 
 
+def test_food_pools(sample_data):
+    preferences_df = sample_data.sample(frac=1, random_state=0)
+    pools = FoodPools(preferences_df)
+
+    grains = preferences_df[preferences_df["Category Name"] == "Grains"]["Food Name"].to_list()
+    fruits = preferences_df[preferences_df["Category Name"] == "Fruits"]["Food Name"].to_list()
+    assert pools.pool("Grains").tolist() == grains
+    assert pools.pool("Grains", "Fruits").tolist() == grains + fruits
+    assert pools.pool("Grains", "Fruits", merged=True).tolist() == (
+        preferences_df[preferences_df["Category Name"].isin(["Grains", "Fruits"])]["Food Name"].to_list()
+    )
+    assert pools.pool("Gluten-Free Grains").tolist() == []
+    assert pools.pool("Grains") is pools.pool("Grains")
+    assert pools.category_of("Apple") == "Fruits"
+    assert pools.category_of("Pizza") is None
+
+
+def test_meal_pools(sample_data):
+    pools = FoodPools(sample_data)
+    lunch = pools.meal_pools("Lunch", "Eggs")
+    assert len(lunch) == 6
+    assert lunch[1] is pools.pool("Eggs")
+    assert lunch[0] is pools.pool("Grains", "Gluten-Free Grains", merged=True)
+    assert [len(pool) for pool in pools.meal_pools("Snack")] == [5, 10, 5]
+
+
+def test_allocate_meals():
+    categories = ["Eggs"] * 7 + ["Seafood"] * 7 + ["Legumes"] * 3
+    selected = allocate_meals(categories, 14, np.random.default_rng(0))
+    assert len(selected) == len(set(selected)) == 14
+    assert allocate_meals(categories, 14, np.random.default_rng(0)) == selected
+    with pytest.raises(ValueError):
+        allocate_meals(categories, 18)
+
+    # No main category twice in 3 consecutive meals, the meals of the week before included
+    categories = ["Eggs"] * 7 + ["Seafood"] * 7 + ["Legumes"] * 7
+    selected = allocate_meals(categories, 14, np.random.default_rng(0), window=3, history=["Legumes", "Eggs"])
+    drawn = ["Legumes", "Eggs"] + [categories[index] for index in selected]
+    assert all(len(set(drawn[i:i + 3])) == 3 for i in range(len(drawn) - 2))
+
+    # An impossible window takes the next meal of the permutation
+    assert sorted(allocate_meals(["Eggs"] * 14, 14, np.random.default_rng(0), window=2)) == list(range(14))
+
+
+def test_category_budget(sample_data, sample_servings):
+    pools = FoodPools(sample_data)
+    meals = {
+        "Lunch": [[["Rice", "Salmon"], ["Rice", "Tuna"]], [["Rice", "Salami"], ["Rice", "Bacon"]]],
+        "Dinner": [[["Rice", "Bacon"], ["Rice", "Salami"]]]
+    }
+    budget = category_budget(meals, sample_servings, pools.category_of)
+    assert budget["Cured Meat"] == 1 and budget["Seafood"] == sample_servings["Seafood"]["frequency_per_week"] - 1
+    assert category_budget(meals, sample_servings, pools.category_of, exclude=("Dinner", 0))["Cured Meat"] == 2
+
+    # Only the categories left are drawn
+    budget = {category: 0 for category in budget}
+    budget["Legumes"] = 1
+    assert choose_category(budget, pools, np.random.default_rng(0)) == "Legumes"
+    with pytest.raises(ValueError):
+        choose_category(dict(budget, Legumes=0), pools)
+
+
+def test_regenerate_meal(sample_data, sample_servings, mock_user_profiler):
+    args = (sample_data, sample_servings, mock_user_profiler.get_food_preferences(), mock_user_profiler.get_seasonal_preferences())
+    meals = {
+        "Breakfast": [[["Milk", "Bread", "Chocolate", "Apple"], ["Milk", "Bread", "Candy", "Apple"]]],
+        "Lunch": [[["Rice", "Salami", "Olive Oil", "Ketchup", "Carrot", "Apple"]] * 2] * 3,
+        "Dinner": [[["Rice", "Bacon", "Olive Oil", "Ketchup", "Carrot", "Apple"]] * 2]
+    }
+
+    # Cured meat is out of budget, even without the meal regenerated
+    for seed in range(5):
+        delta = regenerate_meal(meals, *args, "Lunch", 0, seed=seed)
+        assert delta["main"][1] not in ["Salami", "Pepperoni", "Prosciutto", "Bacon", "Sausage"]
+        assert regenerate_meal(meals, *args, "Lunch", 0, seed=seed) == delta
+
+    delta = regenerate_meal(meals, *args, "Lunch", 1, item=1, seed=0)
+    assert delta["main"][1] in ["Pepperoni", "Prosciutto", "Bacon", "Sausage"]
+    assert delta["main"][0] == "Rice" and delta["main"][2:] == meals["Lunch"][1][0][2:]
+    assert meals["Lunch"][1][0][1] == "Salami"
+
+    delta = regenerate_meal(meals, *args, "Breakfast", 0, seed=0)
+    assert (delta["meal"], delta["day"], delta["item"]) == ("Breakfast", 0, None)
+    assert len(delta["main"]) == len(delta["alternative"]) == 4
+
+
+def test_build_meal_plans(sample_data, sample_servings, mock_user_profiler, mocker):
+    args = (sample_data, sample_servings, mock_user_profiler.get_food_preferences(), mock_user_profiler.get_seasonal_preferences())
+    calls = []
+    plans = build_meal_plans(*args, seed=0, weeks=3, window=2, progress=lambda done, total: calls.append((done, total)))
+
+    assert len(plans) == 3
+    assert all(len(plan[meal]) == 7 for plan in plans for meal in ["Breakfast", "Snack", "Lunch", "Dinner"])
+    assert calls[-1][0] == calls[-1][1]
+    assert build_meal_plans(*args, seed=0, weeks=3, window=2) == plans
+
+    # Identical candidate meals are all kept
+    meal = (["Rice", "Salmon"], ["Oats", "Tuna"])
+    mocker.patch("food_recommender_system.mealgen.generate_meal", return_value=meal)
+    plan = build_meal_plans(*args, seed=0)[0]
+    assert plan["Lunch"] == plan["Dinner"] == [meal] * 7
+
+
+def test_generators_with_shared_pools(sample_data):
+    pools = FoodPools(sample_data)
+    for generate, args in [(generate_meal, ("Eggs",)), (generate_breakfast, ()), (generate_snack, ())]:
+        random.seed(0)
+        expected = generate(sample_data, sample_data, *args)
+        random.seed(0)
+        assert generate(sample_data, sample_data, *args, None, pools) == expected
+
+
+def test_generators_with_alternatives_cache(sample_data):
+    alternatives = AlternativesCache()
+    for generate, args in [(generate_meal, ("Eggs",)), (generate_breakfast, ()), (generate_snack, ())]:
+        random.seed(0)
+        expected = generate(sample_data, sample_data, *args)
+        random.seed(0)
+        assert generate(sample_data, sample_data, *args, None, None, alternatives) == expected
+    assert alternatives.misses > 0
+
+
+def test_choose_and_sample():
+    pool = ["Apple", "Pear", "Banana", "Kiwi"]
+    assert choose(pool, np.random.default_rng(1)) == choose(pool, np.random.default_rng(1))
+    assert choose(pool) in pool
+    with pytest.raises(IndexError):
+        choose([], np.random.default_rng(1))
+
+    items = sample(pool, 3, np.random.default_rng(1))
+    assert items == sample(pool, 3, np.random.default_rng(1))
+    assert len(set(items)) == 3 and set(items) <= set(pool)
+    with pytest.raises(ValueError):
+        sample(pool, 5, np.random.default_rng(1))
+
+
+def test_generators_with_seed(sample_data):
+    for generate, args in [(generate_meal, ("Eggs",)), (generate_breakfast, ()), (generate_snack, ())]:
+        expected = generate(sample_data, sample_data, *args, rng=3)
+        random.seed(0)
+        assert generate(sample_data, sample_data, *args, rng=3) == expected
+        assert generate(sample_data, sample_data, *args, rng=np.random.default_rng(3)) == expected
+
+
 def test_compute_meal_calories(sample_data, sample_servings):
     meal = ["Rice", "Carrot", "Apple"]
     df = sample_data
@@ -175,3 +347,27 @@ def test_generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profi
     assert len(meal_plan["Snack"]) == 7
     assert len(meal_plan["Lunch"]) == 7
     assert len(meal_plan["Dinner"]) == 7
+
+
+def test_generate_weekly_meal_plan_shared_alternatives(sample_data, sample_servings, mock_user_profiler, tmp_path, mocker):
+    mocker.patch("time.sleep")
+    alternatives = AlternativesCache()
+    random.seed(0)
+    expected = generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json")
+    random.seed(0)
+    assert generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json", alternatives=alternatives) == expected
+
+    # The second plan only draws foods whose alternatives are already cached
+    misses = alternatives.misses
+    random.seed(0)
+    generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json", alternatives=alternatives)
+    assert alternatives.misses == misses
+    assert alternatives.hits > 0
+
+
+def test_generate_weekly_meal_plan_seeded(sample_data, sample_servings, mock_user_profiler, tmp_path, mocker):
+    mocker.patch("time.sleep")
+    plan = generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json", seed=5)
+    random.seed(1)
+    assert generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json", seed=5) == plan
+    assert generate_weekly_meal_plan(sample_data, sample_servings, mock_user_profiler, tmp_path / "plan.json", seed=6) != plan
@@ -14,6 +14,7 @@ def user_profiler():
         "Dinner": [["Meal1", "Meal2", "Meal3"] for _ in range(7)]
     }
     user.get_used_jolly.return_value = False
+    user.update_profile.side_effect = lambda filename, change: change(user)
     return user
 
 
@@ -38,7 +39,8 @@ def test_change_meal_stressed(mock_datetime, mock_get_current_meal, user_profile
     mock_datetime.now.return_value.weekday.return_value = 0
     change_meal(user_profiler, food_dataframe, "Lunch", filename)
     user_profiler.set_used_jolly.assert_called_once_with(True)
-    user_profiler.save_profile.assert_called()
+    user_profiler.update_profile.assert_called_once()
+    assert user_profiler.set_meals.call_args[0][0]["Lunch"][0][2][0] in ["Burger", "Pizza", "Fries"]
 
 
 @patch('builtins.input', lambda *args: 'no')
@@ -47,7 +49,7 @@ def test_change_meal_not_stressed(mock_datetime, user_profiler, food_dataframe,
     mock_datetime.now.return_value.weekday.return_value = 0
     change_meal(user_profiler, food_dataframe, "Lunch", filename)
     user_profiler.set_used_jolly.assert_not_called()
-    user_profiler.save_profile.assert_not_called()
+    user_profiler.update_profile.assert_not_called()
 
 
 @patch('food_recommender_system.moodmod.datetime')
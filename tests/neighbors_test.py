@@ -0,0 +1,84 @@
+import pytest
+import pandas as pd
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.neighbors import NeighborIndex
+
+
+@pytest.fixture
+def sample_data():
+    data = {
+        "Food Name": ["Apple", "Banana", "Pear", "Kiwi", "Carrot", "Broccoli"],
+        "Category Name": ["Fruits", "Fruits", "Fruits", "Fruits", "Vegetables", "Vegetables"],
+        "Calories": [52, 89, 57, 61, 41, 55],
+        "Carbs": [14, 23, 15, 15, 10, 11],
+        "Protein": [0.3, 1.1, 0.4, 1.1, 0.9, 3.7]
+    }
+    return pd.DataFrame(data)
+
+
+@pytest.fixture
+def source(tmp_path, sample_data):
+    path = tmp_path / "nutritional-facts.csv"
+    sample_data.to_csv(path, index=False)
+    return path
+
+
+def exact(df, food_name, same_category=True, low_density=False):
+    catalog = FoodCatalog.for_dataframe(df)
+    rows, _ = catalog.similar_foods(food_name, same_category=same_category, low_density=low_density)
+    return catalog.names[rows].tolist()
+
+
+@pytest.mark.parametrize("low_density", [True, False])
+def test_similar_foods_matches_exact(sample_data, low_density):
+    index = NeighborIndex.build(sample_data, "hash", k=3)
+    for food_name in sample_data["Food Name"]:
+        rows, _ = index.similar_foods(food_name, 2, low_density=low_density)
+        assert index.names[rows].tolist() == exact(sample_data, food_name, low_density=low_density)[:2]
+
+
+def test_similar_foods_cross_category(sample_data):
+    index = NeighborIndex.build(sample_data, "hash", k=5, cross_category=True)
+    rows, _ = index.similar_foods("Apple", 5, same_category=False)
+    assert index.names[rows].tolist() == exact(sample_data, "Apple", same_category=False)
+    assert NeighborIndex.build(sample_data, "hash", k=5).similar_foods("Apple", 5, same_category=False) is None
+
+
+def test_similar_foods_allowed(sample_data):
+    index = NeighborIndex.build(sample_data, "hash", k=3)
+    subset = sample_data[sample_data["Food Name"] != exact(sample_data, "Apple")[0]]
+    rows, _ = index.similar_foods("Apple", 1, allowed=FoodCatalog.for_dataframe(subset))
+    assert index.names[rows].tolist() == exact(subset, "Apple")[:1]
+
+
+def test_similar_foods_not_enough_neighbors(sample_data):
+    index = NeighborIndex.build(sample_data, "hash", k=1)
+    assert index.similar_foods("Apple", 2) is None
+    assert index.similar_foods("Pizza", 1) is None
+    # The whole ranking of a two-food category fits in k=1, so the index can still answer
+    rows, _ = index.similar_foods("Carrot", 2)
+    assert index.names[rows].tolist() == ["Broccoli"]
+
+
+def test_save_and_load(sample_data, tmp_path):
+    index = NeighborIndex.build(sample_data, "hash", k=2)
+    index.save(tmp_path / "neighbors.npz")
+    loaded = NeighborIndex.load(tmp_path / "neighbors.npz")
+    assert loaded.source_hash == "hash"
+    assert loaded.k == 2
+    assert loaded.names.tolist() == index.names.tolist()
+    assert loaded.similar_foods("Apple", 2)[0].tolist() == index.similar_foods("Apple", 2)[0].tolist()
+
+
+def test_load_or_build_rebuilds_when_source_changes(sample_data, source, tmp_path):
+    path = tmp_path / "neighbors.npz"
+    index = NeighborIndex.load_or_build(sample_data, source, path, k=2)
+    assert path.exists()
+    assert NeighborIndex.load_or_build(sample_data, source, path, k=2).source_hash == index.source_hash
+
+    changed = sample_data.copy()
+    changed.loc[0, "Calories"] = 500
+    changed.to_csv(source, index=False)
+    rebuilt = NeighborIndex.load_or_build(changed, source, path, k=2)
+    assert rebuilt.source_hash != index.source_hash
+    assert NeighborIndex.load(path).source_hash == rebuilt.source_hash
@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+import pandas as pd
+from food_recommender_system.catalog import FoodCatalog
+from food_recommender_system.nutrition import PlanNutrition, encode_plan, serving_nutrients, serving_table
+
+
+@pytest.fixture
+def sample_data():
+    data = {
+        "Food Name": ["Apple", "Pasta", "Cod", "Pear", "Rice"],
+        "Category Name": ["Fruits", "Grains", "Seafood", "Fruits", "Grains"],
+        "Calories": [52, 350, 80, 57, np.nan],
+        "Carbs": [14, 70, 0, 15, 80],
+        "Fats": [0.2, 1.5, 0.7, 0.1, 0.5],
+        "Fiber": [2.4, 3, 0, 3.1, 1.3],
+        "Protein": [0.3, 12, 18, 0.4, 7]
+    }
+    return pd.DataFrame(data)
+
+
+@pytest.fixture
+def sample_servings():
+    return {"Fruits": {"serving_size": 150}, "Grains": {"serving_size": 80}, "Seafood": {"serving_size": 200}}
+
+
+@pytest.fixture
+def meals():
+    return {
+        "Lunch": [(["Pasta", "Cod", "Apple"], ["Rice", "Cod", "Pear"]) for _ in range(7)],
+        "Snack": [(["Apple"], ["Pear"], ["Pear"]) for _ in range(14)]
+    }
+
+
+def test_serving_table(sample_data, sample_servings):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    table = serving_table(catalog, sample_servings, ["Calories", "Protein"])
+
+    assert table.shape == (6, 2)
+    assert np.allclose(table[catalog.row_of("Pasta")], [280, 9.6])
+    assert table[catalog.row_of("Cod")].tolist() == [160, 36]
+    # Missing values count as 0, as does the padding row
+    assert table[catalog.row_of("Rice"), 0] == 0
+    assert table[-1].tolist() == [0, 0]
+
+
+def test_serving_table_unknown_category(sample_data):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    table = serving_table(catalog, {"Fruits": {"serving_size": 100}}, ["Calories"])
+    assert table[catalog.row_of("Apple"), 0] == 52
+    assert table[catalog.row_of("Cod"), 0] == 0
+
+
+def test_serving_nutrients(sample_data, sample_servings):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    table = serving_table(catalog, sample_servings, ["Calories", "Protein"])
+    rows = [catalog.row_of("Cod"), -1, catalog.row_of("Rice"), catalog.row_of("Cod")]
+    assert np.array_equal(serving_nutrients(catalog, sample_servings, ["Calories", "Protein"], rows), table[rows])
+    assert serving_nutrients(catalog, sample_servings, ["Calories"], []).shape == (0, 1)
+
+
+def test_encode_plan(sample_data, meals):
+    catalog = FoodCatalog.from_dataframe(sample_data)
+    slots, ids = encode_plan(meals, catalog)
+
+    assert ids.shape == (21, 2, 3)
+    assert slots[:2] == [("Lunch", 0), ("Lunch", 1)]
+    # Two snacks a day
+    assert slots[7:11] == [("Snack", 0), ("Snack", 0), ("Snack", 1), ("Snack", 1)]
+    assert ids[7].tolist() == [[catalog.row_of("Apple"), -1, -1], [catalog.row_of("Pear"), -1, -1]]
+
+    _, ids = encode_plan({"Lunch": [(["Pasta", "Pizza"], ["Rice"])]}, catalog)
+    assert ids.tolist() == [[[catalog.row_of("Pasta"), -1], [catalog.row_of("Rice"), -1]]]
+
+
+def test_plan_nutrition(sample_data, sample_servings, meals):
+    nutrition = PlanNutrition.of(meals, sample_data, sample_servings)
+    calories = nutrition.nutrients.index("Calories")
+
+    assert nutrition.per_meal.shape == (21, 2, 5)
+    assert nutrition.per_meal[0, :, calories].tolist() == [280 + 160 + 78, 0 + 160 + 85.5]
+    assert nutrition.per_day.shape == (7, 2, 5)
+    assert nutrition.per_day[3, :, calories].tolist() == [518 + 2 * 78, 245.5 + 2 * 85.5]
+    assert np.allclose(nutrition.per_week, nutrition.per_day.sum(axis=0))
+    assert np.allclose(nutrition.per_week[:, calories], [7 * 674, 7 * 416.5])
+
+
+def test_plan_nutrition_to_dict(sample_data, sample_servings, meals):
+    result = PlanNutrition.of(meals, sample_data, sample_servings, ["Calories"]).to_dict()
+    assert result["meals"][0] == {"meal": "Lunch", "day": 0, "Main": {"Calories": 518.0}, "Alternative": {"Calories": 245.5}}
+    assert result["days"][0]["day"] == 0
+    assert result["week"]["Main"]["Calories"] == 7 * 674
@@ -0,0 +1,101 @@
+import copy
+import pytest
+import numpy as np
+from pathlib import Path
+
+from food_recommender_system.dataloader import DataLoader
+from food_recommender_system.mealgen import build_weekly_meal_plan
+from food_recommender_system.nutrition import PlanNutrition
+from food_recommender_system.optimizer import daily_gaps, optimize_weekly_plan
+from food_recommender_system.profiler import UserProfiler
+
+
+@pytest.fixture(scope="module")
+def df():
+    return DataLoader().load_csv(Path("nutritional-facts.csv"))
+
+
+@pytest.fixture(scope="module")
+def servings():
+    return DataLoader().load_json(Path("food-servings.json"))
+
+
+@pytest.fixture(scope="module")
+def preferences():
+    profile = UserProfiler.load_profile(Path("default.json"))
+    return profile.get_food_preferences(), profile.get_seasonal_preferences(), profile.get_intolerances()
+
+
+@pytest.fixture
+def meals(df, servings, preferences):
+    food_preferences, seasonal_preferences, intolerances = preferences
+    return build_weekly_meal_plan(df, servings, food_preferences, seasonal_preferences, intolerances, seed=0)
+
+
+def test_daily_gaps():
+    gaps = daily_gaps(np.array([[1800.0, 100.0], [2200.0, 90.0]]), np.array([2000.0, 100.0]))
+    assert np.allclose(gaps, [[0.1, 0.0], [0.1, 0.1]])
+
+
+def test_optimize_weekly_plan(df, servings, preferences, meals):
+    food_preferences, seasonal_preferences, intolerances = preferences
+    original = copy.deepcopy(meals)
+    targets = {"Calories": 1800, "Protein": 90}
+
+    optimized, report = optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=0, time_budget=1.0
+    )
+    assert report["within_tolerance"]
+    assert report["objective"] < report["initial_objective"]
+    assert max(report["gaps"].values()) <= 0.05
+
+    nutrition = PlanNutrition.of(optimized, df, servings, list(targets))
+    assert np.allclose(daily_gaps(nutrition.per_day[:, 0], np.array([1800, 90])).max(axis=0), list(report["gaps"].values()))
+    assert meals == original
+
+    # Lunches and dinners keep their main food category, so the plan stays within the servings budget
+    category = dict(zip(df["Food Name"], df["Category Name"]))
+    for meal_name in ["Lunch", "Dinner"]:
+        for entry, original_entry in zip(optimized[meal_name], original[meal_name]):
+            assert category[entry[0][1]] == category[original_entry[0][1]]
+            assert len(entry[1]) == len(entry[0])
+
+    assert optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=0, time_budget=1.0
+    )[0] == optimized
+
+
+def test_optimize_weekly_plan_time_budget(df, servings, preferences, meals):
+    food_preferences, seasonal_preferences, intolerances = preferences
+    # The time budget is only checked after every pass, so a search out of time stops after the same pass, and the
+    # same seed gives the same plan however long the passes take
+    targets = {"Calories": 2500, "Protein": 150, "Fats": 70}
+    optimized, report = optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=3, time_budget=1e-9
+    )
+    assert report["out_of_time"] and report["passes"] == 1 and report["swaps"] > 0
+    assert optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=3, time_budget=1e-9
+    )[0] == optimized
+    assert optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=3, max_passes=1
+    )[0] == optimized
+
+
+def test_optimize_weekly_plan_max_passes(df, servings, preferences, meals):
+    food_preferences, seasonal_preferences, intolerances = preferences
+    targets = {"Calories": 2500, "Protein": 150, "Fats": 70}
+    optimized, report = optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, targets, 0.05, intolerances, seed=3, max_passes=2
+    )
+    assert report["passes"] == 2 and not report["out_of_time"]
+
+    optimized, report = optimize_weekly_plan(
+        meals, df, servings, food_preferences, seasonal_preferences, {"Calories": 1000}, 0.05, intolerances, max_passes=0
+    )
+    assert report["swaps"] == 0 and not report["within_tolerance"]
+    assert report["objective"] == report["initial_objective"] and report["gaps"]["Calories"] > 0.05
+    assert optimized == meals
+
+    with pytest.raises(ValueError):
+        optimize_weekly_plan(meals, df, servings, food_preferences, seasonal_preferences, {"Calories": 0})
@@ -0,0 +1,57 @@
+import threading
+from food_recommender_system.plancache import PlanCache, content_version, plan_key
+
+
+def test_content_version():
+    assert content_version({"Eggs": {"frequency_per_week": 2}, "Dairy": 3}) == content_version({"Dairy": 3, "Eggs": {"frequency_per_week": 2}})
+    assert content_version({"Dairy": 3}) != content_version({"Dairy": 4})
+
+
+def test_plan_key():
+    key = plan_key(["Pasta", "Apple", "Pasta"], ["Dairy"], "servings", 0)
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "servings", 0) == key
+    assert plan_key(["Apple"], ["Dairy"], "servings", 0) != key
+    assert plan_key(["Apple", "Pasta"], None, "servings", 0) != key
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "other servings", 0) != key
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "servings", 1) != key
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "servings", 0, "catalog") != key
+    assert plan_key([], None, "servings", 0) == plan_key([], [], "servings", 0)
+
+    options = {"targets": {"Calories": 1800}, "tolerance": 0.05}
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "servings", 0, "", options) != key
+    assert plan_key(["Apple", "Pasta"], ["Dairy"], "servings", 0, "", None) == key
+
+
+def test_get_or_generate():
+    cache = PlanCache(max_entries=2)
+    calls = []
+
+    def generate(name):
+        return lambda: calls.append(name) or {"plan": name}
+
+    assert cache.get_or_generate("a", generate("a")) == {"plan": "a"}
+    assert cache.get_or_generate("a", generate("a")) is cache.get_or_generate("a", generate("a"))
+    assert calls == ["a"]
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1, "hit_rate": 2 / 3}
+
+    # "a" was used last, so "b" is evicted first
+    cache.get_or_generate("b", generate("b"))
+    cache.get_or_generate("a", generate("a"))
+    cache.get_or_generate("c", generate("c"))
+    assert list(cache.entries) == ["a", "c"]
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0, "hit_rate": 0.0}
+
+
+def test_get_or_generate_threads():
+    cache = PlanCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_generate("a", lambda: {"plan": "a"}))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"plan": "a"}] * 8
+    assert cache.stats()["hits"] + cache.stats()["misses"] == 8
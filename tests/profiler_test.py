@@ -1,7 +1,24 @@
 import pytest
 import os
+import pickle
 import json
-from food_recommender_system.profiler import UserProfiler
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from food_recommender_system.foodids import CompactPlan
+from food_recommender_system.profiler import (
+    JsonProfileStore,
+    ProfileCache,
+    SqliteProfileStore,
+    UserProfiler,
+    VersionConflict,
+    get_profile_store,
+    migrate_profiles,
+    profile_display_name,
+    set_profile_store,
+    write_json_atomically
+)
 
 
 @pytest.fixture
@@ -76,3 +93,311 @@ def test_create_new_profile(tmp_path):
             "meals": {},
             "used_jolly": False
         }
+
+
+def test_write_json_atomically(tmp_path):
+    path = tmp_path / "profile.json"
+    write_json_atomically(path, {"meals": {}})
+    write_json_atomically(path, {"meals": {"Lunch": []}})
+    assert json.loads(path.read_text()) == {"meals": {"Lunch": []}}
+
+    # A failed write leaves the file and no temporary file behind
+    with pytest.raises(TypeError):
+        write_json_atomically(path, {"meals": object()})
+    assert json.loads(path.read_text()) == {"meals": {"Lunch": []}}
+    assert [p.name for p in tmp_path.iterdir()] == ["profile.json"]
+
+    # The profile keeps its permissions
+    os.chmod(path, 0o644)
+    write_json_atomically(path, {"meals": {}})
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+STORES = ["json", "sqlite", "cached json", "cached sqlite"]
+
+
+def open_store(kind, directory):
+    if kind.endswith("json"):
+        store = JsonProfileStore(directory)
+    else:
+        store = SqliteProfileStore(directory / "profiles.db")
+    return ProfileCache(store) if kind.startswith("cached") else store
+
+
+@pytest.fixture(params=STORES)
+def store(request, tmp_path):
+    return open_store(request.param, tmp_path)
+
+
+def test_profile_store(store, user_profiler):
+    assert store.load("alice.json") is None and not store.exists("alice.json")
+
+    user_profiler.set_food_preferences(["Pizza", "Pasta"])
+    user_profiler.save_profile("alice.json", store)
+    UserProfiler.check_profile("bob.json", store)
+    assert store.exists("alice.json") and store.exists("bob.json")
+    assert UserProfiler.load_profile("alice.json", store).get_food_preferences() == ["Pizza", "Pasta"]
+    assert store.load("bob.json") == UserProfiler().to_dict()
+
+    user_profiler.set_used_jolly(True)
+    user_profiler.save_profile("alice.json", store)
+    assert UserProfiler.load_profile("alice.json", store).get_used_jolly() is True
+    assert len(store.names()) == 2
+
+
+def test_profile_names(store, user_profiler):
+    # The demo lists the profiles with names, shows them with profile_display_name and loads the selected one
+    user_profiler.save_profile("jane_doe.json", store)
+    UserProfiler().save_profile("bob.json", store)
+    assert store.names() == ["bob.json", "jane_doe.json"]
+    assert [profile_display_name(name) for name in store.names()] == ["Bob", "Jane doe"]
+    assert UserProfiler.load_profile(Path(store.names()[1]), store).to_dict() == user_profiler.to_dict()
+
+
+def test_profile_store_pickle(store, user_profiler):
+    # Stores are pickled to the worker processes of a batch run when they are spawned
+    user_profiler.save_profile("alice.json", store)
+    copy = pickle.loads(pickle.dumps(store))
+    assert type(copy) is type(store) and copy.load("alice.json") == store.load("alice.json")
+
+
+def test_default_profile_store(tmp_path, user_profiler):
+    assert isinstance(get_profile_store(), ProfileCache) and isinstance(get_profile_store().store, JsonProfileStore)
+
+    store = SqliteProfileStore(tmp_path / "profiles.db")
+    set_profile_store(store)
+    try:
+        user_profiler.save_profile("alice.json")
+        assert store.names() == ["alice.json"]
+        assert UserProfiler.load_profile("alice").to_dict() == user_profiler.to_dict()
+    finally:
+        set_profile_store(None)
+    assert isinstance(get_profile_store().store, JsonProfileStore)
+
+
+def test_sqlite_profile_store(tmp_path):
+    store = SqliteProfileStore(tmp_path / "profiles.db")
+    assert store.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # Profiles are found through the index of the user id
+    plan = store.connection().execute("EXPLAIN QUERY PLAN SELECT data FROM profile_fields WHERE user_id = ?", ("alice",)).fetchall()
+    assert plan[0][-1].startswith("SEARCH profile_fields USING INDEX")
+
+    # Every thread has its own connection, and sees the profiles of the others
+    store.save("alice.json", {"meals": {}})
+    loaded = []
+    thread = threading.Thread(target=lambda: loaded.append(store.load("alice")))
+    thread.start()
+    thread.join()
+    assert loaded == [{"meals": {}}]
+
+    # The profiles are kept by the database
+    store.close()
+    assert SqliteProfileStore(tmp_path / "profiles.db").load("alice.json") == {"meals": {}}
+
+
+def test_profile_versions(store):
+    assert store.version("alice.json") is None
+    version = store.save("alice.json", {"used_jolly": False})
+    assert store.version("alice.json") == version
+
+    update = store.update("alice.json", {"used_jolly": True, "meals": {}})
+    assert update != version and store.version("alice.json") == update
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_profile_cache(tmp_path, backend, mocker):
+    backend = JsonProfileStore(tmp_path) if backend == "json" else SqliteProfileStore(tmp_path / "profiles.db")
+    cache = ProfileCache(backend, max_entries=2)
+    load = mocker.spy(backend, "load")
+
+    # Saves are written through, and repeated loads are served from memory
+    profile = UserProfiler(food_preferences=["Pizza"], meals={"Lunch": [(["Pasta"], ["Rice"])]}).to_dict()
+    cache.save("alice.json", profile)
+    assert cache.load("alice.json") == dict(profile, meals={"Lunch": [[["Pasta"], ["Rice"]]]})
+    assert cache.load("alice.json") == backend.load("alice.json")
+    assert load.call_count == 1 and cache.stats()["hits"] == 2
+
+    # Every load gets its own copy
+    cache.load("alice.json")["food_preferences"].append("Cod")
+    assert cache.load("alice.json")["food_preferences"] == ["Pizza"]
+
+    cache.update("alice.json", {"used_jolly": True})
+    assert cache.load("alice.json")["used_jolly"] is True
+    assert load.call_count == 1
+
+    # Profiles written to the store by someone else are loaded again
+    backend.save("alice.json", dict(profile, food_preferences=["Pizza", "Kiwifruit"]))
+    assert cache.load("alice.json")["food_preferences"] == ["Pizza", "Kiwifruit"]
+    assert load.call_count == 2
+    backend.update("alice.json", {"seasonal_preferences": ["Pumpkin", "Chestnuts"]})
+    cache.update("alice.json", {"used_jolly": False})
+    assert cache.load("alice.json")["seasonal_preferences"] == ["Pumpkin", "Chestnuts"]
+
+    # The least recently used profile is evicted
+    cache.save("bob.json", profile)
+    cache.save("carol.json", profile)
+    assert cache.stats()["entries"] == 2 and cache.location("alice.json") not in cache.entries
+    assert cache.load("missing.json") is None
+
+    cache.save_many([("bob.json", profile)])
+    assert cache.location("bob.json") not in cache.entries
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0, "hit_rate": 0.0}
+
+
+def test_migrate_profiles(tmp_path):
+    directory = tmp_path / "profiles"
+    directory.mkdir()
+    source = JsonProfileStore(directory)
+    for name in ["alice.json", "bob.json"]:
+        UserProfiler(food_preferences=[name]).save_profile(name, source)
+    (directory / "metrics.json").write_text(json.dumps({"total_choices": 3}))
+    (directory / "broken.json").write_text("{")
+
+    target = SqliteProfileStore(tmp_path / "profiles.db")
+    assert migrate_profiles(source, target) == (2, ["broken.json", "metrics.json"])
+    assert target.names() == ["alice.json", "bob.json"]
+    assert target.load("bob.json") == source.load("bob.json")
+
+    # Migrating again replaces the profiles
+    assert migrate_profiles(source, target)[0] == 2
+    assert target.names() == ["alice.json", "bob.json"]
+
+
+def test_profile_store_update(store):
+    store.save("alice.json", UserProfiler(food_preferences=["Pizza"]).to_dict())
+    store.update("alice.json", {"used_jolly": True, "meals": {"Lunch": [[["Pasta"], ["Rice"]]]}})
+    assert store.load("alice.json") == dict(
+        UserProfiler(food_preferences=["Pizza"]).to_dict(), used_jolly=True, meals={"Lunch": [[["Pasta"], ["Rice"]]]}
+    )
+
+    store.update("bob.json", {"used_jolly": True})
+    assert store.load("bob.json") == {"used_jolly": True}
+
+
+def test_dirty_fields(store, mocker):
+    user_profiler = UserProfiler(food_preferences=["Pizza"])
+    assert user_profiler.get_dirty_fields() == {"intolerances", "food_preferences", "seasonal_preferences", "meals", "used_jolly"}
+    user_profiler.save_profile("alice.json", store)
+    assert user_profiler.get_dirty_fields() == set()
+
+    loaded = UserProfiler.load_profile("alice.json", store)
+    assert loaded.get_dirty_fields() == set()
+    update = mocker.spy(store, "update")
+
+    # Only the changed fields are written, and nothing if there are none
+    loaded.set_used_jolly(True)
+    loaded.set_intolerances("Lactose")
+    loaded.save_profile("alice.json", store)
+    loaded.save_profile("alice.json", store)
+    update.assert_called_once_with("alice.json", {"intolerances": [["Dairy", "Dairy Breakfast"]], "used_jolly": True}, None)
+
+    # The fields changed by others are kept
+    store.update("alice.json", {"seasonal_preferences": ["Pumpkin"]})
+    loaded.meals = {"Lunch": []}
+    loaded.save_profile("alice.json", store)
+    assert store.load("alice.json")["seasonal_preferences"] == ["Pumpkin"]
+    assert UserProfiler.load_profile("alice.json", store).get_meals() == {"Lunch": []}
+
+    # A profile saved somewhere else is written whole
+    update.reset_mock()
+    loaded.save_profile("bob.json", store)
+    assert UserProfiler.load_profile("bob.json", store).to_dict() == loaded.to_dict()
+    update.assert_not_called()
+
+
+def test_meals_are_stored_as_food_ids(store):
+    default = UserProfiler.load_profile(Path("default.json"))
+    meals = default.get_meals()
+    default.save_profile("alice.json", store)
+
+    # The plan is held and stored as food ids, and read back as it was
+    stored = store.load("alice.json")["meals"]
+    assert set(stored) >= {"foods", "food_ids"}
+    assert len(json.dumps(stored)) < len(json.dumps(meals)) / 2
+    assert default._meals == stored
+    assert default.get_meals() == meals
+    assert isinstance(default._meals, CompactPlan)
+    # Loading a profile does not decode its plan
+    loaded = UserProfiler.load_profile("alice.json", store)
+    assert loaded._meals == stored
+    assert loaded.get_meals() == meals and loaded.get_meals() is not loaded.get_meals()
+
+    # Meals that are not a plan are stored as they are
+    default.set_meals({"breakfast": "Pancakes"})
+    default.save_profile("alice.json", store)
+    assert store.load("alice.json")["meals"] == {"breakfast": "Pancakes"}
+
+
+def test_versioned_writes(store):
+    version = store.save("alice.json", UserProfiler().to_dict())
+    with pytest.raises(VersionConflict):
+        store.update("alice.json", {"used_jolly": True}, expected_version="stale")
+    with pytest.raises(VersionConflict):
+        store.save("alice.json", {}, expected_version="stale")
+    assert store.load("alice.json") == UserProfiler().to_dict()
+
+    version = store.update("alice.json", {"used_jolly": True}, expected_version=version)
+    assert store.update("alice.json", {"meals": {}}, expected_version=version) == store.version("alice.json")
+
+    # Writes of the thread holding the lock of a profile do not wait for it
+    with store.lock("alice.json"):
+        store.update("alice.json", {"used_jolly": False})
+    assert store.load("alice.json")["used_jolly"] is False
+
+
+def test_update_profile(store):
+    UserProfiler(food_preferences=["Pizza"]).save_profile("alice.json", store)
+    user = UserProfiler.load_profile("alice.json", store)
+    other = UserProfiler.load_profile("alice.json", store)
+    other.set_used_jolly(True)
+    other.save_profile("alice.json", store)
+
+    # A save of the stale profile would only conflict, and the change is made again to the stored profile
+    user.set_food_preferences(["Pizza", "Cod"])
+    with pytest.raises(VersionConflict):
+        user.save_profile("alice.json", store, check_version=True)
+
+    changes = []
+
+    def change(profile):
+        changes.append(profile.get_used_jolly())
+        profile.set_seasonal_preferences(["Pumpkin"])
+
+    user.update_profile("alice.json", change, store)
+    assert changes == [False, True]
+    stored = UserProfiler.load_profile("alice.json", store)
+    assert stored.get_used_jolly() is True and stored.get_seasonal_preferences() == ["Pumpkin"]
+    assert stored.get_food_preferences() == ["Pizza"]
+    assert user.to_dict() == stored.to_dict() and user.get_dirty_fields() == set()
+
+
+def append_preferences(kind, directory, writer, updates):
+    """Append foods to the preferences of alice.json, in a process of its own."""
+    store = open_store(kind, directory)
+    user = UserProfiler.load_profile("alice.json", store)
+    for update in range(updates):
+        def append(profile, food=f"{writer}-{update}"):
+            profile.set_food_preferences(profile.get_food_preferences() + [food])
+
+        user.update_profile("alice.json", append, store)
+
+
+@pytest.mark.parametrize("kind", STORES)
+def test_concurrent_updates(tmp_path, kind):
+    writers, updates = 6, 25
+    UserProfiler().save_profile("alice.json", open_store(kind, tmp_path))
+    with ProcessPoolExecutor(writers, multiprocessing.get_context("fork")) as executor:
+        futures = [executor.submit(append_preferences, kind, tmp_path, writer, updates) for writer in range(writers)]
+        for future in futures:
+            future.result()
+
+    # No update is lost or made twice, and the updates of every writer are in order
+    preferences = UserProfiler.load_profile("alice.json", open_store(kind, tmp_path)).get_food_preferences()
+    assert len(preferences) == writers * updates
+    for writer in range(writers):
+        assert [food for food in preferences if food.startswith(f"{writer}-")] == [f"{writer}-{update}" for update in range(updates)]
+    if kind.endswith("sqlite"):
+        # Every update is a single write
+        assert open_store(kind, tmp_path).version("alice.json") == 1 + writers * updates
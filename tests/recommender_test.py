@@ -2,8 +2,9 @@ import pytest
 import pandas as pd
 from pathlib import Path
 from unittest.mock import MagicMock, patch
-from food_recommender_system.recommender import get_seasonal_food, get_similar_food, ask_seasonal_preferences
+from food_recommender_system.recommender import AlternativesCache, get_seasonal_food, get_similar_food, ask_seasonal_preferences
 from food_recommender_system.profiler import UserProfiler
+from food_recommender_system.neighbors import NeighborIndex
 
 
 @pytest.fixture
@@ -59,6 +60,66 @@ def test_get_similar_food(sample_data):
     assert similar_foods[0][0] == "Banana"  # Ensure the first similar food is "Banana"
 
 
+def test_get_similar_food_low_density_order():
+    df = pd.DataFrame({
+        "Food Name": ["Apple", "Banana", "Dates", "Pear", "Fig"],
+        "Category Name": ["Fruits"] * 5,
+        "Calories": [52, 89, 282, 57, 249],
+        "Carbs": [14, 23, 75, 15, 64],
+        "Protein": [0.3, 1.1, 2.5, 0.4, 3.3]
+    })
+    similar_foods = get_similar_food(df, "Apple")
+    assert [food for food, _, _ in similar_foods] == ["Pear", "Banana", "Fig", "Dates"]
+    assert [density for _, _, density in similar_foods] == ["Low", "Low", "Medium", "High"]
+
+
+def test_get_similar_food_not_found(sample_data):
+    assert get_similar_food(sample_data, "Pizza") == "No information found for Pizza"
+
+
+def test_get_similar_food_other_categories(sample_data):
+    similar_foods = get_similar_food(sample_data, "Apple", same_category=False, low_density_food=False)
+    assert sorted(food for food, _ in similar_foods) == ["Banana", "Broccoli", "Carrot"]
+
+
+def test_get_similar_food_with_neighbors(sample_data):
+    neighbors = NeighborIndex.build(sample_data, "hash", k=1)
+    for food in sample_data["Food Name"]:
+        expected = get_similar_food(sample_data, food)[:1]
+        assert get_similar_food(sample_data, food, neighbors=neighbors, top_k=1) == expected
+
+
+def test_alternatives_cache(sample_data):
+    alternatives = AlternativesCache()
+    expected = get_similar_food(sample_data, "Apple")
+
+    assert alternatives(sample_data, "Apple") == expected
+    assert alternatives(sample_data, "Apple") == expected
+    assert alternatives(sample_data, "Apple", low_density_food=False) == get_similar_food(sample_data, "Apple", low_density_food=False)
+    assert alternatives(sample_data, "Pizza") == "No information found for Pizza"
+    assert alternatives.stats() == {"hits": 1, "misses": 3, "entries": 3, "hit_rate": 0.25}
+
+    # Callers get a copy of the cached list
+    alternatives(sample_data, "Apple").clear()
+    assert alternatives(sample_data, "Apple") == expected
+
+    alternatives.clear()
+    assert alternatives.stats() == {"hits": 0, "misses": 0, "entries": 0, "hit_rate": 0.0}
+
+
+def test_alternatives_cache_catalog_version(sample_data):
+    alternatives = AlternativesCache()
+    alternatives(sample_data, "Apple")
+
+    # An equal DataFrame hits the cache, a changed one does not
+    alternatives(sample_data.copy(), "Apple")
+    assert alternatives.hits == 1
+    changed = sample_data.copy()
+    changed.loc[changed["Food Name"] == "Banana", "Calories"] = 500
+    assert alternatives(changed, "Apple") == get_similar_food(changed, "Apple")
+    assert alternatives.misses == 2
+
+
 def test_ask_seasonal_preferences(sample_data, seasonality, user_profiler):
     # Mocking user profile seasonal preferences methods
     user_profiler.set_seasonal_preferences = MagicMock()
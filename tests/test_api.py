@@ -1,4 +1,7 @@
+import numpy as np
 from fastapi.testclient import TestClient
+from food_recommender_system.config import PREFERENCES
+from food_recommender_system.fastapi import api
 from food_recommender_system.fastapi.api import app
 
 client = TestClient(app)
@@ -14,6 +17,36 @@ def test_recommend_food():
     assert "similar_foods" in response.json()
 
 
+def test_recommend_food_low_density_order():
+    response = client.post("/recommend", json={
+        "food_name": "Apple",
+        "category": "Fruits",
+        "low_density": True
+    })
+    similar_foods = response.json()["similar_foods"]
+    keys = [(density, similarity) for _, similarity, density in similar_foods]
+    assert keys == sorted(keys)
+    assert "Apple" not in [food for food, _, _ in similar_foods]
+
+
+def test_recommend_food_similarity_order():
+    response = client.post("/recommend", json={
+        "food_name": "Apple",
+        "low_density": False
+    })
+    similarities = [similarity for _, similarity in response.json()["similar_foods"]]
+    assert similarities == sorted(similarities, reverse=True)
+
+
+def test_recommend_food_not_found_with_category():
+    response = client.post("/recommend", json={
+        "food_name": "Apples",
+        "category": "Fruits",
+        "low_density": True
+    })
+    assert response.status_code == 404
+
+
 def test_recommend_food_not_found():
     response = client.post("/recommend", json={
         "food_name": "Apples",
@@ -22,6 +55,26 @@ def test_recommend_food_not_found():
     assert response.status_code == 404
 
 
+def test_recommend_food_batch():
+    queries = [
+        {"food_name": "Apple", "low_density": True, "top_k": 3},
+        {"food_name": "Apples", "low_density": True},
+        {"food_name": "Pasta", "category": "Grains", "low_density": False, "top_k": 2},
+        {"food_name": "Banana", "category": "Fruits", "low_density": False}
+    ]
+    response = client.post("/recommend/batch", json={"queries": queries})
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [result["food_name"] for result in results] == ["Apple", "Apples", "Pasta", "Banana"]
+    assert results[1]["status_code"] == 404
+
+    for query, result in zip(queries, results):
+        if result["status_code"] == 200:
+            single = client.post("/recommend", json=query).json()["similar_foods"]
+            assert [food[0] for food in result["similar_foods"]] == [food[0] for food in single]
+
+
 def test_recommend_cheat_meal():
     response = client.post("/cheat", json={
         "fast_food_preferences": ["Pizza", "Cheeseburger", "Hamburger"]
@@ -47,6 +100,14 @@ def test_justificate_ingredients():
     assert "justification" in response.json()
 
 
+def test_justificate_ingredients_not_found():
+    response = client.post("/justify", json={
+        "meal_1": ["Pizza"],
+        "meal_2": ["NonExistentFood"]
+    })
+    assert response.status_code == 404
+
+
 def test_justificate_ingredients_mismatch():
     response = client.post("/justify", json={
         "meal_1": ["Pizza"],
@@ -136,3 +197,143 @@ def test_generate_meals():
     })
     assert response.status_code == 200
     assert "meals" in response.json()
+
+
+def test_food_dataset_is_memory_mapped():
+    matrix = api.food_catalog.matrix
+    assert not matrix.flags.writeable
+    assert not matrix.flags.owndata
+    assert np.shares_memory(api.food_dataset["Calories"].to_numpy(), matrix)
+
+
+def test_generate_meals_seeded_and_cached():
+    request = {
+        "food_preferences": [food for foods in PREFERENCES["no_intolerances"].values() for food in foods],
+        "seasonal_preferences": ["Apple", "Pear", "Orange", "Carrot", "Broccoli", "Pumpkin"],
+        "seed": 7
+    }
+    api.plan_cache.clear()
+    meals = client.post("/generate", json=request).json()["meals"]
+    assert api.plan_cache.stats()["misses"] == 1
+
+    # The same preferences in another order are served from the cache
+    reordered = dict(request, food_preferences=request["food_preferences"][::-1])
+    assert client.post("/generate", json=reordered).json()["meals"] == meals
+    assert api.plan_cache.stats()["hits"] == 1
+
+    # Without the cache, the seed alone gives the same plan
+    api.plan_cache.clear()
+    assert client.post("/generate", json=request).json()["meals"] == meals
+    assert client.post("/generate", json=dict(request, seed=8)).json()["meals"] != meals
+    assert api.plan_cache.stats()["misses"] == 2
+
+    # Requests without a seed get a random plan, which is not cached
+    unseeded = {key: value for key, value in request.items() if key != "seed"}
+    plans = [client.post("/generate", json=unseeded).json()["meals"] for _ in range(3)]
+    assert any(plan != plans[0] for plan in plans[1:])
+    assert api.plan_cache.stats()["misses"] == 2 and api.plan_cache.stats()["hits"] == 0
+
+
+def test_regenerate_slot():
+    request = {
+        "food_preferences": [food for foods in PREFERENCES["no_intolerances"].values() for food in foods],
+        "seasonal_preferences": ["Apple", "Pear", "Orange", "Carrot", "Broccoli", "Pumpkin"],
+        "seed": 7
+    }
+    meals = client.post("/generate", json=request).json()["meals"]
+
+    response = client.post("/generate/slot", json=dict(request, meal="Lunch", slot=2, slot_seed=1))
+    assert response.status_code == 200
+    delta = response.json()["delta"]
+    assert (delta["meal"], delta["slot"], delta["item"]) == ("Lunch", 2, None)
+    assert len(delta["main"]) == 6 and len(delta["alternative"]) == 5
+    assert client.post("/generate/slot", json=dict(request, meal="Lunch", slot=2, slot_seed=1)).json()["delta"] == delta
+
+    # The new lunch keeps the week within the servings budget
+    meals["Lunch"][2] = [delta["main"], delta["alternative"]]
+    categories = [api.utils.get_food_category(meal[0][1], api.food_dataset) for meal in meals["Lunch"] + meals["Dinner"]]
+    for category in set(categories):
+        assert categories.count(category) <= api.servings[category]["frequency_per_week"]
+
+    # A single food is regenerated within the same foods, and the plan of the request is used
+    delta = client.post("/generate/slot", json=dict(request, meals=meals, meal="Snack", slot=13, item=3, slot_seed=1)).json()["delta"]
+    assert delta["main"][:3] == meals["Snack"][13][0][:3]
+    assert delta["main"][3] != meals["Snack"][13][0][3]
+    assert api.utils.get_food_category(delta["main"][3], api.food_dataset) == "Fruits"
+
+    assert client.post("/generate/slot", json=dict(request, meal="Lunch", slot=7)).status_code == 400
+    assert client.post("/generate/slot", json=dict(request, meal="Lunch", slot=0, item=6)).status_code == 400
+
+    # Malformed plans are rejected instead of failing in the generation
+    assert client.post("/generate/slot", json=dict(request, meals={"Lunch": "Pasta"}, meal="Lunch", slot=0)).status_code == 422
+    assert client.post("/generate/slot", json=dict(request, meals={"Lunch": [[["Pasta", 1]]]}, meal="Lunch", slot=0)).status_code == 422
+    assert client.post("/generate/slot", json=dict(request, meals={"Lunch": [[]]}, meal="Lunch", slot=0)).status_code == 400
+    assert client.post("/generate/slot", json=dict(request, meals={"Lunch": [[[]]]}, meal="Lunch", slot=0, item=0)).status_code == 400
+    assert client.post("/generate/slot", json=dict(request, meals={"Lunch": [[["Pasta"]]]}, meal="Lunch", slot=0, item=0)).status_code == 400
+    unknown = dict(meals, Lunch=[[["Pasta", "Unicorn"]]] + meals["Lunch"][1:])
+    assert client.post("/generate/slot", json=dict(request, meals=unknown, meal="Lunch", slot=0, item=1)).status_code == 400
+    assert client.post("/alternatives", json=dict(request, meals={"Dinner": [[]]}, meal="Dinner", slot=0)).status_code == 400
+    assert client.post("/alternatives", json=dict(request, meals={"Dinner": [None]}, meal="Dinner", slot=0)).status_code == 422
+
+
+def test_generate_meals_with_targets():
+    request = {
+        "food_preferences": [food for foods in PREFERENCES["no_intolerances"].values() for food in foods],
+        "seasonal_preferences": ["Apple", "Pear", "Orange", "Carrot", "Broccoli", "Pumpkin"],
+        "seed": 7
+    }
+    plain = client.post("/generate", json=request).json()
+    assert "optimization" not in plain
+
+    targets = {"Calories": 2000, "Protein": 90}
+    response = client.post("/generate", json=dict(request, targets=targets, tolerance=0.1))
+    assert response.status_code == 200
+    meals, optimization = response.json()["meals"], response.json()["optimization"]
+    assert optimization["objective"] <= optimization["initial_objective"]
+    assert set(optimization["gaps"]) == set(targets)
+    assert meals != plain["meals"]
+
+    # Lunches and dinners keep their main category, and so the servings budget
+    for meal_name in ["Lunch", "Dinner"]:
+        for entry, plain_entry in zip(meals[meal_name], plain["meals"][meal_name]):
+            category = api.utils.get_food_category(entry[0][1], api.food_dataset)
+            assert category == api.utils.get_food_category(plain_entry[0][1], api.food_dataset)
+
+    assert client.post("/generate", json=dict(request, targets={"Sodium": 2000})).status_code == 400
+    assert client.post("/generate", json=dict(request, targets={"Calories": 0})).status_code == 400
+
+
+def test_generate_meals_alternatives():
+    request = {
+        "food_preferences": [food for foods in PREFERENCES["no_intolerances"].values() for food in foods],
+        "seasonal_preferences": ["Apple", "Pear", "Orange", "Carrot", "Broccoli", "Pumpkin"],
+        "seed": 7
+    }
+    meals = client.post("/generate", json=request).json()["meals"]
+
+    # Without alternatives, the plan has the same main meals
+    bare = client.post("/generate", json=dict(request, include_alternatives="none")).json()["meals"]
+    for meal_name, entries in meals.items():
+        assert [entry[0] for entry in bare[meal_name]] == [entry[0] for entry in entries]
+        assert all(len(entry) == 1 for entry in bare[meal_name])
+
+    # With the top k alternatives, the entries are the ones of top1 and the alternatives are listed apart, the
+    # first one being the alternative of top1
+    response = client.post("/generate", json=dict(request, include_alternatives="topk", top_k=3)).json()
+    assert "alternatives" not in client.post("/generate", json=request).json()
+    top_k = response["alternatives"]
+    assert response["meals"] == meals
+    for meal_name, entries in meals.items():
+        assert all(len(alternatives) == 3 for alternatives in top_k[meal_name])
+        assert [alternatives[0] for alternatives in top_k[meal_name]] == [entry[1] for entry in entries]
+
+    # The alternatives of a meal are found on demand
+    response = client.post("/alternatives", json=dict(request, include_alternatives="none", meal="Lunch", slot=2, top_k=3))
+    assert response.status_code == 200
+    alternatives = response.json()
+    assert (alternatives["meal"], alternatives["slot"], alternatives["main"]) == ("Lunch", 2, bare["Lunch"][2][0])
+    assert alternatives["alternatives"] == top_k["Lunch"][2]
+
+    assert client.post("/alternatives", json=dict(request, meals=meals, meal="Snack", slot=0, top_k=1)).json()["alternatives"] == [meals["Snack"][0][1]]
+    assert client.post("/alternatives", json=dict(request, meal="Brunch", slot=0)).status_code == 400
+    assert client.post("/alternatives", json=dict(request, meal="Dinner", slot=7)).status_code == 400